@@ -16,6 +16,7 @@ from aws_cdk import (
 )
 from constructs import Construct
 
+
 class CdkInfraStack(Stack):
 
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
@@ -74,16 +75,31 @@ class CdkInfraStack(Stack):
             iam.ManagedPolicy.from_aws_managed_policy_name("AmazonRDSFullAccess")
         )
 
+        # Shared secret the Lambda sends with PUT /snapshot; port 80 is open to
+        # everyone, so nobody else may replace what the API serves.
+        snapshot_token = secretsmanager.Secret(
+            self, "SnapshotToken",
+            generate_secret_string=secretsmanager.SecretStringGenerator(
+                exclude_punctuation=True
+            ),
+        )
+        snapshot_token.grant_read(ec2_instance.role)
+
         # User data script to install dependencies, clone the repo, and run the Flask app
         ec2_instance.user_data.add_commands(
             "sudo yum update -y",
             "sudo yum install -y python3 git",
-            "pip3 install flask selenium webdriver-manager psycopg2-binary requests boto3 python-dotenv",
+            "pip3 install flask selenium webdriver-manager psycopg2-binary "
+            "requests boto3 python-dotenv gunicorn",
             "cd /home/ec2-user",
             "git clone https://github.com/webguru/scraper",
             "cd web-scraper-api",
             "psql -h {} -d scraperdb -U dbadmin -f init_db.sql".format(db_instance.db_instance_endpoint_address),
-            "FLASK_APP=app.py flask run --host=0.0.0.0 --port=80"
+            "export SNAPSHOT_TOKEN=$(aws secretsmanager get-secret-value "
+            "--secret-id {} --region {} --query SecretString --output text)".format(
+                snapshot_token.secret_arn, self.region
+            ),
+            "GUNICORN_BIND=0.0.0.0:80 gunicorn -c gunicorn.conf.py app:app"
         )
 
         # Secrets Manager secret for DB credentials
@@ -115,6 +131,7 @@ class CdkInfraStack(Stack):
                 "DB_CLUSTER_ARN": db_instance.instance_arn,
                 "DB_NAME": "scraperdb",
                 "EC2_INSTANCE_DNS": ec2_instance.instance_public_dns_name,
+                "SNAPSHOT_TOKEN": snapshot_token.secret_value.unsafe_unwrap(),
             },
             vpc=vpc,  # Place Lambda function in the VPC
             timeout=Duration.seconds(900)  # Set timeout to 15 minutes (900 seconds)
@@ -0,0 +1,306 @@
+from collections import deque
+import logging
+import string
+import threading
+import time
+
+logger = logging.getLogger()
+
+SHARD_STRATEGIES = ('registration_class', 'registration_status', 'last_name')
+
+
+def parse_endpoints(value, concurrency=1):
+    # "http://10.0.1.5:5000, 10.0.1.6:5000=2": comma-separated scrape API base
+    # URLs, each optionally followed by =<units it may run at once>.
+    nodes = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        url, limit = item, concurrency
+        head, sep, tail = item.rpartition('=')
+        if sep and tail.isdigit():
+            url, limit = head, int(tail)
+        if '://' not in url:
+            url = f"http://{url}"
+        nodes.append(Node(url, limit))
+    return nodes
+
+
+# Mirrors crawler.LAST_NAME_INITIALS in the scrape API; the Lambda is packaged
+# without it.
+LAST_NAME_INITIALS = string.ascii_uppercase + string.digits
+
+
+def last_name_prefixes(prefix, known_last_names=()):
+    # A-Z and 0-9 after the prefix, plus any other character that follows it in
+    # a last name already loaded (accented letters, punctuation), the same way
+    # crawler.last_name_prefixes does. A unit never searched would otherwise
+    # still count towards a complete crawl and its rows be marked removed.
+    extra = set()
+    folded = prefix.lower()
+    for name in known_last_names:
+        if len(name) > len(folded) and name.lower().startswith(folded):
+            initial = name[len(folded)].upper()
+            if initial not in LAST_NAME_INITIALS and not initial.isspace():
+                extra.add(initial)
+    return [prefix + initial for initial in list(LAST_NAME_INITIALS) + sorted(extra)]
+
+
+def build_units(shard_by, base_params, values=None, known_last_names=()):
+    # Same split the API's own /crawl uses: one search per dropdown value, or
+    # per last-name prefix.
+    if shard_by == 'last_name':
+        values = last_name_prefixes(base_params.get('last_name', ''), known_last_names)
+    elif shard_by not in SHARD_STRATEGIES:
+        raise ValueError(
+            f"Unknown shard strategy '{shard_by}', expected one of {SHARD_STRATEGIES}"
+        )
+    elif not values:
+        raise ValueError(f"No options available to shard by {shard_by}")
+    return [
+        {
+            'name': f"{shard_by}={value}",
+            'params': dict(base_params, **{shard_by: value}),
+        }
+        for value in values
+    ]
+
+
+class Node:
+    def __init__(self, url, concurrency=1):
+        self.url = url.rstrip('/')
+        self.concurrency = max(1, concurrency)
+        self.queue = deque()
+        self.healthy = True
+        # Failures in a row; any success resets it.
+        self.failures = 0
+        self.checked_at = 0.0
+        self.stats = {
+            'units': 0, 'failed': 0, 'stolen': 0, 'records': 0, 'seconds': 0.0,
+        }
+
+
+class Coordinator:
+    # Runs work units across scrape API nodes, at most node.concurrency at a
+    # time on each. Units are dealt out up front; a node that empties its own
+    # queue steals from the back of the longest other one, so fast nodes end up
+    # doing more. A failed unit is retried on another node, and a node that
+    # fails max_node_failures units in a row (or its health check) gets no more
+    # work until a health check, every health_interval seconds, passes again.
+    def __init__(self, nodes, run_unit, check_health, key, max_attempts=3,
+                 max_node_failures=2, health_interval=15.0, deadline=None):
+        # run_unit(url, params) returns the API's {"data": [...]} result and
+        # raises on failure; check_health(url) returns whether the node is up.
+        self.nodes = nodes
+        self.run_unit = run_unit
+        self.check_health = check_health
+        self.key = key
+        self.max_attempts = max_attempts
+        self.max_node_failures = max_node_failures
+        self.health_interval = health_interval
+        # time.monotonic() after which no new unit is started.
+        self.deadline = deadline
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._reports = {}
+        self._data = {}
+
+    def run(self, units):
+        started = time.monotonic()
+        for node in self.nodes:
+            self._check(node)
+        healthy = [node for node in self.nodes if node.healthy]
+        if not healthy:
+            urls = [node.url for node in self.nodes]
+            raise RuntimeError(f"No healthy scraper nodes among {urls}")
+
+        # Deal units in proportion to each node's concurrency.
+        slots = [node for node in healthy for _ in range(node.concurrency)]
+        for index, unit in enumerate(units):
+            slots[index % len(slots)].queue.append(dict(unit, attempts=0))
+        self._pending = len(units)
+        logger.info(
+            f"Dispatching {len(units)} units to "
+            f"{len(healthy)}/{len(self.nodes)} healthy nodes."
+        )
+
+        threads = [
+            threading.Thread(
+                target=self._work, args=(node,), name=f"node-{index}", daemon=True
+            )
+            for index, node in enumerate(self.nodes)
+            for _ in range(node.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for unit in units:
+            if unit['name'] not in self._reports:
+                self._reports[unit['name']] = self._report(
+                    unit, None, 0.0, [], 'Not run before the deadline'
+                )
+        return self._merge(units, time.monotonic() - started)
+
+    def _merge(self, units, seconds):
+        # Unit order, not completion order, so a rerun merges the same way.
+        seen = set()
+        data = []
+        duplicates = 0
+        for unit in units:
+            for record in self._data.get(unit['name'], []):
+                key = self.key(record)
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                data.append(record)
+        reports = [self._reports[unit['name']] for unit in units]
+        return {
+            'data': data,
+            'complete': all(report['error'] is None for report in reports),
+            'duplicates': duplicates,
+            'seconds': round(seconds, 3),
+            'shards': reports,
+            'nodes': {
+                node.url: dict(node.stats, healthy=node.healthy,
+                               seconds=round(node.stats['seconds'], 3))
+                for node in self.nodes
+            },
+        }
+
+    def _finished(self):
+        with self._cond:
+            if self._pending == 0:
+                return True
+            return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def _work(self, node):
+        while not self._finished():
+            if not node.healthy:
+                self._recheck(node)
+                continue
+            unit = self._take(node)
+            if unit is not None:
+                self._execute(node, unit)
+
+    def _take(self, node):
+        with self._cond:
+            if node.queue:
+                return node.queue.popleft()
+            victims = [
+                other for other in self.nodes if other is not node and other.queue
+            ]
+            if victims:
+                node.stats['stolen'] += 1
+                return max(victims, key=lambda other: len(other.queue)).queue.pop()
+            # Everything left is running elsewhere; wake up if one of those is requeued.
+            self._cond.wait(timeout=1.0)
+            return None
+
+    def _execute(self, node, unit):
+        unit['attempts'] += 1
+        started = time.monotonic()
+        try:
+            payload = self.run_unit(node.url, unit['params'])
+        except Exception as e:
+            self._failed(node, unit, e, time.monotonic() - started)
+            return
+        seconds = time.monotonic() - started
+        data = payload.get('data', [])
+        logger.info(
+            f"Unit {unit['name']} finished on {node.url}: "
+            f"{len(data)} records in {seconds:.1f}s."
+        )
+        with self._cond:
+            node.failures = 0
+            node.stats['units'] += 1
+            node.stats['records'] += len(data)
+            node.stats['seconds'] += seconds
+            self._data[unit['name']] = data
+            self._reports[unit['name']] = self._report(
+                unit, node, seconds, data, None, payload.get('pages', 0)
+            )
+            self._pending -= 1
+            self._cond.notify_all()
+
+    def _failed(self, node, unit, error, seconds):
+        logger.warning(
+            f"Unit {unit['name']} failed on {node.url} "
+            f"(attempt {unit['attempts']}): {error}"
+        )
+        with self._cond:
+            node.failures += 1
+            node.stats['failed'] += 1
+            node.stats['seconds'] += seconds
+            if node.healthy and node.failures >= self.max_node_failures:
+                node.healthy = False
+                node.checked_at = time.monotonic()
+                logger.warning(
+                    f"{node.url} marked unhealthy after {node.failures} failures "
+                    "in a row."
+                )
+            target = self._reassign_target(node)
+            if unit['attempts'] < self.max_attempts and target is not None:
+                # Front of the queue: a retried unit shouldn't wait behind
+                # fresh ones.
+                target.queue.appendleft(unit)
+            else:
+                self._reports[unit['name']] = self._report(
+                    unit, node, seconds, [], str(error)
+                )
+                self._pending -= 1
+            self._cond.notify_all()
+
+    def _reassign_target(self, failed):
+        others = [node for node in self.nodes if node is not failed and node.healthy]
+        if others:
+            return min(others, key=lambda node: len(node.queue))
+        return failed if failed.healthy else None
+
+    def _recheck(self, node):
+        wait = node.checked_at + self.health_interval - time.monotonic()
+        if wait > 0:
+            with self._cond:
+                self._cond.wait(timeout=min(wait, 1.0))
+            return
+        healthy = self._check(node)
+        with self._cond:
+            if healthy:
+                node.failures = 0
+                logger.info(f"{node.url} is healthy again.")
+            elif not any(other.healthy for other in self.nodes):
+                # Nobody is left to run the queued units; fail them now rather
+                # than waiting out the deadline.
+                for other in self.nodes:
+                    while other.queue:
+                        unit = other.queue.popleft()
+                        self._reports[unit['name']] = self._report(
+                            unit, None, 0.0, [], 'No healthy scraper nodes left'
+                        )
+                        self._pending -= 1
+            self._cond.notify_all()
+
+    def _check(self, node):
+        try:
+            healthy = bool(self.check_health(node.url))
+        except Exception as e:
+            logger.warning(f"Health check of {node.url} failed: {e}")
+            healthy = False
+        with self._cond:
+            node.healthy = healthy
+            node.checked_at = time.monotonic()
+        return healthy
+
+    def _report(self, unit, node, seconds, data, error, pages=0):
+        return {
+            'name': unit['name'],
+            'node': node.url if node is not None else None,
+            'attempts': unit.get('attempts', 0),
+            'records': len(data),
+            'pages': pages,
+            'seconds': round(seconds, 3),
+            'error': error,
+        }
@@ -1,99 +1,843 @@
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from coordinator import Coordinator, build_units, parse_endpoints
+from migrations import MIGRATIONS, SCHEMA_MIGRATIONS_SQL
+import hashlib
 import json
 import os
 import requests
 import boto3
 import logging
+import threading
+import time
+import uuid
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-def get_db_credentials():
-    secret_arn = os.getenv("DB_SECRET_ARN")
-    region_name = boto3.session.Session().region_name
-    client = boto3.client("secretsmanager", region_name=region_name)
-    response = client.get_secret_value(SecretId=secret_arn)
-    secret = json.loads(response["SecretString"])
-    return secret["username"], secret["password"]
+# (connect, read) timeouts for calls to the scrape API; crawls run as server-side
+# jobs, so no single request has to stay open for the whole crawl.
+API_TIMEOUT = (5, 30)
+STREAM_READ_TIMEOUT = int(os.getenv('STREAM_READ_TIMEOUT', '300'))
+JOB_POLL_INTERVAL = int(os.getenv('JOB_POLL_INTERVAL', '10'))
+# Stop polling this long before the Lambda itself would be killed.
+JOB_DEADLINE_MARGIN_MS = 30000
+# Rows per rds-data batch_execute_statement call (the API caps a request at 4 MB).
+DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', '200'))
+# "sync" upserts changed rows and flags missing ones; "replace" truncates and reloads.
+LOAD_MODE = os.getenv('LOAD_MODE', 'sync')
+METRICS_NAMESPACE = os.getenv('METRICS_NAMESPACE', 'WebScraper')
+# Unfiltered crawls fan out over these scrape API nodes when set (see coordinator.py).
+SCRAPER_ENDPOINTS = os.getenv('SCRAPER_ENDPOINTS', '')
+# Units a node runs at once; match the node's JOB_WORKERS.
+NODE_CONCURRENCY = int(os.getenv('NODE_CONCURRENCY', '1'))
+UNIT_MAX_ATTEMPTS = int(os.getenv('UNIT_MAX_ATTEMPTS', '3'))
+HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', '15'))
+# The nodes' SNAPSHOT_TOKEN; without it merged crawls are not pushed to them.
+SNAPSHOT_TOKEN = os.getenv('SNAPSHOT_TOKEN', '')
 
-def execute_sql(sql, sql_parameters):
+# Everything below lives as long as the warm container: clients, the HTTP
+# sessions and what we already know about the schema are built once, on first use.
+_lock = threading.Lock()
+_rds_data_client = None
+# requests.Session isn't thread-safe and fan-out units run on the
+# coordinator's threads, so each thread keeps its own.
+_http_local = threading.local()
+_schema_version = None
+# Seconds spent in each stage during the current invocation.
+_timings = {}
+# Tags this invocation's rows in scraped_data, scraped_data_changes and crawl_runs.
+_run_id = None
+
+
+@contextmanager
+def timed(stage):
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        _timings[stage] = _timings.get(stage, 0.0) + time.monotonic() - started
+
+
+def emit_timings(load_mode):
+    # CloudWatch Embedded Metric Format: Lambda turns this log line into metrics
+    # with no extra API calls.
+    timings = {
+        f"{stage}_ms": round(seconds * 1000, 1) for stage, seconds in _timings.items()
+    }
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['LoadMode']],
+                'Metrics': [{'Name': name, 'Unit': 'Milliseconds'} for name in timings],
+            }],
+        },
+        'LoadMode': load_mode,
+        **timings,
+    }))
+    return timings
+
+
+def get_rds_data_client():
+    # Reused for the lifetime of the container instead of one client per statement.
+    global _rds_data_client
+    with _lock:
+        if _rds_data_client is None:
+            _rds_data_client = boto3.client('rds-data')
+        return _rds_data_client
+
+
+def get_http_session():
+    # One keep-alive connection to the scrape API per thread, across polls and
+    # invocations. Only GETs are retried: re-POSTing /jobs could queue the same
+    # scrape twice.
+    session = getattr(_http_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.mount('http://', HTTPAdapter(max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=['GET'],
+        )))
+        _http_local.session = session
+    return session
+
+
+def get_db_target():
     resource_arn = os.getenv('DB_CLUSTER_ARN')
     secret_arn = os.getenv('DB_SECRET_ARN')
     database = os.getenv('DB_NAME')
-    
+
     if not resource_arn or not secret_arn or not database:
         logger.error("One or more required environment variables are missing.")
         logger.error(f"DB_CLUSTER_ARN: {resource_arn}")
         logger.error(f"DB_SECRET_ARN: {secret_arn}")
         logger.error(f"DB_NAME: {database}")
         raise ValueError("Required environment variables are not set.")
+    return {'resourceArn': resource_arn, 'secretArn': secret_arn, 'database': database}
 
-    client = boto3.client('rds-data')
-    response = client.execute_statement(
-        resourceArn=resource_arn,
-        secretArn=secret_arn,
-        database=database,
+
+def execute_sql(sql, sql_parameters, transaction_id=None):
+    target = get_db_target()
+    if transaction_id is not None:
+        target['transactionId'] = transaction_id
+    response = get_rds_data_client().execute_statement(
         sql=sql,
-        parameters=sql_parameters
+        parameters=sql_parameters,
+        **target
     )
     return response
 
-def table_exists(table_name):
-    check_table_sql = f"""
-    SELECT COUNT(*)
-    FROM information_schema.tables 
-    WHERE table_name = '{table_name}'
-    """
-    response = execute_sql(check_table_sql, [])
-    return response['records'][0][0]['longValue'] > 0
-
-def create_table():
-    create_table_sql = """
-    CREATE TABLE IF NOT EXISTS scraped_data (
-        registrant VARCHAR(255),
-        status VARCHAR(255),
-        class VARCHAR(255),
-        location VARCHAR(255),
-        details_link VARCHAR(255)
+
+@contextmanager
+def transaction():
+    # Statements run with the yielded id commit together, or not at all if
+    # the block raises.
+    target = get_db_target()
+    client = get_rds_data_client()
+    transaction_id = client.begin_transaction(**target)['transactionId']
+    try:
+        yield transaction_id
+    except Exception:
+        client.rollback_transaction(
+            resourceArn=target['resourceArn'], secretArn=target['secretArn'],
+            transactionId=transaction_id,
+        )
+        raise
+    client.commit_transaction(
+        resourceArn=target['resourceArn'], secretArn=target['secretArn'],
+        transactionId=transaction_id,
+    )
+
+
+def batch_execute_sql(sql, parameter_sets):
+    response = get_rds_data_client().batch_execute_statement(
+        sql=sql,
+        parameterSets=parameter_sets,
+        **get_db_target()
+    )
+    return response
+
+
+def applied_migrations():
+    response = execute_sql("SELECT version FROM schema_migrations", [])
+    return {row[0]['longValue'] for row in response.get('records', [])}
+
+
+def migrate():
+    # Brings the schema up to date once per container; warm invocations skip
+    # straight to loading.
+    global _schema_version
+    if _schema_version is not None:
+        return _schema_version
+    with timed('migrate'):
+        execute_sql(SCHEMA_MIGRATIONS_SQL, [])
+        applied = applied_migrations()
+        for version, name, statements in MIGRATIONS:
+            if version in applied:
+                continue
+            started = time.monotonic()
+            for sql in statements:
+                execute_sql(sql, [])
+            execute_sql(
+                "INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"
+                " ON CONFLICT (version) DO NOTHING",
+                [
+                    {'name': 'version', 'value': {'longValue': version}},
+                    {'name': 'name', 'value': {'stringValue': name}},
+                ]
+            )
+            seconds = time.monotonic() - started
+            logger.info(f"Applied migration {version} ({name}) in {seconds:.3f}s.")
+    _schema_version = MIGRATIONS[-1][0]
+    return _schema_version
+
+
+# Replace mode loads a fresh copy here and swaps it into scraped_data only once
+# the whole load has arrived, so a broken stream never leaves a partial table.
+STAGING_TABLE = 'scraped_data_staging'
+
+INSERT_SQL = f"""
+INSERT INTO {STAGING_TABLE} (registrant, status, class, location, details_link,
+                             record_key, content_hash, crawl_run_id)
+VALUES (:registrant, :status, :class, :location, :details_link,
+        :record_key, :content_hash, :crawl_run_id)
+ON CONFLICT (record_key) DO NOTHING
+"""
+
+LOADED_COLUMNS = (
+    'registrant, status, class, location, details_link, record_key, content_hash, '
+    'crawl_run_id'
+)
+
+
+def prepare_table():
+    migrate()
+
+    # Start from an empty staging table; one left behind by a failed run is dropped.
+    execute_sql(f"DROP TABLE IF EXISTS {STAGING_TABLE}", [])
+    execute_sql(
+        f"CREATE TABLE {STAGING_TABLE} (LIKE scraped_data INCLUDING DEFAULTS)", []
+    )
+    execute_sql(f"CREATE UNIQUE INDEX ON {STAGING_TABLE} (record_key)", [])
+    logger.info(f"Created the {STAGING_TABLE} table.")
+
+
+def swap_in_staging():
+    # Readers see either the old rows or the new ones, never an empty table.
+    with timed('insert'), transaction() as transaction_id:
+        execute_sql("TRUNCATE TABLE scraped_data", [], transaction_id)
+        execute_sql(
+            f"INSERT INTO scraped_data ({LOADED_COLUMNS}) "
+            f"SELECT {LOADED_COLUMNS} FROM {STAGING_TABLE}",
+            [], transaction_id
+        )
+        execute_sql(f"DROP TABLE {STAGING_TABLE}", [], transaction_id)
+    logger.info(f"Replaced scraped_data with the {STAGING_TABLE} rows.")
+
+
+def drop_staging():
+    execute_sql(f"DROP TABLE IF EXISTS {STAGING_TABLE}", [])
+
+
+def record_parameters(record):
+    return [
+        {'name': 'registrant', 'value': {'stringValue': record['registrant']}},
+        {'name': 'status', 'value': {'stringValue': record['status']}},
+        {'name': 'class', 'value': {'stringValue': record['class']}},
+        {'name': 'location', 'value': {'stringValue': record['location']}},
+        {'name': 'details_link', 'value': {'stringValue': record['details_link']}}
+    ]
+
+
+def keyed_parameters(record, key, digest):
+    return record_parameters(record) + [
+        {'name': 'record_key', 'value': {'stringValue': key}},
+        {'name': 'content_hash', 'value': {'stringValue': digest}},
+        {'name': 'crawl_run_id', 'value': {'stringValue': _run_id or ''}},
+    ]
+
+
+def insert_records(records):
+    for start in range(0, len(records), DB_BATCH_SIZE):
+        batch = records[start:start + DB_BATCH_SIZE]
+        started = time.monotonic()
+        with timed('insert'):
+            batch_execute_sql(INSERT_SQL, [
+                keyed_parameters(record, record_key(record), content_hash(record))
+                for record in batch
+            ])
+        seconds = time.monotonic() - started
+        logger.info(f"Inserted batch of {len(batch)} records in {seconds:.3f}s.")
+
+
+UPSERT_SQL = """
+INSERT INTO scraped_data (registrant, status, class, location, details_link,
+                          record_key, content_hash, crawl_run_id)
+VALUES (:registrant, :status, :class, :location, :details_link,
+        :record_key, :content_hash, :crawl_run_id)
+ON CONFLICT (record_key) DO UPDATE SET
+    registrant = EXCLUDED.registrant,
+    status = EXCLUDED.status,
+    class = EXCLUDED.class,
+    location = EXCLUDED.location,
+    details_link = EXCLUDED.details_link,
+    content_hash = EXCLUDED.content_hash,
+    crawl_run_id = EXCLUDED.crawl_run_id,
+    updated_at = now(),
+    removed_at = NULL
+"""
+
+MARK_REMOVED_SQL = """
+UPDATE scraped_data SET removed_at = now(), updated_at = now()
+WHERE record_key = :record_key AND removed_at IS NULL
+"""
+
+# Rows loaded before sync existed have no key; they are dropped once the
+# first sync has written their keyed replacements.
+DELETE_UNKEYED_SQL = "DELETE FROM scraped_data WHERE record_key IS NULL"
+
+SYNC_FIELDS = ['registrant', 'status', 'class', 'location', 'details_link']
+
+
+def record_key(record):
+    if record['details_link']:
+        return record['details_link']
+    # Without a details link, fall back to the registrant's identity on the page.
+    identity = f"{record['registrant']}|{record['location']}"
+    return 'nolink:' + hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+
+def content_hash(record):
+    payload = json.dumps([record[field] for field in SYNC_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# Written before the upsert/removal it describes, so the subquery still sees the
+# old row.
+CHANGE_SQL = """
+INSERT INTO scraped_data_changes (run_id, record_key, change, previous_status,
+                                  registrant, status, class, location, content_hash)
+VALUES (:run_id, :record_key, :change,
+        (SELECT status FROM scraped_data WHERE record_key = :record_key),
+        :registrant, :status, :class, :location, :content_hash)
+"""
+
+REMOVED_CHANGE_SQL = """
+INSERT INTO scraped_data_changes (run_id, record_key, change, previous_status,
+                                  registrant, status, class, location, content_hash)
+SELECT :run_id, record_key, 'removed', status,
+       registrant, status, class, location, content_hash
+FROM scraped_data WHERE record_key = :record_key AND removed_at IS NULL
+"""
+
+# One row per load, written when it finishes; scraped_data.crawl_run_id points
+# at the run that last wrote each row.
+CRAWL_RUN_SQL = """
+INSERT INTO crawl_runs (run_id, load_mode, started_at, finished_at, full_crawl, counts)
+VALUES (:run_id, :load_mode, to_timestamp(:started_at), now(), :full_crawl,
+        CAST(:counts AS JSONB))
+ON CONFLICT (run_id) DO UPDATE SET
+    finished_at = EXCLUDED.finished_at,
+    full_crawl = EXCLUDED.full_crawl,
+    counts = EXCLUDED.counts
+"""
+
+
+def record_crawl_run(load_mode, started_at, full_crawl, counts):
+    with timed('insert'):
+        execute_sql(CRAWL_RUN_SQL, [
+            {'name': 'run_id', 'value': {'stringValue': _run_id or ''}},
+            {'name': 'load_mode', 'value': {'stringValue': load_mode}},
+            {'name': 'started_at', 'value': {'doubleValue': started_at}},
+            {'name': 'full_crawl', 'value': {'booleanValue': full_crawl}},
+            {'name': 'counts', 'value': {'stringValue': json.dumps(counts)}},
+        ])
+
+
+def fetch_existing_hashes(page_size=1000):
+    # Keyset pagination keeps each rds-data response under its 1 MB limit.
+    existing = {}
+    last_key = ''
+    while True:
+        response = execute_sql(
+            """
+            SELECT record_key, content_hash, removed_at IS NOT NULL
+            FROM scraped_data
+            WHERE record_key > :last_key
+            ORDER BY record_key
+            LIMIT :page_size
+            """,
+            [
+                {'name': 'last_key', 'value': {'stringValue': last_key}},
+                {'name': 'page_size', 'value': {'longValue': page_size}},
+            ]
+        )
+        rows = response.get('records', [])
+        for key, digest, removed in rows:
+            existing[key['stringValue']] = (
+                digest.get('stringValue'), removed['booleanValue']
+            )
+        if len(rows) < page_size:
+            return existing
+        last_key = rows[-1][0]['stringValue']
+
+
+class ReplaceLoader:
+    def __init__(self):
+        self.started_at = time.time()
+        prepare_table()
+        self.pending = []
+        self.count = 0
+
+    def add(self, record):
+        self.pending.append(record)
+        if len(self.pending) >= DB_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        insert_records(self.pending)
+        self.count += len(self.pending)
+        self.pending = []
+
+    def abort(self):
+        # scraped_data hasn't been touched yet; throw the partial copy away.
+        drop_staging()
+
+    def finish(self, full_crawl):
+        self.flush()
+        swap_in_staging()
+        counts = {'inserted': self.count}
+        record_crawl_run('replace', self.started_at, full_crawl, counts)
+        return counts
+
+
+class SyncLoader:
+    def __init__(self):
+        self.started_at = time.time()
+        migrate()
+        started = time.monotonic()
+        with timed('existing_hashes'):
+            self.existing = fetch_existing_hashes()
+        seconds = time.monotonic() - started
+        logger.info(
+            f"Loaded {len(self.existing)} existing record hashes in {seconds:.3f}s."
+        )
+        self.seen = set()
+        self.pending = []
+        self.changes = []
+        # The first sync into an empty table is the baseline, not a day of additions.
+        self.track_changes = bool(self.existing)
+        self.counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+
+    def add(self, record):
+        key = record_key(record)
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        digest = content_hash(record)
+        current = self.existing.get(key)
+        if current is None:
+            self.counts['inserted'] += 1
+        elif current[0] != digest or current[1]:
+            self.counts['updated'] += 1
+        else:
+            self.counts['unchanged'] += 1
+            return
+        parameters = keyed_parameters(record, key, digest)
+        self.pending.append(parameters)
+        if self.track_changes:
+            # A registrant coming back after being flagged removed counts as added.
+            change = 'changed' if current is not None and not current[1] else 'added'
+            self.changes.append([
+                parameter for parameter in parameters
+                if parameter['name'] not in ('details_link', 'crawl_run_id')
+            ] + [
+                {'name': 'run_id', 'value': {'stringValue': _run_id or ''}},
+                {'name': 'change', 'value': {'stringValue': change}},
+            ])
+        if len(self.pending) >= DB_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        started = time.monotonic()
+        with timed('insert'):
+            if self.changes:
+                batch_execute_sql(CHANGE_SQL, self.changes)
+            batch_execute_sql(UPSERT_SQL, self.pending)
+        seconds = time.monotonic() - started
+        logger.info(f"Upserted batch of {len(self.pending)} records in {seconds:.3f}s.")
+        self.pending = []
+        self.changes = []
+
+    def abort(self):
+        # Keep what already arrived, but never flag rows removed after a broken stream.
+        self.flush()
+
+    def finish(self, full_crawl):
+        self.flush()
+        # Only a full crawl can tell that a registrant disappeared; a filtered
+        # search simply didn't ask for the others.
+        if full_crawl:
+            removed = [key for key, (_, was_removed) in self.existing.items()
+                       if not was_removed and key not in self.seen]
+            for start in range(0, len(removed), DB_BATCH_SIZE):
+                batch = removed[start:start + DB_BATCH_SIZE]
+                with timed('insert'):
+                    batch_execute_sql(REMOVED_CHANGE_SQL, [[
+                        {'name': 'run_id', 'value': {'stringValue': _run_id or ''}},
+                        {'name': 'record_key', 'value': {'stringValue': key}},
+                    ] for key in batch])
+                    batch_execute_sql(MARK_REMOVED_SQL, [
+                        [{'name': 'record_key', 'value': {'stringValue': key}}]
+                        for key in batch
+                    ])
+            self.counts['removed'] = len(removed)
+        execute_sql(DELETE_UNKEYED_SQL, [])
+        record_crawl_run('sync', self.started_at, full_crawl, self.counts)
+        logger.info(f"Sync finished: {self.counts}")
+        return self.counts
+
+
+def make_loader(load_mode):
+    if load_mode == 'replace':
+        return ReplaceLoader()
+    if load_mode == 'sync':
+        return SyncLoader()
+    raise ValueError(f"Unknown load mode '{load_mode}', expected 'sync' or 'replace'")
+
+
+def stream_scrape_records(base_url, params):
+    # NDJSON: one record per line, then a {"summary": ...} line.
+    with get_http_session().get(
+        f"{base_url}/scrape",
+        params=dict(params, stream='1'),
+        headers={'Accept': 'application/x-ndjson'},
+        stream=True,
+        timeout=(API_TIMEOUT[0], STREAM_READ_TIMEOUT),
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            item = json.loads(line)
+            if 'summary' in item:
+                summary = item['summary']
+                logger.info(
+                    f"Stream finished: {summary['records']} records from "
+                    f"{summary['pages']} pages in {summary['seconds']}s."
+                )
+                if summary['error']:
+                    raise RuntimeError(f"Scrape failed mid-stream: {summary['error']}")
+                return summary
+            yield item
+    raise RuntimeError("Scrape stream ended without a summary line.")
+
+
+def load_streamed_records(base_url, params, load_mode):
+    logger.info(f"Streaming records from {base_url}/scrape with parameters: {params}")
+    count = 0
+    loader = None
+    try:
+        loader = make_loader(load_mode)
+        records = stream_scrape_records(base_url, params)
+        while True:
+            # Time spent waiting on the stream, separate from inserting what arrived.
+            with timed('fetch'):
+                record = next(records, None)
+            if record is None:
+                break
+            loader.add(record)
+            count += 1
+        summary = loader.finish(full_crawl=not any(params.values()))
+    except (requests.RequestException, RuntimeError) as e:
+        logger.error(f"Error during API request: {e}")
+        if loader is not None:
+            loader.abort()
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e), 'records': count})
+        }
+    except Exception as e:
+        logger.error(f"Error during database insertion: {e}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e), 'records': count})
+        }
+
+    logger.info(f"Loaded {count} streamed records into the database.")
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Data inserted successfully',
+            'records': count,
+            'sync': summary,
+        })
+    }
+
+
+def run_scrape_job(base_url, params, context):
+    session = get_http_session()
+    response = session.post(f"{base_url}/jobs", json=params, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    job_url = f"{base_url}/jobs/{response.json()['id']}"
+    logger.info(f"Scrape job accepted: {job_url}")
+
+    while True:
+        if context is not None and (
+            context.get_remaining_time_in_millis() < JOB_DEADLINE_MARGIN_MS
+        ):
+            raise RuntimeError(
+                f"Gave up waiting for {job_url}; it keeps running on the server."
+            )
+        time.sleep(JOB_POLL_INTERVAL)
+        response = session.get(job_url, timeout=API_TIMEOUT)
+        response.raise_for_status()
+        job = response.json()
+        logger.info(
+            f"Job {job['id']} is {job['status']}: {job['pages']} pages, "
+            f"{job['records']} records so far."
+        )
+        if job['status'] == 'failed':
+            raise RuntimeError(f"Scrape job failed: {job['error']}")
+        if job['status'] == 'succeeded':
+            break
+
+    response = session.get(f"{job_url}/result", timeout=API_TIMEOUT)
+    response.raise_for_status()
+    result = response.json()
+    result.setdefault('pages', job['pages'])
+    return result
+
+
+def scrape_unit(base_url, params):
+    # A fan-out unit is one shard, short enough to read straight off the NDJSON
+    # stream: its records arrive as the node scrapes them, with no job to poll.
+    records = stream_scrape_records(base_url, params)
+    data = []
+    while True:
+        try:
+            data.append(next(records))
+        except StopIteration as stop:
+            return {'data': data, 'pages': stop.value['pages']}
+
+
+def push_snapshot(nodes, data):
+    # Each node only ran filtered units, so none could refresh its own snapshot
+    # of the register; hand every healthy node the merged crawl. Best effort: a
+    # node that misses it keeps serving live searches.
+    if not SNAPSHOT_TOKEN:
+        logger.info("SNAPSHOT_TOKEN is not set; not refreshing node snapshots.")
+        return
+    session = get_http_session()
+    body = json.dumps({'data': data})
+    for node in nodes:
+        if not node.healthy:
+            continue
+        try:
+            response = session.put(
+                f"{node.url}/snapshot", data=body,
+                headers={
+                    'Content-Type': 'application/json',
+                    'X-Snapshot-Token': SNAPSHOT_TOKEN,
+                },
+                timeout=API_TIMEOUT,
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning(f"Could not refresh the snapshot on {node.url}: {e}")
+
+
+def fetch_shard_values(nodes, shard_by):
+    # Dropdown values come from whichever node answers first.
+    session = get_http_session()
+    for node in nodes:
+        try:
+            response = session.get(f"{node.url}/options", timeout=API_TIMEOUT)
+            response.raise_for_status()
+            return response.json()['options'].get(shard_by)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.warning(f"Could not load options from {node.url}: {e}")
+    raise RuntimeError(f"No scraper node could list the {shard_by} options.")
+
+
+def fetch_last_name_initials():
+    # First characters of the registrants already loaded ("Last, First"), so a
+    # last_name fan-out also searches initials outside A-Z and 0-9. Best effort:
+    # without them the units still cover A-Z and 0-9.
+    try:
+        response = execute_sql(
+            "SELECT DISTINCT left(registrant, 1) FROM scraped_data "
+            "WHERE registrant <> ''",
+            [],
+        )
+    except Exception as e:
+        logger.warning(f"Could not load last-name initials from scraped_data: {e}")
+        return []
+    return [row[0]['stringValue'] for row in response.get('records', [])]
+
+
+def run_fanout_crawl(nodes, shard_by, context):
+    deadline = None
+    if context is not None:
+        remaining_ms = context.get_remaining_time_in_millis() - JOB_DEADLINE_MARGIN_MS
+        deadline = time.monotonic() + remaining_ms / 1000
+    coordinator = Coordinator(
+        nodes,
+        run_unit=scrape_unit,
+        # Rechecks run on the worker threads, each with its own session.
+        check_health=lambda url: get_http_session().get(
+            f"{url}/pool", timeout=API_TIMEOUT
+        ).ok,
+        key=record_key,
+        max_attempts=UNIT_MAX_ATTEMPTS,
+        health_interval=HEALTH_CHECK_INTERVAL,
+        deadline=deadline,
+    )
+    values, initials = None, ()
+    if shard_by == 'last_name':
+        initials = fetch_last_name_initials()
+    else:
+        values = fetch_shard_values(nodes, shard_by)
+    try:
+        units = build_units(shard_by, search_params({}), values, initials)
+    except ValueError as e:
+        raise RuntimeError(str(e))
+    logger.info(
+        f"Fanning a crawl out over {len(nodes)} nodes in {len(units)} units "
+        f"by {shard_by}."
     )
-    """
-    execute_sql(create_table_sql, [])
-    logger.info("scraped_data table created successfully.")
+    payload = coordinator.run(units)
+    for url, stats in payload['nodes'].items():
+        logger.info(f"Node {url}: {stats}")
+    return payload
+
+
+SEARCH_PARAMS = [
+    'last_name', 'first_name_contains', 'informal_name_contains',
+    'registration_number', 'registration_class', 'registration_status',
+    'contact_lens_mentor', 'area_of_service', 'language_of_service',
+    'practice_name', 'city_or_town', 'postal_code',
+]
+
+
+def search_params(source):
+    return {name: source.get(name, '') for name in SEARCH_PARAMS}
+
 
 def lambda_handler(event, context):
+    global _run_id
+    _timings.clear()
+    _run_id = getattr(context, 'aws_request_id', None) or uuid.uuid4().hex
+    result = handle_event(event, context)
+    timings = emit_timings(event.get('load_mode', LOAD_MODE))
+    body = json.loads(result['body'])
+    result['body'] = json.dumps(dict(body, timings=timings))
+    return result
+
+
+def handle_event(event, context):
     instance_dns = os.getenv("EC2_INSTANCE_DNS")
-    if not instance_dns:
-        logger.error("EC2_INSTANCE_DNS environment variable is not set.")
+    nodes = parse_endpoints(
+        event.get('endpoints') or SCRAPER_ENDPOINTS, NODE_CONCURRENCY
+    )
+    if not instance_dns and not nodes:
+        error = 'Neither EC2_INSTANCE_DNS nor SCRAPER_ENDPOINTS is set.'
+        logger.error(error)
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': 'EC2_INSTANCE_DNS environment variable is not set.'})
+            'body': json.dumps({'error': error})
         }
 
-    url = f"http://{instance_dns}/scrape"
-
-    params = {
-        'last_name': event.get('last_name', ''),
-        'first_name_contains': event.get('first_name_contains', ''),
-        'informal_name_contains': event.get('informal_name_contains', ''),
-        'registration_number': event.get('registration_number', ''),
-        'registration_class': event.get('registration_class', ''),
-        'registration_status': event.get('registration_status', ''),
-        'area_of_service': event.get('area_of_service', ''),
-        'language_of_service': event.get('language_of_service', ''),
-        'practice_name': event.get('practice_name', ''),
-        'city_or_town': event.get('city_or_town', ''),
-        'postal_code': event.get('postal_code', '')
-    }
+    params = search_params(event)
+
+    base_url = f"http://{instance_dns}" if instance_dns else nodes[0].url
+    load_mode = event.get('load_mode', LOAD_MODE)
+    full_crawl = not any(params.values())
+    queries = event.get('queries')
+    stream = event.get('stream', os.getenv('SCRAPE_STREAM') == '1')
+    if not queries and not (full_crawl and nodes) and stream:
+        # Insert records as they arrive instead of waiting for the whole result.
+        return load_streamed_records(base_url, params, load_mode)
+
+    if queries:
+        # Many filter sets (e.g. a list of postal codes) go out as one batch job:
+        # one submission and one set of polls, run on the API's pooled sessions.
+        params = {
+            'kind': 'batch',
+            'queries': [search_params(query) for query in queries],
+        }
+        if event.get('workers'):
+            params['workers'] = event['workers']
+        full_crawl = False
+    elif not full_crawl:
+        params['kind'] = 'scrape'
+    else:
+        # Unfiltered runs (the daily schedule) fan out over the register in
+        # parallel shards.
+        params['kind'] = 'crawl'
+        params['shard_by'] = event.get(
+            'shard_by', os.getenv('CRAWL_SHARD_BY', 'registration_status')
+        )
+        params['workers'] = event.get('workers', os.getenv('CRAWL_WORKERS', '2'))
 
-    logger.info(f"Requesting data from {url} with parameters: {params}")
+    fan_out = params['kind'] == 'crawl' and bool(nodes)
+    if not fan_out:
+        logger.info(
+            f"Submitting a {params['kind']} job to {base_url} with parameters: {params}"
+        )
 
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json().get('data', [])
+        with timed('fetch'):
+            if fan_out:
+                # Several scrape nodes: split the crawl into units and spread
+                # them out.
+                payload = run_fanout_crawl(nodes, params['shard_by'], context)
+            else:
+                payload = run_scrape_job(base_url, params, context)
+        data = payload.get('data', [])
+        failed_queries = []
+        for query in payload.get('queries', []):
+            logger.info(
+                f"Query {query['params']}: {query['status']}, {query['records']} "
+                f"records from {query['source']} in {query['seconds']}s"
+            )
+            if query['status'] == 'ok':
+                data.extend(query['data'])
+            else:
+                # Filtered searches never flag rows removed, so the rest can
+                # still be loaded.
+                failed_queries.append(
+                    {'params': query['params'], 'error': query['error']}
+                )
         logger.info(f"Received {len(data)} records from the scrape API.")
-        
-    except requests.RequestException as e:
+        for shard in payload.get('shards', []):
+            logger.info(
+                f"Shard {shard['name']}: {shard['records']} records, "
+                f"{shard['pages']} pages in {shard['seconds']}s"
+            )
+        if not payload.get('complete', True):
+            # Loading a partial crawl would truncate rows we failed to re-fetch.
+            failed = [shard['name'] for shard in payload.get('shards', [])
+                      if shard.get('error')]
+            error = f'Crawl incomplete, shards failed: {failed}'
+            logger.error(error)
+            return {
+                'statusCode': 502,
+                'body': json.dumps({'error': error})
+            }
+        if fan_out:
+            with timed('snapshot'):
+                push_snapshot(nodes, data)
+
+    except (requests.RequestException, RuntimeError) as e:
         logger.error(f"Error during API request: {e}")
         return {
             'statusCode': 500,
@@ -101,32 +845,12 @@ def lambda_handler(event, context):
         }
 
     try:
-        # Check if the table exists, create it if it does not
-        if not table_exists('scraped_data'):
-            create_table()
-        
-        # Clear the existing data
-        truncate_sql = "TRUNCATE TABLE scraped_data"
-        execute_sql(truncate_sql, [])
-        logger.info("Cleared the scraped_data table.")
-        
-        # Insert new data
-        insert_sql = """
-        INSERT INTO scraped_data (registrant, status, class, location, details_link)
-        VALUES (:registrant, :status, :class, :location, :details_link)
-        """
+        loader = make_loader(load_mode)
         for record in data:
-            sql_parameters = [
-                {'name': 'registrant', 'value': {'stringValue': record['registrant']}},
-                {'name': 'status', 'value': {'stringValue': record['status']}},
-                {'name': 'class', 'value': {'stringValue': record['class']}},
-                {'name': 'location', 'value': {'stringValue': record['location']}},
-                {'name': 'details_link', 'value': {'stringValue': record['details_link']}}
-            ]
-            execute_sql(insert_sql, sql_parameters)
-        
+            loader.add(record)
+        summary = loader.finish(full_crawl)
         logger.info("Data inserted successfully into the database.")
-                
+
     except Exception as e:
         logger.error(f"Error during database insertion: {e}")
         return {
@@ -136,5 +860,11 @@ def lambda_handler(event, context):
 
     return {
         'statusCode': 200,
-        'body': json.dumps({'message': 'Data inserted successfully', 'data': data})
+        'body': json.dumps({
+            'message': 'Data inserted successfully',
+            'records': len(data),
+            'sync': summary,
+            'failed_queries': failed_queries,
+            'nodes': payload.get('nodes', {}),
+        })
     }
@@ -0,0 +1,119 @@
+# Versioned schema for scraped_data and its companions. Each migration runs once
+# and is recorded in schema_migrations; append new ones, never edit applied ones.
+# Every statement is idempotent, so a migration interrupted halfway is simply
+# run again, and databases bootstrapped from web-scraper-api/init_db.sql (which
+# already has some of these objects) converge on the same schema.
+
+SCHEMA_MIGRATIONS_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+MIGRATIONS = [
+    (1, "sync columns and change history", [
+        """
+        CREATE TABLE IF NOT EXISTS scraped_data (
+            registrant VARCHAR(255),
+            status VARCHAR(255),
+            class VARCHAR(255),
+            location VARCHAR(255),
+            details_link VARCHAR(255)
+        )
+        """,
+        "ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS record_key TEXT",
+        "ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS content_hash CHAR(64)",
+        "ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS first_seen_at TIMESTAMPTZ"
+        " DEFAULT now()",
+        "ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ"
+        " DEFAULT now()",
+        "ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS removed_at TIMESTAMPTZ",
+        "CREATE UNIQUE INDEX IF NOT EXISTS scraped_data_record_key"
+        " ON scraped_data (record_key)",
+        """
+        CREATE TABLE IF NOT EXISTS scraped_data_changes (
+            id BIGSERIAL PRIMARY KEY,
+            run_id TEXT NOT NULL,
+            detected_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            record_key TEXT NOT NULL,
+            change TEXT NOT NULL,
+            previous_status VARCHAR(255),
+            registrant VARCHAR(255),
+            status VARCHAR(255),
+            class VARCHAR(255),
+            location VARCHAR(255),
+            content_hash CHAR(64)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS scraped_data_changes_detected_at"
+        " ON scraped_data_changes (detected_at, id)",
+    ]),
+    (2, "primary key, unbounded text and crawl runs", [
+        # Tables created by the Lambda had no key; init_db.sql's already have one.
+        "ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS id BIGSERIAL",
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conrelid = 'scraped_data'::regclass AND contype = 'p'
+            ) THEN
+                ALTER TABLE scraped_data ADD PRIMARY KEY (id);
+            END IF;
+        END $$
+        """,
+        # VARCHAR(255) could cut long detail links and practice addresses short.
+        """
+        ALTER TABLE scraped_data
+            ALTER COLUMN registrant TYPE TEXT,
+            ALTER COLUMN status TYPE TEXT,
+            ALTER COLUMN class TYPE TEXT,
+            ALTER COLUMN location TYPE TEXT,
+            ALTER COLUMN details_link TYPE TEXT
+        """,
+        """
+        ALTER TABLE scraped_data_changes
+            ALTER COLUMN previous_status TYPE TEXT,
+            ALTER COLUMN registrant TYPE TEXT,
+            ALTER COLUMN status TYPE TEXT,
+            ALTER COLUMN class TYPE TEXT,
+            ALTER COLUMN location TYPE TEXT
+        """,
+        "ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS crawl_run_id TEXT",
+        """
+        CREATE TABLE IF NOT EXISTS crawl_runs (
+            run_id TEXT PRIMARY KEY,
+            load_mode TEXT NOT NULL,
+            started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            finished_at TIMESTAMPTZ,
+            full_crawl BOOLEAN,
+            counts JSONB
+        )
+        """,
+    ]),
+    (3, "read indexes", [
+        # Partial indexes over current rows (what readers ask for), each ending in
+        # id so a filtered keyset page is a single index range scan.
+        "CREATE INDEX IF NOT EXISTS scraped_data_status_id"
+        " ON scraped_data (status, id) WHERE removed_at IS NULL",
+        "CREATE INDEX IF NOT EXISTS scraped_data_class_id"
+        " ON scraped_data (class, id) WHERE removed_at IS NULL",
+        "CREATE INDEX IF NOT EXISTS scraped_data_location_id"
+        " ON scraped_data (location, id) WHERE removed_at IS NULL",
+        # Name prefix search: lower(registrant) LIKE 'doe%'.
+        """
+        CREATE INDEX IF NOT EXISTS scraped_data_registrant_prefix
+            ON scraped_data (lower(registrant) text_pattern_ops)
+        """,
+        # Name substring search: registrant ILIKE '%ann%'.
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        """
+        CREATE INDEX IF NOT EXISTS scraped_data_registrant_trgm
+            ON scraped_data USING gin (registrant gin_trgm_ops)
+        """,
+        "CREATE INDEX IF NOT EXISTS scraped_data_changes_record_key"
+        " ON scraped_data_changes (record_key, id)",
+    ]),
+]
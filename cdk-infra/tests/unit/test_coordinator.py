@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "lambda"))
+
+from coordinator import Coordinator, Node, build_units, parse_endpoints  # noqa: E402
+
+
+def record(name):
+    return {"registrant": name, "status": "Active", "class": "Optician",
+            "location": "Toronto, ON", "details_link": f"http://example.com/{name}"}
+
+
+def units(count):
+    return [{"name": f"unit-{i}", "params": {"last_name": str(i)}}
+            for i in range(count)]
+
+
+def coordinator(nodes, run_unit, check_health=lambda url: True, **kwargs):
+    return Coordinator(nodes, run_unit, check_health, key=lambda r: r["details_link"],
+                       health_interval=0.05, **kwargs)
+
+
+def test_parse_endpoints():
+    nodes = parse_endpoints("http://10.0.1.5:5000, 10.0.1.6:5000=3,", concurrency=2)
+    assert [(node.url, node.concurrency) for node in nodes] == [
+        ("http://10.0.1.5:5000", 2), ("http://10.0.1.6:5000", 3),
+    ]
+    assert parse_endpoints("") == []
+
+
+def test_build_units():
+    names = [unit["name"] for unit in build_units("last_name", {"last_name": ""})]
+    assert names[:2] == ["last_name=A", "last_name=B"]
+    base = {"last_name": "", "registration_status": ""}
+    unit = build_units("registration_status", base, ["Active"])[0]
+    assert unit["params"] == {"last_name": "", "registration_status": "Active"}
+    with pytest.raises(ValueError):
+        build_units("registration_status", {}, [])
+
+
+def test_last_name_units_cover_digits_and_initials_already_loaded():
+    loaded = ["Émond", "Zhang", "É", "'t Hooft"]
+    names = [unit["name"] for unit in build_units("last_name", {}, None, loaded)]
+    assert "last_name=7" in names
+    assert names[-2:] == ["last_name='", "last_name=É"]
+    assert len(names) == 26 + 10 + 2
+
+
+def test_idle_nodes_steal_from_slow_ones():
+    fast, slow = Node("http://fast"), Node("http://slow")
+
+    def run_unit(url, params):
+        time.sleep(0.2 if url == "http://slow" else 0.01)
+        return {"data": [record(params["last_name"])], "pages": 1}
+
+    result = coordinator([fast, slow], run_unit).run(units(10))
+
+    assert result["complete"]
+    assert [r["registrant"] for r in result["data"]] == [str(i) for i in range(10)]
+    assert result["nodes"]["http://fast"]["units"] > 5
+    assert result["nodes"]["http://fast"]["stolen"] > 0
+
+
+def test_failed_units_move_to_a_healthy_node():
+    good, bad = Node("http://good"), Node("http://bad")
+
+    def run_unit(url, params):
+        if url == "http://bad":
+            raise RuntimeError("connection refused")
+        time.sleep(0.05)
+        return {"data": [record(params["last_name"]), record("shared")]}
+
+    checked = set()
+
+    def check_health(url):
+        # Up for the first check only, so it is dealt units that then fail.
+        healthy = url == "http://good" or url not in checked
+        checked.add(url)
+        return healthy
+
+    result = coordinator([good, bad], run_unit, check_health,
+                         max_node_failures=1).run(units(4))
+
+    assert result["complete"]
+    assert result["duplicates"] == 3
+    assert not result["nodes"]["http://bad"]["healthy"]
+    assert {report["node"] for report in result["shards"]} == {"http://good"}
+
+
+def test_units_fail_when_no_node_is_left():
+    node = Node("http://only")
+    checks = iter([True])
+
+    def run_unit(url, params):
+        raise RuntimeError("register unavailable")
+
+    result = coordinator([node], run_unit,
+                         check_health=lambda url: next(checks, False)).run(units(3))
+
+    assert not result["complete"]
+    assert all(report["error"] for report in result["shards"])
+
+
+def test_no_healthy_node_at_start():
+    with pytest.raises(RuntimeError):
+        coordinator([Node("http://down")], lambda url, params: {},
+                    check_health=lambda url: False).run(units(1))
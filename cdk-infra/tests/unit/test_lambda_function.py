@@ -0,0 +1,397 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "lambda"))
+
+import lambda_function  # noqa: E402
+from migrations import MIGRATIONS  # noqa: E402
+
+UPSERT = "ON CONFLICT (record_key) DO UPDATE"
+MARK_REMOVED = "SET removed_at = now()"
+
+
+def record(name, status="Active"):
+    return {"registrant": name, "status": status, "class": "Optician",
+            "location": "Toronto, ON", "details_link": f"http://example.com/{name}"}
+
+
+def sql_text(sql):
+    return " ".join(sql.split())
+
+
+def statement_name(sql):
+    return sql.split(" (")[0]
+
+
+class FakeRdsData:
+    # Records every call; the existing-hash query is answered from `existing`,
+    # a list of (record_key, content_hash, removed) rows, and schema_migrations
+    # from `applied`.
+    def __init__(self, existing=(), applied=()):
+        self.existing = sorted(existing)
+        self.applied = set(applied)
+        self.statements = []
+        self.batches = []
+        self.transactions = []
+
+    def execute_statement(self, sql, parameters, transactionId=None, **target):
+        self.statements.append((sql_text(sql), parameters, transactionId))
+        if "SELECT version FROM schema_migrations" in sql:
+            return {"records": [[{"longValue": v}] for v in sorted(self.applied)]}
+        if "INSERT INTO schema_migrations" in sql:
+            self.applied.add(parameters[0]["value"]["longValue"])
+        if "record_key > :last_key" in sql:
+            args = values(parameters)
+            rows = [row for row in self.existing if row[0] > args["last_key"]]
+            return {"records": [
+                [{"stringValue": key}, {"stringValue": digest},
+                 {"booleanValue": removed}]
+                for key, digest, removed in rows[:args["page_size"]]
+            ]}
+        return {"records": []}
+
+    def batch_execute_statement(self, sql, parameterSets, **target):
+        self.batches.append((sql_text(sql), parameterSets))
+        return {"updateResults": []}
+
+    def begin_transaction(self, **target):
+        self.transactions.append("begin")
+        return {"transactionId": "tx-1"}
+
+    def commit_transaction(self, resourceArn, secretArn, transactionId):
+        self.transactions.append("commit")
+
+    def rollback_transaction(self, resourceArn, secretArn, transactionId):
+        self.transactions.append("rollback")
+
+    def executed(self, fragment):
+        return [statement for statement in self.statements if fragment in statement[0]]
+
+    def batched(self, fragment):
+        return [parameter_sets for sql, parameter_sets in self.batches
+                if fragment in sql]
+
+
+def values(parameters):
+    return {parameter["name"]: list(parameter["value"].values())[0]
+            for parameter in parameters}
+
+
+def existing_row(item, removed=False):
+    key = lambda_function.record_key(item)
+    return (key, lambda_function.content_hash(item), removed)
+
+
+@pytest.fixture
+def rds(monkeypatch):
+    monkeypatch.setenv("DB_CLUSTER_ARN", "arn:aws:rds:local:0:cluster:test")
+    monkeypatch.setenv("DB_SECRET_ARN", "arn:aws:secretsmanager:local:0:secret:test")
+    monkeypatch.setenv("DB_NAME", "scraperdb")
+    fake = FakeRdsData()
+    monkeypatch.setattr(lambda_function, "_rds_data_client", fake)
+    monkeypatch.setattr(lambda_function, "_schema_version", MIGRATIONS[-1][0])
+    monkeypatch.setattr(lambda_function, "_run_id", "run-1")
+    lambda_function._timings.clear()
+    return fake
+
+
+def broken_stream(records):
+    def stream(base_url, params):
+        yield from records
+        raise RuntimeError("Scrape failed mid-stream: Error waiting for table")
+    return stream
+
+
+def test_replace_swaps_staging_in_one_transaction(rds, monkeypatch):
+    monkeypatch.setattr(lambda_function, "stream_scrape_records",
+                        lambda base_url, params: iter([record("a")]))
+
+    result = lambda_function.load_streamed_records("http://scraper", {}, "replace")
+
+    assert result["statusCode"] == 200
+    assert rds.batches[0][0].startswith("INSERT INTO scraped_data_staging")
+    swap = [statement_name(sql) for sql, _, tx in rds.statements if tx == "tx-1"]
+    assert swap == [
+        "TRUNCATE TABLE scraped_data",
+        "INSERT INTO scraped_data",
+        "DROP TABLE scraped_data_staging",
+    ]
+    assert rds.transactions == ["begin", "commit"]
+
+
+def test_replace_keeps_the_table_when_the_stream_breaks(rds, monkeypatch):
+    monkeypatch.setattr(lambda_function, "stream_scrape_records",
+                        broken_stream([record("a"), record("b")]))
+
+    result = lambda_function.load_streamed_records("http://scraper", {}, "replace")
+
+    assert result["statusCode"] == 500
+    assert json.loads(result["body"])["records"] == 2
+    assert not rds.executed("TRUNCATE")
+    assert rds.transactions == []
+    assert rds.statements[-1][0] == "DROP TABLE IF EXISTS scraped_data_staging"
+
+
+def test_sync_counts_each_kind_of_row(rds):
+    rds.existing = sorted([
+        existing_row(record("same")),
+        existing_row(record("moved", status="Inactive")),
+        existing_row(record("back"), removed=True),
+        existing_row(record("gone")),
+    ])
+    loader = lambda_function.SyncLoader()
+    for name in ["same", "moved", "back", "new", "same"]:
+        loader.add(record(name))
+
+    counts = loader.finish(full_crawl=True)
+
+    assert counts == {"inserted": 1, "updated": 2, "unchanged": 1, "removed": 1}
+    upserted = [values(parameters)["registrant"]
+                for parameters in rds.batched(UPSERT)[0]]
+    assert upserted == ["moved", "back", "new"]
+    crawl_run = values(rds.executed("INSERT INTO crawl_runs")[0][1])
+    assert json.loads(crawl_run["counts"]) == counts
+    assert crawl_run["full_crawl"] is True
+
+
+def test_sync_writes_changes_before_upserting(rds):
+    rds.existing = sorted([
+        existing_row(record("moved", status="Inactive")),
+        existing_row(record("back"), removed=True),
+        existing_row(record("gone")),
+    ])
+    loader = lambda_function.SyncLoader()
+    for name in ["moved", "back", "new"]:
+        loader.add(record(name))
+    loader.finish(full_crawl=True)
+
+    changes = [values(parameters)
+               for parameters in rds.batched("INSERT INTO scraped_data_changes")[0]]
+    # A registrant flagged removed and seen again counts as added, not changed.
+    assert [(change["registrant"], change["change"]) for change in changes] == [
+        ("moved", "changed"), ("back", "added"), ("new", "added"),
+    ]
+    assert all(change["run_id"] == "run-1" for change in changes)
+    assert not any("details_link" in change for change in changes)
+    order = [statement_name(sql) for sql, _ in rds.batches]
+    assert order.index("INSERT INTO scraped_data_changes") < order.index(
+        "INSERT INTO scraped_data")
+
+    removed_change = rds.batched("'removed'")[0]
+    assert values(removed_change[0])["record_key"] == "http://example.com/gone"
+    assert values(rds.batched(MARK_REMOVED)[0][0]) == {
+        "record_key": "http://example.com/gone"}
+
+
+def test_only_a_full_crawl_flags_missing_rows_removed(rds):
+    rds.existing = sorted([existing_row(record("same")), existing_row(record("gone"))])
+    loader = lambda_function.SyncLoader()
+    loader.add(record("same"))
+
+    counts = loader.finish(full_crawl=False)
+
+    assert counts["removed"] == 0
+    assert not rds.batched(MARK_REMOVED)
+    assert not rds.batched("'removed'")
+
+
+def test_first_sync_is_a_baseline_without_changes(rds):
+    loader = lambda_function.SyncLoader()
+    loader.add(record("new"))
+    loader.finish(full_crawl=True)
+
+    assert loader.counts["inserted"] == 1
+    assert not rds.batched("INSERT INTO scraped_data_changes")
+
+
+def test_existing_hashes_are_read_page_by_page(rds):
+    rds.existing = sorted(existing_row(record(f"r{index}")) for index in range(5))
+
+    existing = lambda_function.fetch_existing_hashes(page_size=2)
+
+    assert len(existing) == 5
+    cursors = [values(parameters)["last_key"] for _, parameters, _ in rds.statements]
+    assert cursors == ["", "http://example.com/r1", "http://example.com/r3"]
+
+
+def test_insert_records_sends_batches_of_db_batch_size(rds, monkeypatch):
+    monkeypatch.setattr(lambda_function, "DB_BATCH_SIZE", 2)
+
+    lambda_function.insert_records([record(f"r{index}") for index in range(5)])
+
+    batches = rds.batched("INSERT INTO scraped_data_staging")
+    assert [len(parameter_sets) for parameter_sets in batches] == [2, 2, 1]
+    assert values(batches[0][0])["crawl_run_id"] == "run-1"
+
+
+def test_migrate_applies_only_missing_versions_once(rds, monkeypatch):
+    monkeypatch.setattr(lambda_function, "_schema_version", None)
+    rds.applied = {1}
+
+    assert lambda_function.migrate() == MIGRATIONS[-1][0]
+    assert not rds.executed("ADD COLUMN IF NOT EXISTS record_key")
+    assert rds.executed("CREATE TABLE IF NOT EXISTS crawl_runs")
+    assert rds.applied == {version for version, _, _ in MIGRATIONS}
+
+    # Cached for the rest of the container's life.
+    calls = len(rds.statements)
+    lambda_function.migrate()
+    assert len(rds.statements) == calls
+
+    # A cold container against an up-to-date schema only reads schema_migrations.
+    monkeypatch.setattr(lambda_function, "_schema_version", None)
+    del rds.statements[:]
+    lambda_function.migrate()
+    assert [statement_name(sql) for sql, _, _ in rds.statements] == [
+        "CREATE TABLE IF NOT EXISTS schema_migrations",
+        "SELECT version FROM schema_migrations",
+    ]
+
+
+class FakeStream:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        return iter(line.encode("utf-8") for line in self.lines)
+
+
+def stream_lines(monkeypatch, lines):
+    session = lambda_function.requests.Session()
+    monkeypatch.setattr(session, "get", lambda *args, **kwargs: FakeStream(lines))
+    monkeypatch.setattr(lambda_function._http_local, "session", session, raising=False)
+
+
+def summary(error=None):
+    return json.dumps({"summary": {"records": 1, "pages": 1, "seconds": 0.1,
+                                   "error": error}})
+
+
+def streamed(params=None):
+    return lambda_function.stream_scrape_records("http://scraper", params or {})
+
+
+def test_stream_yields_records_until_the_summary(monkeypatch):
+    lines = [json.dumps(record("a")), "", summary(), json.dumps(record("late"))]
+    stream_lines(monkeypatch, lines)
+
+    assert list(streamed()) == [record("a")]
+
+
+def test_stream_raises_on_a_summary_error_or_a_missing_summary(monkeypatch):
+    lines = [json.dumps(record("a")), summary(error="Error waiting for table")]
+    stream_lines(monkeypatch, lines)
+    received = []
+    with pytest.raises(RuntimeError, match="mid-stream: Error waiting for table"):
+        for item in streamed():
+            received.append(item)
+    assert received == [record("a")]
+
+    stream_lines(monkeypatch, [json.dumps(record("a"))])
+    with pytest.raises(RuntimeError, match="without a summary line"):
+        list(streamed())
+
+
+def test_sync_keeps_streamed_rows_when_the_stream_breaks(rds, monkeypatch):
+    rds.existing = sorted([existing_row(record("gone"))])
+    monkeypatch.setattr(lambda_function, "stream_scrape_records",
+                        broken_stream([record("a")]))
+
+    result = lambda_function.load_streamed_records("http://scraper", {}, "sync")
+
+    assert result["statusCode"] == 500
+    assert len(rds.batched(UPSERT)[0]) == 1
+    # Never flag rows removed after a broken stream.
+    assert not rds.batched(MARK_REMOVED)
+
+
+def test_http_session_is_reused_and_only_retries_gets(monkeypatch):
+    monkeypatch.setattr(lambda_function, "_http_local", threading.local())
+
+    session = lambda_function.get_http_session()
+
+    assert lambda_function.get_http_session() is session
+    # Fan-out units stream on the coordinator's threads; none shares a session.
+    others = []
+    thread = threading.Thread(
+        target=lambda: others.append(lambda_function.get_http_session())
+    )
+    thread.start()
+    thread.join()
+    assert others[0] is not session
+    retry = session.get_adapter("http://scraper").max_retries
+    assert set(retry.allowed_methods) == {"GET"}
+    assert retry.total == 3
+
+
+def test_fanout_units_read_the_stream_instead_of_polling_a_job(monkeypatch):
+    stream_lines(monkeypatch, [json.dumps(record("a")), json.dumps(record("b")),
+                               summary()])
+    monkeypatch.setattr(lambda_function, "run_scrape_job", None)
+
+    result = lambda_function.scrape_unit("http://scraper", {"last_name": "A"})
+
+    assert result == {"data": [record("a"), record("b")], "pages": 1}
+
+
+def fanout_result(complete):
+    return {"data": [record("a")], "complete": complete, "shards": [
+        {"name": "last_name=A", "records": 1, "pages": 1, "seconds": 0.1,
+         "error": None if complete else "timeout"},
+    ], "nodes": {}}
+
+
+def test_a_complete_fanout_crawl_refreshes_every_node_snapshot(rds, monkeypatch):
+    pushed = []
+
+    def put(url, data, headers, **kwargs):
+        assert headers["X-Snapshot-Token"] == "secret"
+        pushed.append(url)
+        if url.startswith("http://down"):
+            raise lambda_function.requests.ConnectionError("refused")
+        return FakeStream([])
+
+    monkeypatch.setattr(lambda_function, "SNAPSHOT_TOKEN", "secret")
+    session = lambda_function.requests.Session()
+    monkeypatch.setattr(session, "put", put)
+    monkeypatch.setattr(lambda_function._http_local, "session", session, raising=False)
+    monkeypatch.setattr(lambda_function, "run_fanout_crawl",
+                        lambda nodes, shard_by, context: fanout_result(True))
+    event = {"endpoints": "http://up, http://down, http://out"}
+    nodes = lambda_function.parse_endpoints(event["endpoints"])
+    nodes[2].healthy = False
+    monkeypatch.setattr(lambda_function, "parse_endpoints",
+                        lambda value, concurrency: nodes)
+
+    result = lambda_function.handle_event(event, None)
+
+    # Nodes out of rotation are skipped, and one that misses the snapshot
+    # doesn't fail the load.
+    assert result["statusCode"] == 200
+    assert pushed == ["http://up/snapshot", "http://down/snapshot"]
+
+    del pushed[:]
+    monkeypatch.setattr(lambda_function, "run_fanout_crawl",
+                        lambda nodes, shard_by, context: fanout_result(False))
+    assert lambda_function.handle_event(event, None)["statusCode"] == 502
+    assert pushed == []
+
+    # Without the nodes' token there is nothing to push with.
+    monkeypatch.setattr(lambda_function, "SNAPSHOT_TOKEN", "")
+    monkeypatch.setattr(lambda_function, "run_fanout_crawl",
+                        lambda nodes, shard_by, context: fanout_result(True))
+    assert lambda_function.handle_event(event, None)["statusCode"] == 200
+    assert pushed == []
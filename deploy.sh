@@ -100,7 +100,6 @@ source venv/bin/activate
 echo "Upgrading pip and installing requirements..."
 pip3 install --upgrade pip
 pip3 install -r requirements.txt
-pip3 install gunicorn
 
 echo "Setting Flask environment variables..."
 export FLASK_APP=app.py
@@ -118,7 +117,7 @@ User=ec2-user
 Group=nginx
 WorkingDirectory=/home/ec2-user/web-scraper-api
 Environment="PATH=/home/ec2-user/web-scraper-api/venv/bin"
-ExecStart=/home/ec2-user/web-scraper-api/venv/bin/gunicorn --workers 3 --bind unix:/home/ec2-user/web-scraper-api/web-scraper.sock -m 007 --log-file /home/ec2-user/web-scraper-api/gunicorn.log --log-level debug --timeout 3600 app:app
+ExecStart=/home/ec2-user/web-scraper-api/venv/bin/gunicorn -c gunicorn.conf.py --bind unix:/home/ec2-user/web-scraper-api/web-scraper.sock -m 007 --log-file /home/ec2-user/web-scraper-api/gunicorn.log --log-level debug app:app
 
 [Install]
 WantedBy=multi-user.target
@@ -0,0 +1,150 @@
+from contextlib import contextmanager
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def read_meminfo():
+    # Values in MB; empty where /proc/meminfo doesn't exist (non-Linux hosts).
+    try:
+        with open("/proc/meminfo") as f:
+            lines = f.readlines()
+    except OSError:
+        return {}
+    info = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        if name in ("MemTotal", "MemAvailable"):
+            info[name] = int(value.split()[0]) / 1024
+    return info
+
+
+def default_capacity(session_mb, reserve_mb, meminfo=None):
+    # One browser-backed scrape per session_mb of memory left after the API
+    # process and OS reserve, and never more than two per CPU.
+    meminfo = read_meminfo() if meminfo is None else meminfo
+    cpu_slots = 2 * (os.cpu_count() or 1)
+    if "MemTotal" not in meminfo:
+        return cpu_slots
+    memory_slots = int((meminfo["MemTotal"] - reserve_mb) // session_mb)
+    return max(1, min(cpu_slots, memory_slots))
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=None, max_queue=4, queue_timeout=30,
+                 session_mb=250, reserve_mb=300, min_free_mb=100, meminfo=read_meminfo):
+        self.min_free_mb = min_free_mb
+        self.meminfo = meminfo
+        self.max_concurrent = max_concurrent or default_capacity(
+            session_mb, reserve_mb, meminfo()
+        )
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._running = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._avg_seconds = 30.0
+        self._stats = {"admitted": 0, "queued": 0, "rejected_queue_full": 0,
+                       "rejected_timeout": 0, "rejected_memory": 0}
+
+    @contextmanager
+    def slot(self, timeout=-1, weight=1):
+        # timeout=-1 uses queue_timeout and the queue limit; None waits as long
+        # as it takes (background jobs have no client waiting on a socket).
+        # weight is how many sessions the work uses at once (a crawl's or batch's
+        # workers), capped at the limit so it can always get in eventually.
+        weight = max(1, min(weight, self.max_concurrent))
+        bounded = timeout == -1
+        self._acquire(self.queue_timeout if bounded else timeout, bounded, weight)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started, weight)
+
+    def retry_after(self):
+        # Rough time until everyone ahead of a new request has been served.
+        with self._cond:
+            return self._retry_after_locked()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "running": self._running,
+                "waiting": self._waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout,
+                "avg_seconds": round(self._avg_seconds, 3),
+            })
+        return stats
+
+    def _acquire(self, timeout, bounded, weight=1):
+        # Warm pooled browsers already hold their memory, so only refuse work
+        # when the box is close to swapping or the OOM killer.
+        available = self.meminfo().get("MemAvailable")
+        if bounded and available is not None and available < self.min_free_mb:
+            self._reject("rejected_memory")
+            raise Overloaded(
+                f"Only {available:.0f}MB of memory free", 503, self.retry_after()
+            )
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._running + weight <= self.max_concurrent:
+                self._running += weight
+                self._stats["admitted"] += 1
+                return
+            if bounded and self._waiting >= self.max_queue:
+                self._stats["rejected_queue_full"] += 1
+                raise Overloaded(
+                    "Too many scrapes queued", 429, self._retry_after_locked()
+                )
+
+            self._waiting += 1
+            self._stats["queued"] += 1
+            try:
+                while self._running + weight > self.max_concurrent:
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._stats["rejected_timeout"] += 1
+                        raise Overloaded(
+                            f"No scrape slot freed up within {timeout:.0f}s", 503,
+                            self._retry_after_locked(),
+                        )
+                    self._cond.wait(remaining)
+                self._running += weight
+                self._stats["admitted"] += 1
+            finally:
+                self._waiting -= 1
+
+    def _release(self, seconds, weight=1):
+        with self._cond:
+            self._running -= weight
+            # Moving average of how long a slot is held, for Retry-After.
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * seconds
+            # Waiters need different numbers of slots, so let each one check.
+            self._cond.notify_all()
+
+    def _reject(self, reason):
+        with self._cond:
+            self._stats[reason] += 1
+
+    def _retry_after_locked(self):
+        seconds = self._avg_seconds * (self._waiting + 1) / self.max_concurrent
+        return min(300, max(1, math.ceil(seconds)))
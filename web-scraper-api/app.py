@@ -1,13 +1,40 @@
-from flask import Flask, request, jsonify
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
+from flask import Flask, Response, g, request, jsonify
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait, Select
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import StaleElementReferenceException, NoSuchElementException
+from admission import AdmissionController, Overloaded
+from batch import batch_summary, plan_batch, run_batch
+from cache import ResultCache, cache_key
+from catalog import OptionCatalog
+from checkpoint import CheckpointStore, checkpoint_key, checkpointed
+from contextlib import ExitStack, contextmanager
+from crawler import SHARD_STRATEGIES, build_shards, crawl
+from driver_pool import DriverPool, PoolTimeout, create_driver
+from enrichment import DetailCache, DetailEnricher
+from export import (
+    COMPRESS_MIN_BYTES, EXPORT_BATCH_ROWS, FILE_EXTENSIONS, FORMATS, NotAcceptable,
+    available_formats, batches, compress_body, export_fields, export_stream,
+    negotiate_encoding, negotiate_format,
+)
+from jobs import JobQueue, JobStore
+from http_engine import RegisterHttpClient
+from records import CHANGE_TYPES, EXACT_FILTERS, RecordsReader, parse_since
+from readiness import (
+    PostbackWatcher, clickable, click_fresh, next_page_button, wait_stats, wait_until,
+)
+from register import (
+    REGISTER_URL, RECORD_FIELDS, SEARCH_PARAMS, TEXT_FIELDS, DROPDOWN_FIELDS,
+    ScrapeError, get_search_params,
+)
+from snapshot import SnapshotStore
+import hmac
+import itertools
+import json
 import logging
+import metrics
+import os
+import sys
+import threading
 import time
+import uuid
 
 app = Flask(__name__)
 
@@ -29,185 +56,1146 @@ file_handler.setFormatter(file_format)
 logger.addHandler(console_handler)
 logger.addHandler(file_handler)
 
-@app.route("/scrape", methods=["GET"])
-def scrape():
+driver_pool = DriverPool(
+    create_driver,
+    REGISTER_URL,
+    size=int(os.getenv("DRIVER_POOL_SIZE", "2")),
+    max_uses=int(os.getenv("DRIVER_POOL_MAX_USES", "50")),
+    acquire_timeout=float(os.getenv("DRIVER_POOL_ACQUIRE_TIMEOUT", "120")),
+)
+
+# Caps browser-backed work per process; gunicorn.conf.py runs one process.
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("MAX_CONCURRENT_SCRAPES", "0")) or None,
+    max_queue=int(os.getenv("SCRAPE_QUEUE_SIZE", "4")),
+    queue_timeout=float(os.getenv("SCRAPE_QUEUE_TIMEOUT", "30")),
+    session_mb=int(os.getenv("SCRAPE_SESSION_MB", "250")),
+    min_free_mb=int(os.getenv("SCRAPE_MIN_FREE_MB", "100")),
+)
+
+scrape_cache = ResultCache(
+    ttl=int(os.getenv("SCRAPE_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES", "256")),
+    path=os.getenv("SCRAPE_CACHE_PATH") or None,
+)
+
+checkpoint_store = CheckpointStore(
+    os.getenv("CHECKPOINT_PATH", "checkpoints.db"),
+    max_age=int(os.getenv("CHECKPOINT_MAX_AGE", str(6 * 3600))),
+)
+
+snapshot_store = SnapshotStore(
+    path=os.getenv("SNAPSHOT_PATH", "snapshot.json"),
+    max_age=int(os.getenv("SNAPSHOT_MAX_AGE", str(26 * 3600))),
+)
+
+records_reader = RecordsReader(
+    os.getenv("DATABASE_URL", ""),
+    max_connections=int(os.getenv("DATABASE_POOL_SIZE", "4")),
+)
+
+detail_enricher = DetailEnricher(
+    DetailCache(os.getenv("DETAIL_CACHE_PATH", "details.db")),
+    workers=int(os.getenv("DETAIL_WORKERS", "4")),
+    rate=float(os.getenv("DETAIL_RATE_LIMIT", "5")),
+    ttl=int(os.getenv("DETAIL_CACHE_TTL", "86400")),
+)
+
+SCRAPE_ENGINES = ("browser", "http")
+SCRAPE_SOURCES = ("auto", "snapshot", "live")
+# /export can also read the rows the Lambda loaded into scraped_data.
+EXPORT_SOURCES = SCRAPE_SOURCES + ("stored",)
+# The /scrape parameters scraped_data can be filtered by, and the records
+# filter each one maps to.
+STORED_FILTERS = {
+    "registration_status": "status", "registration_class": "class", "last_name": "name",
+}
+DEFAULT_ENGINE = os.getenv("SCRAPER_ENGINE", "browser")
+DEFAULT_SHARD_BY = os.getenv("CRAWL_SHARD_BY", "registration_status")
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", "2"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "2"))
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "100"))
+NDJSON_MIMETYPE = "application/x-ndjson"
+# Batch settings given next to queries, never inside one.
+BATCH_OPTIONS = ("engine", "enrich", "resume")
+# Shared with the Lambda, which sends it as X-Snapshot-Token on PUT /snapshot.
+# Unset, the endpoint is closed.
+SNAPSHOT_TOKEN = os.getenv("SNAPSHOT_TOKEN", "")
+
+
+@contextmanager
+def open_result_pages(params, engine=DEFAULT_ENGINE, skip_pages=0):
+    # Both engines yield pages of records shaped like extract_table_data output.
+    if engine == "http":
+        pages = RegisterHttpClient().iter_result_pages(params, skip_pages)
+        yield count_pages(pages, engine)
+    else:
+        # Pooled sessions are already sitting on the register page with a clean form.
+        with driver_pool.session() as driver:
+            yield count_pages(iter_result_pages(driver, params, skip_pages), engine)
+
+
+def count_pages(pages, engine):
+    for page in pages:
+        metrics.pages_total.inc(engine=engine)
+        metrics.records_total.inc(len(page), engine=engine)
+        yield page
+
+
+@contextmanager
+def open_checkpointed_pages(params, engine=DEFAULT_ENGINE, run_id=None):
+    # Within a run (a job, or a request that asked to be resumable) every finished
+    # page is saved, so a failed search can pick up where it stopped. Other
+    # searches aren't checkpointed at all.
+    if not run_id:
+        with open_result_pages(params, engine) as pages:
+            yield pages
+        return
+    key = checkpoint_key(params, engine, run_id)
+    saved_pages = None
+    if checkpoint_store.get(key):
+        saved_pages = checkpoint_store.load_pages(key)
+    if saved_pages is None:
+        checkpoint_store.start(key, params, engine, run_id)
+        saved_pages = []
+    else:
+        logger.info(f"Resuming from a checkpoint after page {len(saved_pages)}.")
+        metrics.retries_total.inc(operation="resume")
+    with open_result_pages(params, engine, len(saved_pages)) as pages:
+        yield checkpointed(checkpoint_store, key, saved_pages, pages)
+
+
+def fetch_dropdown_options():
+    # One plain GET of the search form; no browser needed.
+    form = RegisterHttpClient().fetch_search_form()
+    return {
+        param: form.dropdown_options(dropdown_id)
+        for param, dropdown_id in DROPDOWN_FIELDS.items()
+    }
+
+
+option_catalog = OptionCatalog(
+    fetch_dropdown_options,
+    ttl=int(os.getenv("OPTIONS_CACHE_TTL", "86400")),
+    retry_after=int(os.getenv("OPTIONS_RETRY_AFTER", "60")),
+)
+
+
+def parse_scrape_options(args):
+    options = {
+        # Unknown dropdown values are rejected here, before a browser is involved.
+        "params": option_catalog.validate(get_search_params(args)),
+        "engine": args.get('engine', DEFAULT_ENGINE),
+        "enrich": str(args.get('enrich', '')).lower() in ('1', 'true', 'yes'),
+        "run_id": parse_run_id(args),
+    }
+    if options["engine"] not in SCRAPE_ENGINES:
+        raise ValueError(
+            f"Unknown engine '{options['engine']}', expected one of {SCRAPE_ENGINES}"
+        )
+    return options
+
+
+def parse_run_id(args):
+    # resume=1 makes the search resumable under a new run id (sent back in
+    # X-Run-Id); resume=<run id> continues that run from its checkpoint.
+    resume = str(args.get('resume', '')).strip()
+    if resume.lower() in ('', '0', 'false', 'no'):
+        return None
+    if resume.lower() in ('1', 'true', 'yes'):
+        return uuid.uuid4().hex
+    return resume
+
+
+def run_id_headers(options):
+    return {"X-Run-Id": options["run_id"]} if options.get("run_id") else {}
+
+
+def parse_source(args, sources=SCRAPE_SOURCES):
+    source = args.get('source', 'auto')
+    if source not in sources:
+        raise ValueError(f"Unknown source '{source}', expected one of {sources}")
+    return source
+
+
+def snapshot_response(params, source, enrich=False):
+    # Answer from the local snapshot when it is fresh and covers every filter.
+    snapshot = snapshot_store.current()
+    records = snapshot.query(params) if snapshot is not None else None
+    if records is None:
+        if source == "snapshot":
+            return jsonify({"error": "No fresh snapshot can answer this query"}), 409
+        return None
+    logger.info(f"Serving {len(records)} records from the register snapshot.")
+    if enrich:
+        records = detail_enricher.enrich(records)
+    response = jsonify({"data": records})
+    response.headers["X-Source"] = "snapshot"
+    response.headers["X-Snapshot-Age"] = str(int(snapshot.age()))
+    return response
+
+
+def parse_crawl_options(args):
+    options = parse_scrape_options(args)
+    options["shard_by"] = args.get('shard_by', DEFAULT_SHARD_BY)
+    if options["shard_by"] not in SHARD_STRATEGIES:
+        raise ValueError(
+            f"Unknown shard strategy '{options['shard_by']}', "
+            f"expected one of {SHARD_STRATEGIES}"
+        )
     try:
-        # existing code
-        logger.info("Starting the scraping process.")
-        
-        # Set up the driver
-        options = webdriver.ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--remote-debugging-port=9222")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--window-size=1280,800")
-        options.add_argument("--disable-software-rasterizer")
+        options["workers"] = int(args.get('workers', CRAWL_WORKERS))
+    except (TypeError, ValueError):
+        raise ValueError("workers must be an integer")
+    return options
 
+
+def parse_batch_options(args):
+    # A JSON list of parameter sets, or
+    # {"queries": [...], "engine": ..., "enrich": ..., "workers": ...}.
+    if isinstance(args, list):
+        args = {"queries": args}
+    queries = args.get('queries')
+    if not isinstance(queries, list) or not queries:
+        raise ValueError("queries must be a non-empty list of search parameter sets")
+    if len(queries) > BATCH_MAX_QUERIES:
+        raise ValueError(
+            f"A batch takes at most {BATCH_MAX_QUERIES} queries, got {len(queries)}"
+        )
+    param_sets = []
+    for index, query in enumerate(queries):
+        if not isinstance(query, dict):
+            raise ValueError(f"Query {index} is not an object")
+        # One engine and one enrich setting run the whole batch.
+        misplaced = [name for name in BATCH_OPTIONS if name in query]
+        if misplaced:
+            raise ValueError(
+                f"Query {index}: {', '.join(misplaced)} can only be set "
+                "for the whole batch"
+            )
+        # JSON can carry numbers, lists or objects; only strings go to the register.
+        wrong = [
+            name for name in SEARCH_PARAMS
+            if query.get(name) is not None and not isinstance(query[name], str)
+        ]
+        if wrong:
+            raise ValueError(
+                f"Query {index}: {', '.join(wrong)} must be a string or null"
+            )
+        query = {name: value for name, value in query.items() if value is not None}
         try:
-        # driver_path = ChromeDriverManager().install()
-        # logger.info(f"ChromeDriver path: {driver_path}")
-        # service = Service('/usr/local/bin/chromedriver')
-        # driver = webdriver.Chrome(service=service, options=options)
-            driver = webdriver.Chrome(options=options)
-        except Exception as e:
-            logger.error(f"Error installing ChromeDriver: {e}")
-            return jsonify({"error": str(e)}), 500
+            param_sets.append(option_catalog.validate(get_search_params(query)))
+        except ValueError as e:
+            raise ValueError(f"Query {index}: {e}")
+    options = parse_scrape_options(
+        {name: args[name] for name in BATCH_OPTIONS if name in args}
+    )
+    try:
+        workers = int(args.get('workers', BATCH_WORKERS))
+    except (TypeError, ValueError):
+        raise ValueError("workers must be an integer")
+    if options["engine"] == "browser":
+        # More workers than pooled sessions would only queue for a session.
+        workers = min(workers, driver_pool.size)
+    return {
+        "param_sets": param_sets,
+        "engine": options["engine"],
+        "enrich": options["enrich"],
+        "workers": max(1, workers),
+        "run_id": options["run_id"],
+    }
+
+
+def batch_search(engine, enrich=False, run_id=None):
+    # One query of a batch, answered the way /scrape would: snapshot, then
+    # result cache, then a live search on a pooled session.
+    def search(params):
+        snapshot = snapshot_store.current()
+        records = snapshot.query(params) if snapshot is not None else None
+        if records is not None:
+            if enrich:
+                records = detail_enricher.enrich(records)
+            return {"data": records, "source": "snapshot", "pages": 0}
+        key = cache_key(dict(params, enrich='1' if enrich else ''))
+        entry = scrape_cache.get(key)
+        if entry is not None:
+            return {"data": entry.value, "source": "cache", "pages": 0}
+        pages = []
+        data = run_scrape(params, engine, enrich, run_id, on_page=pages.append)
+        scrape_cache.put(key, data)
+        return {"data": data, "source": "live", "pages": len(pages)}
+    return search
+
+
+def run_scrape_batch(param_sets, engine, enrich=False, workers=BATCH_WORKERS,
+                     run_id=None, on_result=None):
+    started = time.monotonic()
+    queries = plan_batch(param_sets)
+    logger.info(
+        f"Running a batch of {len(queries)} queries ({len(param_sets)} requested) "
+        f"on {workers} workers."
+    )
+    results = []
+    for result in run_batch(queries, batch_search(engine, enrich, run_id), workers):
+        results.append(result)
+        if on_result:
+            on_result(result)
+    # Answer in request order, whatever order the queries finished in.
+    results.sort(key=lambda result: result["indexes"][0])
+    summary = batch_summary(results, time.monotonic() - started)
+    return {"queries": results, "summary": summary}
+
+
+def stream_scrape_batch(param_sets, engine, enrich=False, workers=BATCH_WORKERS,
+                        run_id=None):
+    # One NDJSON line per query as it finishes, then a summary line.
+    stack = ExitStack()
+    weight = session_count({"engine": engine, "workers": workers})
+    stack.enter_context(admission.slot(weight=weight))
+    queries = plan_batch(param_sets)
+
+    def generate():
+        started = time.monotonic()
+        results = []
+        with stack:
+            search = batch_search(engine, enrich, run_id)
+            for result in run_batch(queries, search, workers):
+                results.append(result)
+                yield json.dumps(result) + "\n"
+        summary = batch_summary(results, time.monotonic() - started)
+        logger.info(
+            f"Streamed a batch of {summary['queries']} queries, "
+            f"{summary['failed']} failed."
+        )
+        yield json.dumps({"summary": summary}) + "\n"
+
+    response = Response(
+        generate(), mimetype=NDJSON_MIMETYPE, headers=run_id_headers({"run_id": run_id})
+    )
+    # Frees the slot even if the client leaves before the first line.
+    response.call_on_close(stack.close)
+    return response
+
+
+def run_scrape(params, engine, enrich=False, run_id=None, on_page=None):
+    data = []
+    with open_checkpointed_pages(params, engine, run_id) as pages:
+        for page in pages:
+            data.extend(page)
+            if on_page:
+                on_page(page)
+    refresh_snapshot(params, data)
+    if enrich:
+        data = detail_enricher.enrich(data)
+    return data
 
-        
+
+def refresh_snapshot(params, data):
+    # Any finished unfiltered search is a full copy of the register.
+    if not any(params.values()) and data:
+        snapshot_store.replace(data)
+
+
+def run_crawl(params, engine, shard_by, workers, enrich=False, run_id=None,
+              on_page=None):
+    options = None
+    if shard_by in DROPDOWN_FIELDS and not params[shard_by]:
+        options = option_catalog.get()[shard_by]
+    snapshot = snapshot_store.current()
+    known_last_names = snapshot.last_names() if snapshot is not None else ()
+    shards = build_shards(shard_by, params, options, known_last_names)
+
+    # Each shard keeps its own checkpoint; a resumed crawl skips finished shards' pages.
+    def open_pages(shard_params, shard_engine):
+        return open_checkpointed_pages(shard_params, shard_engine, run_id)
+
+    result = crawl(shards, open_pages, engine, workers, on_page)
+    logger.info(
+        f"Crawl completed. Found {len(result['data'])} records across "
+        f"{len(shards)} shards in {result['seconds']}s "
+        f"({result['duplicates']} duplicates dropped)."
+    )
+    if result["complete"]:
+        refresh_snapshot(params, result["data"])
+    if enrich:
+        result["data"] = detail_enricher.enrich(result["data"])
+    return result
+
+
+def wants_stream(req):
+    if req.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return req.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def open_live_stream(params, engine, run_id=None):
+    # Pull the first page before answering, so setup failures still get a
+    # proper error status instead of a broken 200 stream. The caller closes
+    # the returned stack once the stream is done.
+    stack = ExitStack()
+    try:
+        stack.enter_context(admission.slot())
+        pages = stack.enter_context(open_checkpointed_pages(params, engine, run_id))
+        first_page = next(pages, [])
+    except BaseException:
+        if not stack.__exit__(*sys.exc_info()):
+            raise
+    return stack, itertools.chain([first_page], pages)
+
+
+def stream_scrape(params, engine, enrich=False, run_id=None):
+    stack, pages = open_live_stream(params, engine, run_id)
+
+    def generate():
+        started = time.monotonic()
+        page_count = 0
+        record_count = 0
+        error = None
         try:
-            driver.get("https://members.collegeofopticians.ca/Public-Register")
-            logger.info("Navigated to the public register page.")
-            
-            last_name = request.args.get('last_name', '')
-            first_name_contains = request.args.get('first_name_contains', '')
-            informal_name_contains = request.args.get('informal_name_contains', '')
-            registration_number = request.args.get('registration_number', '')
-            registration_class = request.args.get('registration_class', '')
-            registration_status = request.args.get('registration_status', '')
-            contact_lens_mentor = request.args.get('contact_lens_mentor', '')
-            area_of_service = request.args.get('area_of_service', '')
-            language_of_service = request.args.get('language_of_service', '')
-            practice_name = request.args.get('practice_name', '')
-            city_or_town = request.args.get('city_or_town', '')
-            postal_code = request.args.get('postal_code', '')
-            
-            # Fill out the form fields
-            driver.find_element(By.ID, 'ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input0_TextBox1').send_keys(last_name)
-            driver.find_element(By.ID, 'ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input1_TextBox1').send_keys(first_name_contains)
-            driver.find_element(By.ID, 'ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input2_TextBox1').send_keys(informal_name_contains)
-            driver.find_element(By.ID, 'ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input3_TextBox1').send_keys(registration_number)
-
-            set_dropdown_value(driver, 'ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input4_DropDown1', registration_class)
-            set_dropdown_value(driver, 'ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input5_DropDown1', registration_status)
-            set_dropdown_value(driver, 'ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input6_DropDown1', contact_lens_mentor)
-            set_dropdown_value(driver, 'ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input7_DropDown1', area_of_service)
-
-            driver.find_element(By.ID, 'ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input9_TextBox1').send_keys(practice_name)
-            driver.find_element(By.ID, 'ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input10_TextBox1').send_keys(city_or_town)
-            driver.find_element(By.ID, 'ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input11_TextBox1').send_keys(postal_code)
-            logger.info("Filled out the form fields.")
+            for page in pages:
+                page_count += 1
+                if enrich:
+                    page = detail_enricher.enrich(page)
+                for record in page:
+                    record_count += 1
+                    yield json.dumps(record) + "\n"
+        except GeneratorExit:
+            logger.info("Client went away, stopping the streamed scrape.")
+            stack.__exit__(*sys.exc_info())
+            raise
         except Exception as e:
-            logger.error(f"Error filling out form fields: {e}")
-            driver.quit()
-            return jsonify({"error": f"Error filling out form fields: {e}"}), 500
+            logger.error(f"Error during streamed scraping: {e}")
+            error = str(e)
+            stack.__exit__(*sys.exc_info())
+        else:
+            stack.close()
+        logger.info(f"Streamed {record_count} records from {page_count} pages.")
+        summary = {
+            "records": record_count,
+            "pages": page_count,
+            "seconds": round(time.monotonic() - started, 3),
+            "error": error,
+        }
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return Response(
+        generate(), mimetype=NDJSON_MIMETYPE, headers=run_id_headers({"run_id": run_id})
+    )
+
+
+@app.route("/scrape", methods=["GET"])
+def scrape():
+    logger.info("Starting the scraping process.")
+    try:
+        options = parse_scrape_options(request.args)
+        source = parse_source(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if source != "live" and not wants_stream(request):
+        response = snapshot_response(options["params"], source, options["enrich"])
+        if response is not None:
+            return response
+    key = cache_key(dict(options["params"], enrich='1' if options["enrich"] else ''))
+    bypass_cache = wants_fresh(request)
+    if not bypass_cache and not wants_stream(request):
+        entry = scrape_cache.get(key)
+        if entry is not None:
+            logger.info(f"Serving {len(entry.value)} records from the result cache.")
+            return cached_response(entry, "HIT")
+    try:
+        if wants_stream(request):
+            return stream_scrape(**options)
+        with admission.slot():
+            data = run_scrape(**options)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except PoolTimeout as e:
+        logger.error(f"Browser pool exhausted: {e}")
+        return overloaded_response(Overloaded(str(e), 503, admission.retry_after()))
+    except ScrapeError as e:
+        return jsonify({"error": str(e)}), 500, run_id_headers(options)
+    except Exception as e:
+        logger.error(f"Error during scraping: {e}")
+        return jsonify({"error": str(e)}), 500, run_id_headers(options)
+
+    logger.info(f"Scraping completed. Found {len(data)} records.")
+    entry = scrape_cache.put(key, data)
+    response = cached_response(entry, "BYPASS" if bypass_cache else "MISS")
+    response.headers.extend(run_id_headers(options))
+    return response
+
 
-        # Click the "Find" button
+def parse_keyset(args):
+    # An id cursor into scraped_data, as /records uses.
+    try:
+        after = int(args.get('after') or 0)
+        limit = int(args['limit']) if args.get('limit') else None
+    except ValueError:
+        raise ValueError("after and limit must be integers")
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be at least 1")
+    return after, limit
+
+
+def stored_filters(params):
+    unsupported = sorted(
+        name for name, value in params.items() if value and name not in STORED_FILTERS
+    )
+    if unsupported:
+        raise ValueError(
+            f"The stored records can't be filtered by {', '.join(unsupported)}"
+        )
+    return {STORED_FILTERS[name]: value for name, value in params.items() if value}
+
+
+def stored_export_pages(filters, after=0, limit=None, enrich=False):
+    # Walks scraped_data in id order, one EXPORT_BATCH_ROWS query at a time, so
+    # the whole table never sits in memory.
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = EXPORT_BATCH_ROWS
+        if remaining is not None:
+            size = min(size, remaining)
+        rows = records_reader.query(filters, after, size)
+        if rows:
+            yield detail_enricher.enrich(rows) if enrich else rows
+        if len(rows) < size:
+            return
+        after = rows[-1]["id"]
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def live_export_pages(stack, pages, enrich=False):
+    try:
+        for page in pages:
+            yield detail_enricher.enrich(page) if enrich else page
+    except GeneratorExit:
+        logger.info("Client went away, stopping the export.")
+        stack.__exit__(*sys.exc_info())
+        raise
+    except Exception as e:
+        # Cut the response short: a truncated gzip, zstd or Parquet payload fails
+        # to decode rather than passing for a complete export.
+        logger.error(f"Error during export: {e}")
+        stack.__exit__(*sys.exc_info())
+        raise
+    else:
+        stack.close()
+
+
+def snapshot_export_pages(records, enrich=False):
+    for page in batches(records):
+        yield detail_enricher.enrich(page) if enrich else page
+
+
+@app.route("/export", methods=["GET"])
+def export_records():
+    try:
+        options = parse_scrape_options(request.args)
+        source = parse_source(request.args, EXPORT_SOURCES)
+        fmt = negotiate_format(request.args.get('format'), request.accept_mimetypes)
+        after, limit = parse_keyset(request.args)
+        if after or limit:
+            if source not in ("auto", "stored"):
+                raise ValueError(
+                    "after and limit page through the stored records (source=stored)"
+                )
+            source = "stored"
+        if source == "stored":
+            filters = stored_filters(options["params"])
+    except NotAcceptable as e:
+        return jsonify({"error": str(e), "formats": available_formats()}), 406
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    encoding = negotiate_encoding(fmt, request.accept_encodings)
+    headers = {
+        "Vary": "Accept, Accept-Encoding",
+        "Content-Disposition": (
+            f'attachment; filename="register.{FILE_EXTENSIONS[fmt]}"'
+        ),
+    }
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+
+    pages = None
+    if source == "stored":
+        if not records_reader.available():
+            return database_unavailable("Records")
         try:
-            find_button = WebDriverWait(driver, 60).until(
-                EC.element_to_be_clickable((By.XPATH, '//input[@value="Find"]'))
-            )
-            find_button.click()
-            logger.info("Clicked the 'Find' button.")
+            next_cursor = None
+            if limit:
+                next_cursor = records_reader.next_cursor(filters, after, limit)
+            # Read the first page before answering, so a database error gets a status.
+            stored_pages = stored_export_pages(filters, after, limit, options["enrich"])
+            pages = itertools.chain([next(stored_pages, [])], stored_pages)
         except Exception as e:
-            logger.error(f"Error clicking 'Find' button: {e}")
-            driver.quit()
-            return jsonify({"error": f"Error clicking 'Find' button: {e}"}), 500
+            logger.error(f"Error reading records: {e}")
+            return jsonify({"error": "Error reading records"}), 502
+        logger.info(f"Exporting stored records after id {after} as {fmt}.")
+        headers["X-Source"] = "stored"
+        if next_cursor:
+            headers["X-Next-Cursor"] = str(next_cursor)
+    elif source != "live":
+        snapshot = snapshot_store.current()
+        records = snapshot.query(options["params"]) if snapshot is not None else None
+        if records is not None:
+            logger.info(
+                f"Exporting {len(records)} records from the register snapshot as {fmt}."
+            )
+            pages = snapshot_export_pages(records, options["enrich"])
+            headers["X-Source"] = "snapshot"
+            headers["X-Snapshot-Age"] = str(int(snapshot.age()))
+        elif source == "snapshot":
+            return jsonify({"error": "No fresh snapshot can answer this query"}), 409
 
-        # Wait for the table to appear
+    if pages is None:
         try:
-            WebDriverWait(driver, 2000).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody"))
+            stack, live_pages = open_live_stream(
+                options["params"], options["engine"], options["run_id"]
             )
-            logger.info("Table appeared.")
+        except Overloaded as e:
+            return overloaded_response(e)
+        except PoolTimeout as e:
+            logger.error(f"Browser pool exhausted: {e}")
+            return overloaded_response(Overloaded(str(e), 503, admission.retry_after()))
         except Exception as e:
-            logger.error(f"Error waiting for table: {e}")
-            driver.quit()
-            return jsonify({"error": f"Error waiting for table: {e}"}), 500
+            logger.error(f"Error starting the export: {e}")
+            return jsonify({"error": str(e)}), 500
+        logger.info(f"Exporting a live scrape as {fmt}.")
+        pages = live_export_pages(stack, live_pages, options["enrich"])
+        headers["X-Source"] = "live"
+
+    content_type = FORMATS[fmt]
+    if fmt in ("ndjson", "csv"):
+        content_type += "; charset=utf-8"
+    return Response(
+        export_stream(pages, fmt, encoding, export_fields(options["enrich"])),
+        content_type=content_type,
+        headers=headers,
+    )
+
+
+@app.route("/scrape/batch", methods=["POST"])
+def scrape_batch():
+    args = request.get_json(silent=True)
+    if args is None:
+        return jsonify({"error": "Expected a JSON body with a queries list"}), 400
+    try:
+        options = parse_batch_options(args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        if wants_stream(request):
+            return stream_scrape_batch(**options)
+        with admission.slot(weight=session_count(options)):
+            result = run_scrape_batch(**options)
+    except Overloaded as e:
+        return overloaded_response(e)
+    return jsonify(result), 200, run_id_headers(options)
+
+
+def overloaded_response(error):
+    logger.warning(f"Turning a request away: {error}")
+    headers = {"Retry-After": str(error.retry_after)}
+    return jsonify({"error": str(error)}), error.status, headers
+
+
+def database_unavailable(what):
+    return jsonify({
+        "error": f"{what} are not available: DATABASE_URL is not set "
+                 "or psycopg2 is missing"
+    }), 503
+
+
+def wants_fresh(req):
+    if req.args.get('cache', '').lower() in ('0', 'false', 'no'):
+        return True
+    return 'no-cache' in req.headers.get('Cache-Control', '')
+
+
+def cached_response(entry, cache_status):
+    max_age = max(0, int(scrape_cache.ttl - (time.time() - entry.stored_at)))
+    # Weak comparison, as RFC 9110 asks for: compressed copies carry a weak ETag.
+    if request.if_none_match.contains_weak(entry.etag):
+        response = Response(status=304)
+    else:
+        response = jsonify({"data": entry.value})
+    response.set_etag(entry.etag)
+    response.headers["Cache-Control"] = f"public, max-age={max_age}"
+    response.headers["X-Cache"] = cache_status
+    return response
+
+
+@app.route("/crawl", methods=["GET"])
+def crawl_register():
+    logger.info("Starting a sharded crawl.")
+    try:
+        options = parse_crawl_options(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        with admission.slot(weight=session_count(options)):
+            result = run_crawl(**options)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except ScrapeError as e:
+        return jsonify({"error": str(e)}), 500, run_id_headers(options)
+    return jsonify(result), 200, run_id_headers(options)
+
+
+def session_count(options):
+    # Sessions a batch or crawl keeps busy at once: each of its workers holds a
+    # pooled browser. HTTP searches and single scrapes count as one.
+    if options.get("engine") != "browser":
+        return 1
+    return max(1, min(options.get("workers", 1), driver_pool.size))
+
+
+def run_job(kind, options, progress):
+    counts = {"pages": 0, "records": 0}
+    lock = threading.Lock()
+
+    def on_page(page, pages=1):
+        # Crawl shards and batch queries report from several threads at once.
+        with lock:
+            counts["pages"] += pages
+            counts["records"] += len(page)
+            progress(counts["pages"], counts["records"])
+
+    # Jobs queued before run ids existed carried a resume flag instead.
+    options = dict(options)
+    options.pop("resume", None)
+    options.setdefault("run_id", uuid.uuid4().hex)
+    # Jobs wait for a slot as long as it takes; there's no client holding a socket.
+    with admission.slot(timeout=None, weight=session_count(options)):
+        if kind == "batch":
+            return run_scrape_batch(
+                **options,
+                on_result=lambda result: on_page(result["data"], result["pages"]),
+            )
+        if kind == "crawl":
+            return run_crawl(**options, on_page=on_page)
+        return {"data": run_scrape(**options, on_page=on_page)}
+
+
+job_queue = JobQueue(
+    JobStore(os.getenv("JOBS_DB_PATH", "jobs.db")),
+    run_job,
+    workers=int(os.getenv("JOB_WORKERS", "1")),
+    lease=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+)
+
+
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    args = request.get_json(silent=True) or request.values
+    kind = args.get('kind', 'scrape')
+    try:
+        if kind == "crawl":
+            options = parse_crawl_options(args)
+        elif kind == "scrape":
+            options = parse_scrape_options(args)
+        elif kind == "batch":
+            options = parse_batch_options(args)
+        else:
+            raise ValueError(
+                f"Unknown job kind '{kind}', expected 'scrape', 'crawl' or 'batch'"
+            )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Every job is its own run: a job requeued after a crash continues from its
+    # checkpoint, and identical jobs running at once don't share one.
+    options["run_id"] = options.get("run_id") or uuid.uuid4().hex
+    job_queue.start()
+    job = job_queue.submit(kind, options)
+    return jsonify(job), 202, {"Location": f"/jobs/{job['id']}"}
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job)
+
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def get_job_result(job_id):
+    job = job_queue.store.get(job_id, with_result=True)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    if job["status"] == "failed":
+        return jsonify({"error": job["error"], "status": job["status"]}), 500
+    if job["status"] != "succeeded":
+        error = f"Job {job_id} is {job['status']}"
+        return jsonify({"error": error, "status": job["status"]}), 409
+    return jsonify(job["result"])
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.monotonic()
+
+
+@app.after_request
+def compress_json(response):
+    # Full-register JSON bodies (scrape results, job results) shrink roughly
+    # tenfold; requests-based clients such as the Lambda decode gzip transparently.
+    if (response.direct_passthrough or response.is_streamed
+            or response.mimetype != "application/json"
+            or "Content-Encoding" in response.headers):
+        return response
+    encoding = negotiate_encoding("ndjson", request.accept_encodings)
+    if encoding == "identity" or (response.content_length or 0) < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(compress_body(response.get_data(), encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # Same content, different bytes.
+        response.set_etag(etag, weak=True)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+@app.after_request
+def record_request_time(response):
+    # Streamed responses are timed up to their first page, not the last line.
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.request_seconds.observe(
+        time.monotonic() - g.request_started,
+        method=request.method, endpoint=endpoint, status=response.status_code,
+    )
+    return response
+
+
+for name, documentation, read in [
+    ("scraper_pool_idle_sessions", "Idle pooled browser sessions.",
+     lambda: driver_pool.stats()["idle"]),
+    ("scraper_pool_busy_sessions", "Pooled browser sessions in use.",
+     lambda: driver_pool.stats()["in_use"]),
+    ("scraper_admission_running", "Scrapes holding an admission slot.",
+     lambda: admission.stats()["running"]),
+    ("scraper_admission_waiting", "Scrapes queued for an admission slot.",
+     lambda: admission.stats()["waiting"]),
+    ("scraper_cache_hit_ratio", "Result cache hit ratio.",
+     lambda: scrape_cache.stats()["hit_ratio"]),
+]:
+    metrics.registry.register(metrics.Gauge(name, documentation, read))
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/checkpoints", methods=["GET"])
+def list_checkpoints():
+    return jsonify({"checkpoints": checkpoint_store.list()})
+
+
+@app.route("/checkpoints/<key>/resume", methods=["POST"])
+def resume_checkpoint(key):
+    checkpoint = checkpoint_store.get(key)
+    if checkpoint is None:
+        return jsonify({"error": f"Checkpoint {key} not found"}), 404
+    job_queue.start()
+    job = job_queue.submit("scrape", {
+        "params": checkpoint["params"],
+        "engine": checkpoint["engine"],
+        "enrich": False,
+        "run_id": checkpoint["run_id"] or uuid.uuid4().hex,
+    })
+    return jsonify(job), 202, {"Location": f"/jobs/{job['id']}"}
+
+
+@app.route("/checkpoints/<key>", methods=["DELETE"])
+def delete_checkpoint(key):
+    checkpoint_store.clear(key)
+    return "", 204
+
+
+@app.route("/pool", methods=["GET"])
+def pool_stats():
+    return jsonify(dict(
+        driver_pool.stats(), page_waits=wait_stats.stats(), admission=admission.stats()
+    ))
+
 
-        # Extract data from the first page
+@app.route("/cache", methods=["GET"])
+def cache_stats():
+    return jsonify(scrape_cache.stats())
+
+
+@app.route("/snapshot", methods=["GET"])
+def snapshot_status():
+    return jsonify(snapshot_store.status())
+
+
+@app.route("/snapshot", methods=["PUT"])
+def replace_snapshot():
+    # A fan-out crawl only sends each node filtered units, so no node sees the
+    # whole register; the Lambda puts the merged crawl back here instead.
+    if not SNAPSHOT_TOKEN:
+        error = "PUT /snapshot is disabled: SNAPSHOT_TOKEN is not set"
+        return jsonify({"error": error}), 403
+    token = request.headers.get("X-Snapshot-Token", "")
+    if not hmac.compare_digest(token.encode("utf-8"), SNAPSHOT_TOKEN.encode("utf-8")):
+        return jsonify({"error": "Missing or wrong X-Snapshot-Token"}), 401
+    payload = request.get_json(silent=True)
+    data = payload.get("data") if isinstance(payload, dict) else None
+    if not isinstance(data, list) or not data:
+        return jsonify({"error": "data must be a non-empty list of records"}), 400
+    for index, record in enumerate(data):
+        valid = isinstance(record, dict) and all(
+            isinstance(record.get(field), str) for field in RECORD_FIELDS
+        )
+        if not valid:
+            error = f"Record {index} needs {', '.join(RECORD_FIELDS)}"
+            return jsonify({"error": error}), 400
+    snapshot_store.replace(data)
+    return jsonify(snapshot_store.status())
+
+
+@app.route("/options", methods=["GET"])
+def dropdown_options():
+    refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+    try:
+        options = option_catalog.get(refresh=refresh)
+    except Exception as e:
+        logger.error(f"Error loading dropdown options: {e}")
+        return jsonify({"error": f"Error loading dropdown options: {e}"}), 502
+    age = option_catalog.age()
+    return jsonify(
+        {"options": options, "age": round(age, 1), "ttl": option_catalog.ttl}
+    )
+
+
+@app.route("/changes", methods=["GET"])
+def list_changes():
+    # The history the Lambda's sync load writes to scraped_data_changes.
+    if not records_reader.available():
+        return database_unavailable("Changes")
+    try:
+        since = parse_since(request.args['since']) if request.args.get('since') else 0.0
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        after = int(request.args.get('after', 0))
+        limit = int(request.args.get('limit', 1000))
+    except ValueError:
+        return jsonify({"error": "after and limit must be integers"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be at least 1"}), 400
+    limit = min(limit, 10000)
+    change = request.args.get('change') or None
+    if change is not None and change not in CHANGE_TYPES:
+        error = f"Unknown change '{change}', expected one of {CHANGE_TYPES}"
+        return jsonify({"error": error}), 400
+    try:
+        events = records_reader.changes(since, after, limit, change)
+    except Exception as e:
+        logger.error(f"Error reading changes: {e}")
+        return jsonify({"error": "Error reading changes"}), 502
+    # A full page means there may be more: continue with after=next_after.
+    next_after = events[-1]["id"] if len(events) == limit else None
+    return jsonify({"changes": events, "next_after": next_after})
+
+
+@app.route("/records", methods=["GET"])
+def list_records():
+    # The rows the Lambda loaded into scraped_data, filtered and paged by id.
+    if not records_reader.available():
+        return database_unavailable("Records")
+    try:
+        after = int(request.args.get('after', 0))
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({"error": "after and limit must be integers"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be at least 1"}), 400
+    limit = min(limit, 1000)
+    filters = {
+        name: request.args.get(name, '').strip()
+        for name in EXACT_FILTERS + ['name', 'q']
+    }
+    include_removed = request.args.get('include_removed') == '1'
+    try:
+        records = records_reader.query(filters, after, limit, include_removed)
+    except Exception as e:
+        logger.error(f"Error reading records: {e}")
+        return jsonify({"error": "Error reading records"}), 502
+    next_after = records[-1]["id"] if len(records) == limit else None
+    return jsonify({"data": records, "next_after": next_after})
+
+
+# Fills every text field and picks every dropdown option (by visible text) in one
+# WebDriver round trip, firing the input/change events typing and clicking would.
+FILL_FORM_SCRIPT = """
+const [texts, dropdowns] = arguments;
+const missing = [];
+const unmatched = [];
+const fire = (element, type) => element.dispatchEvent(new Event(type, {bubbles: true}));
+for (const [id, value] of Object.entries(texts)) {
+    const input = document.getElementById(id);
+    if (!input) {
+        missing.push(id);
+        continue;
+    }
+    input.value = value;
+    fire(input, "input");
+    fire(input, "change");
+}
+for (const [id, label] of Object.entries(dropdowns)) {
+    const select = document.getElementById(id);
+    if (!select) {
+        missing.push(id);
+        continue;
+    }
+    const option = Array.from(select.options).find((o) => o.text.trim() === label);
+    if (!option) {
+        unmatched.push(id);
+        continue;
+    }
+    select.value = option.value;
+    fire(select, "change");
+}
+return {missing: missing, unmatched: unmatched};
+"""
+
+
+def fill_search_form(driver, params):
+    texts = {field_id: params[param] for param, field_id in TEXT_FIELDS.items()}
+    dropdowns = {
+        dropdown_id: params[param]
+        for param, dropdown_id in DROPDOWN_FIELDS.items()
+        if params[param]
+    }
+    try:
+        with metrics.form_fill_seconds.time():
+            result = driver.execute_script(FILL_FORM_SCRIPT, texts, dropdowns)
+    except Exception as e:
+        logger.error(f"Error filling out form fields: {e}")
+        metrics.errors_total.inc(stage="form_fill")
+        raise ScrapeError(f"Error filling out form fields: {e}")
+    if result["missing"]:
+        metrics.errors_total.inc(stage="form_fill")
+        raise ScrapeError(
+            f"Error filling out form fields: no elements with ids {result['missing']}"
+        )
+    for dropdown_id in result["unmatched"]:
+        logger.warning(
+            f"Value '{dropdowns[dropdown_id]}' not found in options for {dropdown_id}"
+        )
+    logger.info("Filled out the form fields.")
+
+
+def iter_result_pages(driver, params, skip_pages=0):
+    # Pages up to skip_pages are paged through without extracting them.
+    fill_search_form(driver, params)
+
+    # Click the "Find" button
+    try:
+        with metrics.find_click_seconds.time():
+            find_button = wait_until(
+                driver, clickable((By.XPATH, '//input[@value="Find"]')), "find_button"
+            )
+            postback = PostbackWatcher(driver)
+            find_button.click()
+        logger.info("Clicked the 'Find' button.")
+    except Exception as e:
+        logger.error(f"Error clicking 'Find' button: {e}")
+        metrics.errors_total.inc(stage="find_click")
+        raise ScrapeError(f"Error clicking 'Find' button: {e}")
+
+    # Wait for the search postback to replace the form with the results grid
+    try:
+        wait_until(driver, postback, "results")
+        logger.info("Table appeared.")
+    except Exception as e:
+        logger.error(f"Error waiting for table: {e}")
+        metrics.errors_total.inc(stage="results_wait")
+        raise ScrapeError(f"Error waiting for table: {e}")
+
+    # Extract data from the first page
+    if skip_pages < 1:
         try:
-            data = extract_table_data(driver)
-            logger.info(f"Extracted {len(data)} records from the first page.")
+            with metrics.page_extract_seconds.time(engine="browser"):
+                page = extract_table_data(driver)
+            logger.info(f"Extracted {len(page)} records from the first page.")
         except Exception as e:
             logger.error(f"Error extracting table data: {e}")
-            driver.quit()
-            return jsonify({"error": f"Error extracting table data: {e}"}), 500
-        
-        # Check for pagination and navigate if necessary
+            metrics.errors_total.inc(stage="extract")
+            raise ScrapeError(f"Error extracting table data: {e}")
+        yield page
+
+    # Check for pagination and navigate if necessary
+    page_number = 1
+    while True:
         try:
-            while True:
-                try:
-                    logger.info("Checking for 'Next Page' button.")
-                    next_button = WebDriverWait(driver, 60).until(
-                        EC.element_to_be_clickable((By.CSS_SELECTOR, "input[title='Next Page']"))
-                    )
-                    logger.info("Found 'Next Page' button.")
-                    retries = 3
-                    while retries > 0:
-                        try:
-                            next_button.click()
-                            logger.info("Clicked 'Next Page' button.")
-                            WebDriverWait(driver, 2000).until(
-                                EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody"))
-                            )
-                            logger.info("Next page appeared.")
-                            data.extend(extract_table_data(driver))
-                            logger.info("Extracted data from next page, Navigating to next page.") 
-                            break
-                        except StaleElementReferenceException:
-                            retries -= 1
-                            time.sleep(1)
-                        except Exception as e:
-                            logger.error(f"Error during pagination: {e}")
-                            break
-                    else:
-                        logger.info("No more pages to navigate or retries exhausted.")
-                        break
-                except Exception as e:
-                    logger.info(f"No more pages to navigate or error occurred: {e}")
-                    break
+            postback = PostbackWatcher(driver)
+            if not click_fresh(driver, next_page_button):
+                logger.info("No more pages to navigate.")
+                return
+            logger.info("Clicked 'Next Page' button.")
+            wait_until(driver, postback, "next_page")
+            page_number += 1
+            if page_number <= skip_pages:
+                continue
+            with metrics.page_extract_seconds.time(engine="browser"):
+                page = extract_table_data(driver)
+            logger.info(f"Extracted {len(page)} records from page {page_number}.")
         except Exception as e:
+            # Raise rather than end quietly, so the checkpoint survives for a resume.
             logger.error(f"Error during pagination: {e}")
+            metrics.errors_total.inc(stage="pagination")
+            raise ScrapeError(f"Error during pagination after page {page_number}: {e}")
+        yield page
+
+
+# Reads every result row in the browser and hands back plain arrays, so a page
+# costs one WebDriver round trip instead of several per cell.
+EXTRACT_TABLE_SCRIPT = """
+const pageData = [];
+for (const row of document.querySelectorAll("table tbody tr")) {
+    const columns = row.querySelectorAll("td[role='gridcell']");
+    if (columns.length === 0) {
+        continue;
+    }
+    const text = (i) => (columns[i] ? columns[i].innerText : "");
+    const link = columns.length > 4 ? columns[4].querySelector("a") : null;
+    const href = link && link.href ? link.href : "";
+    pageData.push([text(0), text(1), text(2), text(3), href]);
+}
+return pageData;
+"""
 
-        driver.quit()
-        logger.info(f"Scraping completed. Found {len(data)} records.")
-        return jsonify({"data": data})
-    except Exception as e:
-        logger.error(f"Error during scraping: {e}")
-        driver.quit()
-        return jsonify({"error": str(e)}), 500
 
-def set_dropdown_value(driver, dropdown_id, value):
-    try:
-        select_element = Select(driver.find_element(By.ID, dropdown_id))
-        options = [option.text for option in select_element.options]
-        logger.info(f"Available options for {dropdown_id}: {options}")
-        if value in options:
-            select_element.select_by_visible_text(value)
-        else:
-            logger.warning(f"Value '{value}' not found in options for {dropdown_id}")
-    except NoSuchElementException as e:
-        logger.error(f"Dropdown with id {dropdown_id} not found: {e}")
-        raise e
-    
 def extract_table_data(driver):
-    rows = driver.find_elements(By.CSS_SELECTOR, "table tbody tr")
+    rows = driver.execute_script(EXTRACT_TABLE_SCRIPT) or []
     page_data = []
-    for row in rows:
-        columns = row.find_elements(By.CSS_SELECTOR, "td[role='gridcell']")
-        if len(columns) == 0:
-            continue  # Skip rows without valid columns
-        registrant = columns[0].text.strip()
-        status = columns[1].text.strip()
-        reg_class = columns[2].text.strip()
-        location = columns[3].text.strip()
-        details_link = (
-            columns[4].find_element(By.TAG_NAME, "a").get_attribute("href").strip()
-            if len(columns) > 4 and columns[4].find_elements(By.TAG_NAME, "a")
-            else ""
-        )
+    for registrant, status, reg_class, location, details_link in rows:
         page_data.append(
             {
-                "registrant": registrant,
-                "status": status,
-                "class": reg_class,
-                "location": location,
-                "details_link": details_link,
+                "registrant": registrant.strip(),
+                "status": status.strip(),
+                "class": reg_class.strip(),
+                "location": location.strip(),
+                "details_link": details_link.strip(),
             }
         )
     return page_data
 
+
+def start_services():
+    # Called once per serving process, by __main__ or gunicorn's post_worker_init.
+    driver_pool.warm()
+    job_queue.start()
+
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    start_services()
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")))
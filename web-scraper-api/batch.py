@@ -0,0 +1,64 @@
+from cache import cache_key
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def plan_batch(param_sets):
+    # Identical searches (after trimming) run once; indexes map each result back
+    # to its positions in the request.
+    queries = {}
+    for index, params in enumerate(param_sets):
+        key = cache_key(params)
+        if key not in queries:
+            queries[key] = {"key": key, "params": params, "indexes": []}
+        queries[key]["indexes"].append(index)
+    return list(queries.values())
+
+
+def run_query(query, search):
+    # search(params) returns {"data": [...], "source": ..., "pages": ...}.
+    started = time.monotonic()
+    result = dict(
+        query, status="ok", source=None, records=0, pages=0, error=None, data=[]
+    )
+    try:
+        outcome = search(query["params"])
+        result.update(
+            source=outcome["source"], pages=outcome["pages"],
+            records=len(outcome["data"]), data=outcome["data"],
+        )
+    except Exception as e:
+        logger.error(f"Batch query {query['key'][:12]} failed: {e}")
+        result.update(status="error", error=str(e))
+    result["seconds"] = round(time.monotonic() - started, 3)
+    return result
+
+
+def run_batch(queries, search, workers=2):
+    # Yields each query's result as soon as it finishes. Closing the generator
+    # early cancels the queries that haven't started.
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, workers), thread_name_prefix="batch"
+    )
+    futures = [executor.submit(run_query, query, search) for query in queries]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def batch_summary(results, seconds):
+    failed = [result["key"] for result in results if result["status"] == "error"]
+    return {
+        "queries": len(results),
+        "failed": len(failed),
+        "records": sum(result["records"] for result in results),
+        "seconds": round(seconds, 3),
+        "complete": not failed,
+    }
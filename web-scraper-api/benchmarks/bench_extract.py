@@ -0,0 +1,99 @@
+"""Compare per-page table extraction: per-element WebDriver calls vs one script.
+
+Loads the saved results page fixture in headless Chrome, pads the grid to the
+requested number of rows and times both extraction strategies on it.
+
+    python benchmarks/bench_extract.py --rows 20 --repeat 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from selenium.webdriver.common.by import By  # noqa: E402
+
+from app import extract_table_data  # noqa: E402
+from driver_pool import create_driver  # noqa: E402
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), "..", "fixtures", "results_page1.html"
+)
+
+PAD_ROWS_SCRIPT = """
+const tbody = document.querySelector("table.rgMasterTable tbody");
+const template = tbody.querySelector("tr.rgRow");
+while (tbody.querySelectorAll("td[role='gridcell']").length / 5 < arguments[0]) {
+    tbody.appendChild(template.cloneNode(true));
+}
+"""
+
+
+def extract_table_data_per_element(driver):
+    # The original implementation: one WebDriver round trip per lookup.
+    rows = driver.find_elements(By.CSS_SELECTOR, "table tbody tr")
+    page_data = []
+    for row in rows:
+        columns = row.find_elements(By.CSS_SELECTOR, "td[role='gridcell']")
+        if len(columns) == 0:
+            continue
+        details_link = (
+            columns[4].find_element(By.TAG_NAME, "a").get_attribute("href").strip()
+            if len(columns) > 4 and columns[4].find_elements(By.TAG_NAME, "a")
+            else ""
+        )
+        page_data.append(
+            {
+                "registrant": columns[0].text.strip(),
+                "status": columns[1].text.strip(),
+                "class": columns[2].text.strip(),
+                "location": columns[3].text.strip(),
+                "details_link": details_link,
+            }
+        )
+    return page_data
+
+
+def time_extraction(extract, driver, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = extract(driver)
+        timings.append(time.perf_counter() - started)
+    return timings, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    driver = create_driver()
+    try:
+        driver.get("file://" + os.path.abspath(FIXTURE))
+        driver.execute_script(PAD_ROWS_SCRIPT, args.rows)
+
+        old_timings, old_result = time_extraction(
+            extract_table_data_per_element, driver, args.repeat
+        )
+        new_timings, new_result = time_extraction(
+            extract_table_data, driver, args.repeat
+        )
+    finally:
+        driver.quit()
+
+    assert old_result == new_result, "extraction strategies disagree"
+    old_median = statistics.median(old_timings)
+    new_median = statistics.median(new_timings)
+    print(f"rows per page:        {len(new_result)}")
+    print(f"per-element (median): {old_median * 1000:.1f} ms")
+    print(f"single script (median): {new_median * 1000:.1f} ms")
+    print(f"speedup:              {old_median / new_median:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
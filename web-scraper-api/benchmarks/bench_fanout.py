@@ -0,0 +1,147 @@
+"""Benchmark the Lambda's multi-node crawl fan-out against local API instances.
+
+Starts benchmarks/fake_register.py in-process and several `python app.py`
+processes pointed at it (HTTP engine, one port and scratch directory each). It
+then runs the Lambda handler for an unfiltered crawl with `endpoints` set to the
+first 1, 2, ... N of them, so throughput can be compared as nodes are added. The
+rds-data client is the same in-memory stand-in bench_register.py uses.
+
+--kill-node stops one node shortly after the last run starts: its units are
+reassigned and its queue stolen by the others, and the crawl still completes.
+
+    python benchmarks/bench_fanout.py --nodes 3 --rows 2000 --latency 0.05
+    python benchmarks/bench_fanout.py --nodes 3 --concurrency 2 --kill-node
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(HERE, "..")
+sys.path.insert(0, API_DIR)
+sys.path.insert(0, os.path.join(HERE, "..", "..", "cdk-infra", "lambda"))
+
+from bench_register import FakeRdsData, free_port, report  # noqa: E402
+
+
+def start_node(register_url, concurrency):
+    # Each node gets its own port, job queue and snapshot, like a separate host.
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="bench-node-")
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        REGISTER_URL=register_url,
+        SCRAPER_ENGINE="http",
+        DRIVER_POOL_SIZE="0",
+        JOB_WORKERS=str(concurrency),
+    )
+    for name, filename in [
+        ("JOBS_DB_PATH", "jobs.db"), ("SNAPSHOT_PATH", "snapshot.json"),
+        ("CHECKPOINT_PATH", "checkpoints.db"), ("DETAIL_CACHE_PATH", "details.db"),
+    ]:
+        env[name] = os.path.join(workdir, filename)
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(API_DIR, "app.py")],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+def wait_healthy(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/pool", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    sys.exit(f"{url} did not come up within {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="units each node runs at once")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="seconds the stand-in adds per request")
+    parser.add_argument(
+        "--shard-by", default="last_name",
+        choices=("last_name", "registration_status", "registration_class"),
+    )
+    parser.add_argument("--kill-node", action="store_true",
+                        help="stop one node during the last run")
+    args = parser.parse_args()
+
+    os.environ["HEALTH_CHECK_INTERVAL"] = "2"
+    from fake_register import create_app, serve  # noqa: E402
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    register_server, register_url = serve(
+        create_app(args.rows, args.page_size, args.latency)
+    )
+    nodes = [
+        start_node(f"{register_url}/Public-Register", args.concurrency)
+        for _ in range(args.nodes)
+    ]
+    try:
+        for _, url in nodes:
+            wait_healthy(url)
+
+        os.environ.update({
+            "DB_CLUSTER_ARN": "arn:aws:rds:local:000000000000:cluster:bench",
+            "DB_SECRET_ARN": "arn:aws:secretsmanager:local:000000000000:secret:bench",
+            "DB_NAME": "bench",
+        })
+        import lambda_function  # noqa: E402
+
+        pages_per_run = max(1, math.ceil(args.rows / args.page_size))
+        print(f"stand-in: {args.rows} rows, {args.page_size} per page, "
+              f"{args.latency * 1000:.0f}ms latency; "
+              f"{args.nodes} nodes x {args.concurrency}, shard by {args.shard_by}")
+        for count in range(1, args.nodes + 1):
+            endpoints = ",".join(
+                f"{url}={args.concurrency}" for _, url in nodes[:count]
+            )
+            killer = None
+            if args.kill_node and count == args.nodes and count > 1:
+                killer = threading.Timer(1.0, nodes[-1][0].terminate)
+                killer.start()
+            lambda_function._rds_data_client = rds = FakeRdsData()
+            started = time.perf_counter()
+            event = {"endpoints": endpoints, "shard_by": args.shard_by}
+            result = lambda_function.lambda_handler(event, None)
+            seconds = time.perf_counter() - started
+            body = json.loads(result["body"])
+            if result["statusCode"] != 200:
+                sys.exit(f"{count} nodes failed: {body}")
+            label = f"{count} node{'s' if count > 1 else ''}"
+            report(label, [seconds], rds.rows, pages_per_run)
+            for url, stats in body["nodes"].items():
+                print(f"               {url}: {stats['units']} units "
+                      f"({stats['stolen']} stolen, {stats['failed']} failed), "
+                      f"{stats['records']} records, healthy={stats['healthy']}")
+            if killer is not None:
+                killer.join()
+    finally:
+        for process, _ in nodes:
+            process.terminate()
+            process.wait()
+        register_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
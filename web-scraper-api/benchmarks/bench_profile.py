@@ -0,0 +1,95 @@
+"""Compare headless Chrome memory and page-load time for the full and lean profiles.
+
+Launches one browser per profile, loads the page several times and reports the
+median load time and the resident memory of the whole browser process tree
+(chromedriver, browser, renderers, GPU/utility processes). Linux only, since it
+reads /proc.
+
+    python benchmarks/bench_profile.py --repeat 5
+    python benchmarks/bench_profile.py --url file:///path/to/page.html
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from driver_pool import CHROME_PROFILES, create_driver  # noqa: E402
+from register import REGISTER_URL  # noqa: E402
+
+
+def child_pids():
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields resume after ")".
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def tree_rss_mb(root_pid):
+    children = child_pids()
+    total_kb = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+def measure(profile, url, repeat):
+    started = time.perf_counter()
+    driver = create_driver(profile)
+    startup = time.perf_counter() - started
+    try:
+        loads = []
+        for _ in range(repeat):
+            driver.get("about:blank")
+            started = time.perf_counter()
+            driver.get(url)
+            loads.append(time.perf_counter() - started)
+        rss = tree_rss_mb(driver.service.process.pid)
+    finally:
+        driver.quit()
+    return {"startup": startup, "load_median": statistics.median(loads), "rss_mb": rss}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=REGISTER_URL)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {
+        profile: measure(profile, args.url, args.repeat)
+        for profile in reversed(CHROME_PROFILES)
+    }
+    print(f"{'profile':<8} {'startup':>10} {'load (median)':>14} {'RSS':>10}")
+    for profile, result in results.items():
+        print(
+            f"{profile:<8} {result['startup'] * 1000:>8.0f}ms "
+            f"{result['load_median'] * 1000:>12.0f}ms "
+            f"{result['rss_mb']:>8.0f}MB"
+        )
+    full, lean = results["full"], results["lean"]
+    print(f"load time: {full['load_median'] / lean['load_median']:.1f}x faster, "
+          f"memory: {full['rss_mb'] - lean['rss_mb']:.0f}MB less per session")
+
+
+if __name__ == "__main__":
+    main()
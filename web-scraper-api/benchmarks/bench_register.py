@@ -0,0 +1,193 @@
+"""Benchmark /scrape and the Lambda loader against the local register stand-in.
+
+Starts benchmarks/fake_register.py on a free port, points the API at it through
+REGISTER_URL and reports pages/sec, records/sec, p50/p95 latency and peak RSS for:
+
+- /scrape (live, uncached) through the Flask app,
+- the Lambda handler streaming /scrape into the loader (stream mode),
+- the Lambda handler running a crawl job and loading its result (job mode).
+
+The Lambda talks to the API over real HTTP; its rds-data client is replaced by an
+in-memory one with optional per-call latency, so the numbers cover the loader
+rather than a database. The browser engine needs a local Chrome and chromedriver.
+
+    python benchmarks/bench_register.py --rows 2000 --page-size 25 --latency 0.05
+    python benchmarks/bench_register.py --engine browser --requests 3
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import resource
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "cdk-infra", "lambda"))
+
+
+class FakeRdsData:
+    # Answers the loader's statements in memory; latency stands in for the
+    # rds-data round trip.
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.rows = 0
+
+    def execute_statement(self, sql, parameters, **target):
+        self._call()
+        return {"records": []}
+
+    def batch_execute_statement(self, sql, parameterSets, **target):
+        self._call()
+        self.rows += len(parameterSets)
+        return {"updateResults": []}
+
+    def begin_transaction(self, **target):
+        self._call()
+        return {"transactionId": "bench"}
+
+    def commit_transaction(self, **target):
+        self._call()
+
+    def rollback_transaction(self, **target):
+        self._call()
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux; children covers Chrome and chromedriver.
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, children / 1024
+
+
+def report(name, latencies, records, pages):
+    total = sum(latencies)
+    p50 = statistics.median(latencies)
+    p95 = latencies[0]
+    if len(latencies) > 1:
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(
+        f"{name:<14} {len(latencies):>4} runs {records:>7} records {pages:>5} pages "
+        f"{pages / total:>8.1f} pages/s {records / total:>9.1f} records/s "
+        f"p50 {p50 * 1000:>8.0f}ms p95 {p95 * 1000:>8.0f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the stand-in adds per request")
+    parser.add_argument("--db-latency", type=float, default=0.0,
+                        help="seconds per fake rds-data call")
+    parser.add_argument("--engine", default="http", choices=("http", "browser"))
+    parser.add_argument("--requests", type=int, default=5, help="runs per scenario")
+    parser.add_argument("--skip-lambda", action="store_true")
+    args = parser.parse_args()
+
+    # Everything the API writes goes to a scratch directory, and both engines
+    # resolve REGISTER_URL at import time, so configure before importing.
+    workdir = tempfile.mkdtemp(prefix="bench-register-")
+    for name, filename in [
+        ("JOBS_DB_PATH", "jobs.db"), ("SNAPSHOT_PATH", "snapshot.json"),
+        ("CHECKPOINT_PATH", "checkpoints.db"), ("DETAIL_CACHE_PATH", "details.db"),
+    ]:
+        os.environ[name] = os.path.join(workdir, filename)
+    port = free_port()
+    os.environ["REGISTER_URL"] = f"http://127.0.0.1:{port}/Public-Register"
+    os.environ["SCRAPER_ENGINE"] = args.engine
+    os.environ["JOB_POLL_INTERVAL"] = "1"
+
+    from fake_register import create_app, serve  # noqa: E402
+
+    # Per-request access logs from both servers would drown the report.
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    register_server, _ = serve(
+        create_app(args.rows, args.page_size, args.latency), port=port
+    )
+
+    import app as app_module  # noqa: E402
+
+    pages_per_run = max(1, math.ceil(args.rows / args.page_size))
+    print(f"stand-in: {args.rows} rows, {args.page_size} per page "
+          f"({pages_per_run} pages), {args.latency * 1000:.0f}ms latency, "
+          f"engine={args.engine}")
+
+    client = app_module.app.test_client()
+    latencies = []
+    records = 0
+    for _ in range(args.requests):
+        started = time.perf_counter()
+        response = client.get("/scrape", query_string={
+            "engine": args.engine, "source": "live", "cache": "0",
+        })
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            body = response.get_data(as_text=True)
+            sys.exit(f"/scrape failed: {response.status_code} {body}")
+        records += len(response.get_json()["data"])
+    report("/scrape", latencies, records, pages_per_run * args.requests)
+
+    if not args.skip_lambda:
+        api_server, api_url = serve(app_module.app)
+        os.environ.update({
+            "EC2_INSTANCE_DNS": api_url[len("http://"):],
+            "DB_CLUSTER_ARN": "arn:aws:rds:local:000000000000:cluster:bench",
+            "DB_SECRET_ARN": "arn:aws:secretsmanager:local:000000000000:secret:bench",
+            "DB_NAME": "bench",
+        })
+        import lambda_function  # noqa: E402
+
+        for name, event in [("lambda stream", {"stream": True}), ("lambda job", {})]:
+            latencies = []
+            records = 0
+            timings = {}
+            calls = []
+            for _ in range(args.requests):
+                lambda_function._rds_data_client = rds = FakeRdsData(args.db_latency)
+                started = time.perf_counter()
+                result = lambda_function.lambda_handler(dict(event), None)
+                latencies.append(time.perf_counter() - started)
+                body = json.loads(result["body"])
+                if result["statusCode"] != 200:
+                    sys.exit(f"{name} failed: {body}")
+                records += rds.rows
+                calls.append(rds.calls)
+                for stage, ms in body["timings"].items():
+                    timings.setdefault(stage, []).append(ms)
+            report(name, latencies, records, pages_per_run * args.requests)
+            print("               " + ", ".join(
+                f"{stage} {statistics.median(values):.0f}ms"
+                for stage, values in sorted(timings.items())
+            ) + f"; rds-data calls per run {calls}")
+        api_server.shutdown()
+
+    own, children = peak_rss_mb()
+    print(f"peak RSS: {own:.0f}MB (this process), "
+          f"{children:.0f}MB (largest child process)")
+    register_server.shutdown()
+    app_module.job_queue.stop()
+    app_module.driver_pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Local stand-in for the Public Register, for benchmarks and end-to-end tests.
+
+Serves the search form and results grid with the real page's element ids and
+field names, replays searches through ASP.NET-style postbacks (the query and page
+index travel in __VIEWSTATE) and pages results with the grid's Next Page button.
+Registrant detail pages are served too. Row count, page size and per-request
+latency are configurable.
+
+    python benchmarks/fake_register.py --rows 2000 --page-size 25 --latency 0.2
+    REGISTER_URL=http://127.0.0.1:8000/Public-Register python app.py
+"""
+import argparse
+import base64
+import html
+import json
+import os
+import sys
+import threading
+import time
+
+from flask import Flask, request
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from register import DROPDOWN_FIELDS, FIELD_ID_PREFIX, TEXT_FIELDS  # noqa: E402
+
+GRID_PREFIX = (
+    "ctl01$TemplateBody$WebPartManager1$gwpciNewQueryMenuCommon$"
+    "ciNewQueryMenuCommon$ResultsGrid$"
+)
+SUBMIT_NAME = GRID_PREFIX + "Sheet0$SubmitButton"
+NEXT_PAGE_NAME = GRID_PREFIX + "Grid1$ctl00$ctl03$ctl01$ctl10"
+
+LAST_NAMES = [
+    "Anderson", "Brown", "Chen", "Dubois", "Evans", "Fraser", "Gagnon", "Harris",
+    "Ibrahim", "Jones", "Kaur", "Lee", "Martin", "Nguyen", "O'Brien", "Patel",
+    "Quinn", "Roy", "Singh", "Tremblay", "Underwood", "Vasquez", "Wilson", "Xu",
+    "Young", "Zhang",
+]
+FIRST_NAMES = [
+    "Anna", "Ben", "Chloe", "David", "Emma", "Farid", "Grace", "Hugo", "Isla", "Jack",
+]
+CITIES = ["Toronto", "Ottawa", "London", "Hamilton", "Kingston", "Sudbury", "Windsor"]
+DROPDOWN_OPTIONS = {
+    "registration_class": [
+        ("Optician", "Optician"), ("Intern", "Intern"), ("Student", "Student"),
+    ],
+    "registration_status": [
+        ("ACTIVE", "Active"), ("SUSPENDED", "Suspended"), ("RESIGNED", "Resigned"),
+    ],
+    "contact_lens_mentor": [("Y", "Yes"), ("N", "No")],
+    "area_of_service": [
+        ("ONT_CEN", "Central Ontario"), ("ONT_EAS", "Eastern Ontario"),
+        ("TOR", "Toronto"),
+    ],
+}
+
+
+def field_name(field_id):
+    # The register's input names are their ids with "$" separators.
+    return field_id.replace("_", "$")
+
+
+def build_registrants(count):
+    registrants = []
+    for i in range(count):
+        last = LAST_NAMES[i % len(LAST_NAMES)]
+        if i >= len(LAST_NAMES):
+            last += str(i // len(LAST_NAMES))
+        registrants.append({
+            "id": 1000 + i,
+            "last": last,
+            "first": FIRST_NAMES[i % len(FIRST_NAMES)],
+            "status": (
+                "Suspended" if i % 10 == 0 else "Resigned" if i % 10 == 5 else "Active"
+            ),
+            "class": (
+                "Intern" if i % 7 == 0 else "Student" if i % 7 == 3 else "Optician"
+            ),
+            "city": CITIES[i % len(CITIES)],
+        })
+    registrants.sort(key=lambda r: (r["last"].lower(), r["first"].lower()))
+    return registrants
+
+
+def matches(registrant, query):
+    if not registrant["last"].lower().startswith(query.get("last_name", "").lower()):
+        return False
+    if query.get("first_name_contains", "").lower() not in registrant["first"].lower():
+        return False
+    city = query.get("city_or_town")
+    if city and city.lower() != registrant["city"].lower():
+        return False
+    dropdowns = (("registration_class", "class"), ("registration_status", "status"))
+    for param, column in dropdowns:
+        labels = dict(DROPDOWN_OPTIONS[param])
+        if query.get(param) and labels.get(query[param]) != registrant[column]:
+            return False
+    return True
+
+
+def encode_state(query, page):
+    state = json.dumps({"q": query, "p": page}).encode("utf-8")
+    return base64.b64encode(state).decode("ascii")
+
+
+def decode_state(value):
+    try:
+        state = json.loads(base64.b64decode(value or ""))
+    except ValueError:
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def render_form(query):
+    fields = []
+    for param, field_id in TEXT_FIELDS.items():
+        value = html.escape(query.get(param, ""))
+        fields.append(
+            f'<div class="PanelField"><label>{param}</label>'
+            f'<input name="{field_name(field_id)}" type="text" '
+            f'id="{field_id}" class="rcbInput" value="{value}" /></div>'
+        )
+    for param, dropdown_id in DROPDOWN_FIELDS.items():
+        options = ['<option value="">(All)</option>']
+        for value, label in DROPDOWN_OPTIONS[param]:
+            selected = ' selected="selected"' if query.get(param) == value else ""
+            options.append(
+                f'<option value="{value}"{selected}>{html.escape(label)}</option>'
+            )
+        fields.append(
+            f'<div class="PanelField"><label>{param}</label>'
+            f'<select name="{field_name(dropdown_id)}" '
+            f'id="{dropdown_id}">{"".join(options)}</select></div>'
+        )
+    fields.append(
+        f'<input type="submit" name="{SUBMIT_NAME}" value="Find" '
+        f'id="{FIELD_ID_PREFIX}SubmitButton" class="TextButton" />'
+    )
+    return '<div class="QueryForm">' + "\n".join(fields) + "</div>"
+
+
+def render_grid(rows, page, last_page):
+    cells = []
+    for i, registrant in enumerate(rows):
+        css = "rgRow" if i % 2 == 0 else "rgAltRow"
+        cells.append(
+            f'<tr class="{css}"><td role="gridcell">{html.escape(registrant["last"])}, '
+            f'{html.escape(registrant["first"])}</td>'
+            f'<td role="gridcell">{registrant["status"]}</td>'
+            f'<td role="gridcell">{registrant["class"]}</td>'
+            f'<td role="gridcell">{registrant["city"]}, ON</td>'
+            '<td role="gridcell">'
+            f'<a href="/Public-Register/Registrant-Details?ID={registrant["id"]}" '
+            f'target="_blank">View</a></td></tr>'
+        )
+    disabled = ' onclick="return false;" disabled="disabled"' if last_page else ""
+    grid_id = FIELD_ID_PREFIX.replace("Sheet0_", "") + "Grid1"
+    return (
+        f'<div id="{grid_id}" class="RadGrid RadGrid_MetroTouch">'
+        '<table class="rgMasterTable"><thead><tr>'
+        '<th scope="col">Registrant</th><th scope="col">Status</th>'
+        '<th scope="col">Class</th><th scope="col">Location</th>'
+        '<th scope="col">Details</th></tr></thead>'
+        f'<tfoot><tr class="rgPager"><td colspan="5"><div class="rgWrap rgNumPart">'
+        f'<span class="rgCurrentPage">{page + 1}</span></div>'
+        f'<input type="submit" name="{NEXT_PAGE_NAME}" value=" " title="Next Page" '
+        f'class="rgPageNext"{disabled} />'
+        f'</td></tr></tfoot><tbody>{"".join(cells)}</tbody></table></div>'
+    )
+
+
+def render_page(query, page=None, rows=(), last_page=True):
+    state = encode_state(query, page or 0)
+    grid = render_grid(rows, page, last_page) if page is not None else ""
+    return (
+        '<!DOCTYPE html><html lang="en">'
+        '<head><title>Public Register - Stand-in</title></head><body>'
+        '<form method="post" action="./Public-Register" id="aspnetForm">'
+        '<div class="aspNetHidden">'
+        '<input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value="" />'
+        '<input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value="" />'
+        f'<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{state}" />'
+        '<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" '
+        f'value="EV-{page or 0}" />'
+        f'</div>{render_form(query)}{grid}</form></body></html>'
+    )
+
+
+def render_details(registrant):
+    return (
+        '<!DOCTYPE html><html lang="en">'
+        '<head><title>Registrant Details</title></head><body>'
+        f'<h2>{html.escape(registrant["last"])}, '
+        f'{html.escape(registrant["first"])}</h2>'
+        f'<div class="PanelField"><span class="Label">Registration Number</span>'
+        f'<span class="PanelFieldValue">R{registrant["id"]}</span></div>'
+        f'<div class="PanelField"><span class="Label">Registration Class:</span>'
+        f'<span class="PanelFieldValue">{registrant["class"]}</span></div>'
+        '<table><tbody><tr><th>Practice Address</th>'
+        f'<td>1 Main St<br />{registrant["city"]}, ON</td></tr>'
+        '</tbody></table></body></html>'
+    )
+
+
+def create_app(rows=500, page_size=25, latency=0.0):
+    app = Flask(__name__)
+    registrants = build_registrants(rows)
+    by_id = {registrant["id"]: registrant for registrant in registrants}
+    names = {
+        field_name(field_id): param
+        for param, field_id in {**TEXT_FIELDS, **DROPDOWN_FIELDS}.items()
+    }
+    app.config["REGISTER_STATS"] = stats = {"searches": 0, "pages": 0, "details": 0}
+
+    @app.before_request
+    def add_latency():
+        if latency:
+            time.sleep(latency)
+
+    @app.route("/Public-Register", methods=["GET", "POST"])
+    def public_register():
+        if request.method == "GET":
+            return render_page({})
+
+        if SUBMIT_NAME in request.form:
+            query = {
+                param: request.form.get(name, "").strip()
+                for name, param in names.items()
+            }
+            page = 0
+            stats["searches"] += 1
+        elif NEXT_PAGE_NAME in request.form:
+            state = decode_state(request.form.get("__VIEWSTATE"))
+            if state is None:
+                return "Invalid viewstate", 500
+            query, page = state["q"], state["p"] + 1
+        else:
+            return render_page({})
+
+        found = [registrant for registrant in registrants if matches(registrant, query)]
+        start = page * page_size
+        stats["pages"] += 1
+        last_page = start + page_size >= len(found)
+        return render_page(query, page, found[start:start + page_size], last_page)
+
+    @app.route("/Public-Register/Registrant-Details")
+    def registrant_details():
+        registrant = by_id.get(request.args.get("ID", type=int))
+        if registrant is None:
+            return "Not found", 404
+        stats["details"] += 1
+        return render_details(registrant)
+
+    return app
+
+
+def serve(app, host="127.0.0.1", port=0):
+    # Runs app on a background thread; port 0 picks a free one.
+    server = make_server(host, port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added to every request"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    app = create_app(args.rows, args.page_size, args.latency)
+    print(
+        f"Serving {args.rows} registrants at "
+        f"http://{args.host}:{args.port}/Public-Register"
+    )
+    make_server(args.host, args.port, app, threaded=True).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DISK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrape_cache (
+    key TEXT PRIMARY KEY,
+    stored_at REAL NOT NULL,
+    etag TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scrape_cache_stored_at ON scrape_cache (stored_at);
+"""
+
+
+def cache_key(params):
+    normalized = {name: (value or '').strip() for name, value in params.items()}
+    body = json.dumps(normalized, sort_keys=True)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class CacheEntry:
+    def __init__(self, value, stored_at, etag):
+        self.value = value
+        self.stored_at = stored_at
+        self.etag = etag
+
+
+class ResultCache:
+    # In-memory LRU with a TTL, optionally backed by SQLite so entries survive
+    # restarts and are shared between worker processes.
+    def __init__(self, ttl=3600, max_entries=256, path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        if path:
+            with self._connect() as conn:
+                conn.executescript(DISK_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.stored_at < self.ttl:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+
+        entry = self._load(key, now)
+        with self._lock:
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, value):
+        body = json.dumps(value, sort_keys=True)
+        etag = hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+        entry = CacheEntry(value, time.time(), etag)
+        with self._lock:
+            self._stats["stores"] += 1
+            self._remember(key, entry)
+        if self.path:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO scrape_cache (key, stored_at, etag, value) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, entry.stored_at, entry.etag, body),
+                )
+                conn.execute(
+                    "DELETE FROM scrape_cache WHERE stored_at < ?",
+                    (entry.stored_at - self.ttl,),
+                )
+                conn.execute(
+                    "DELETE FROM scrape_cache WHERE key NOT IN "
+                    "(SELECT key FROM scrape_cache ORDER BY stored_at DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM scrape_cache")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+            })
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _load(self, key, now):
+        if not self.path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT stored_at, etag, value FROM scrape_cache "
+                    "WHERE key = ? AND stored_at >= ?",
+                    (key, now - self.ttl),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Error reading the on-disk cache: {e}")
+            return None
+        if row is None:
+            return None
+        stored_at, etag, value = row
+        return CacheEntry(json.loads(value), stored_at, etag)
@@ -0,0 +1,89 @@
+from register import DROPDOWN_FIELDS
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class OptionCatalog:
+    # The search form's dropdown choices, by search parameter. They change a few
+    # times a year at most, so one fetch serves every request for ttl seconds.
+    # After a failed fetch, requests within retry_after seconds reuse the
+    # outcome (the stale options, or the error) instead of each hitting the
+    # register again while it is down.
+    def __init__(self, fetch, ttl=86400, retry_after=60):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._options = None
+        self._fetched_at = 0.0
+        self._failed_at = None
+        self._error = None
+        self._lock = threading.Lock()
+
+    def get(self, refresh=False):
+        with self._lock:
+            fresh = time.time() - self._fetched_at < self.ttl
+            if not refresh and self._options is not None and fresh:
+                return self._options
+            backing_off = (
+                self._failed_at is not None
+                and time.time() - self._failed_at < self.retry_after
+            )
+            if not refresh and backing_off:
+                if self._options is None:
+                    raise self._error
+                return self._options
+            try:
+                options = self.fetch()
+            except Exception as e:
+                self._failed_at = time.time()
+                self._error = e
+                if self._options is None:
+                    raise
+                # The register being briefly down shouldn't stop validation.
+                logger.warning(
+                    f"Error refreshing dropdown options, keeping the cached ones: {e}"
+                )
+                return self._options
+            self._options = options
+            self._fetched_at = time.time()
+            self._failed_at = None
+            self._error = None
+            counts = {param: len(values) for param, values in options.items()}
+            logger.info(f"Loaded dropdown options: {counts}")
+            return options
+
+    def age(self):
+        with self._lock:
+            return None if self._options is None else time.time() - self._fetched_at
+
+    def validate(self, params):
+        # Returns params with dropdown values spelled as the form spells them,
+        # or raises ValueError naming the allowed values.
+        chosen = {
+            param: params.get(param, "").strip()
+            for param in DROPDOWN_FIELDS if params.get(param, "").strip()
+        }
+        if not chosen:
+            return params
+        try:
+            options = self.get()
+        except Exception as e:
+            # Without a catalog, let the scrape itself find out.
+            logger.warning(f"Dropdown options unavailable, skipping validation: {e}")
+            return params
+
+        params = dict(params)
+        for param, value in chosen.items():
+            by_folded = {option.casefold(): option for option in options.get(param, [])}
+            if not by_folded:
+                continue
+            if value.casefold() not in by_folded:
+                allowed = options.get(param, [])
+                raise ValueError(
+                    f"Invalid {param} '{value}', expected one of {allowed}"
+                )
+            params[param] = by_folded[value.casefold()]
+        return params
@@ -0,0 +1,154 @@
+from cache import cache_key
+from contextlib import contextmanager
+from jobs import utcnow
+from register import record_key
+import json
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    key TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    run_id TEXT,
+    pages INTEGER NOT NULL DEFAULT 0,
+    records INTEGER NOT NULL DEFAULT 0,
+    started_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    updated_ts REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoint_pages (
+    key TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    records TEXT NOT NULL,
+    PRIMARY KEY (key, page)
+);
+"""
+
+
+def checkpoint_key(params, engine, run_id):
+    # Scoped to one run (a job, or a request that asked to be resumable), so two
+    # identical searches running at once each keep their own pages.
+    return cache_key(dict(params, engine=engine, run_id=run_id))
+
+
+class CheckpointStore:
+    # One row per search plus one row per finished page, so saving a page costs
+    # the same on page 40 as on page 1.
+    def __init__(self, path, max_age=6 * 3600):
+        self.path = path
+        self.max_age = max_age
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {
+                row["name"] for row in conn.execute("PRAGMA table_info(checkpoints)")
+            }
+            if "run_id" not in columns:
+                conn.execute("ALTER TABLE checkpoints ADD COLUMN run_id TEXT")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def start(self, key, params, engine, run_id):
+        now = utcnow()
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.execute("DELETE FROM checkpoint_pages WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(key, params, engine, run_id, started_at, updated_at, updated_ts) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(params), engine, run_id, now, now, time.time()),
+            )
+            # Runs that failed and were never resumed leave their pages behind;
+            # once a checkpoint is too old to resume, nothing will read them.
+            expired = time.time() - self.max_age
+            conn.execute(
+                "DELETE FROM checkpoint_pages WHERE key IN "
+                "(SELECT key FROM checkpoints WHERE updated_ts < ?)",
+                (expired,),
+            )
+            conn.execute("DELETE FROM checkpoints WHERE updated_ts < ?", (expired,))
+            conn.execute("COMMIT")
+
+    def save_page(self, key, page, records):
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoint_pages (key, page, records) "
+                "VALUES (?, ?, ?)",
+                (key, page, json.dumps(records)),
+            )
+            conn.execute(
+                "UPDATE checkpoints SET pages = ?, records = records + ?, "
+                "updated_at = ?, updated_ts = ? WHERE key = ?",
+                (page, len(records), utcnow(), time.time(), key),
+            )
+            conn.execute("COMMIT")
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM checkpoints WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row["updated_ts"] > self.max_age:
+            return None
+        return self._summary(row)
+
+    def load_pages(self, key):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT records FROM checkpoint_pages WHERE key = ? ORDER BY page",
+                (key,),
+            ).fetchall()
+        return [json.loads(row["records"]) for row in rows]
+
+    def clear(self, key):
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.execute("DELETE FROM checkpoint_pages WHERE key = ?", (key,))
+            conn.execute("DELETE FROM checkpoints WHERE key = ?", (key,))
+            conn.execute("COMMIT")
+
+    def list(self):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM checkpoints WHERE updated_ts >= ? "
+                "ORDER BY updated_ts DESC",
+                (time.time() - self.max_age,),
+            ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def _summary(self, row):
+        checkpoint = dict(row)
+        checkpoint["params"] = json.loads(checkpoint["params"])
+        checkpoint.pop("updated_ts")
+        return checkpoint
+
+
+def checkpointed(store, key, saved_pages, live_pages):
+    # Replay what an earlier attempt already saved, then carry on from the live
+    # search. Rows can shift between pages while we were away, so anything the
+    # saved pages already hold is dropped from the live ones.
+    seen = set()
+    for page in saved_pages:
+        seen.update(record_key(record) for record in page)
+        yield page
+    page_number = len(saved_pages)
+    for page in live_pages:
+        if seen:
+            page = [record for record in page if record_key(record) not in seen]
+        page_number += 1
+        store.save_page(key, page_number, page)
+        yield page
+    store.clear(key)
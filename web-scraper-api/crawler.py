@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+from register import DROPDOWN_FIELDS, ScrapeError, record_key
+import logging
+import string
+import time
+
+logger = logging.getLogger(__name__)
+
+SHARD_STRATEGIES = ("registration_class", "registration_status", "last_name")
+
+
+# Leading characters every last_name crawl searches for.
+LAST_NAME_INITIALS = string.ascii_uppercase + string.digits
+
+
+def last_name_prefixes(prefix, known_last_names=()):
+    # A-Z and 0-9 after the prefix, plus any other character that follows it in
+    # a last name we have seen (accented letters, punctuation), so those
+    # registrants aren't silently left out of a "complete" crawl.
+    extra = set()
+    folded = prefix.lower()
+    for name in known_last_names:
+        if len(name) > len(folded) and name.lower().startswith(folded):
+            initial = name[len(folded)].upper()
+            if initial not in LAST_NAME_INITIALS and not initial.isspace():
+                extra.add(initial)
+    return [prefix + initial for initial in list(LAST_NAME_INITIALS) + sorted(extra)]
+
+
+def build_shards(shard_by, base_params, dropdown_options=None, known_last_names=()):
+    # A shard is one search; shards of a strategy together cover the base query.
+    if shard_by in DROPDOWN_FIELDS:
+        if base_params.get(shard_by):
+            values = [base_params[shard_by]]
+        else:
+            values = list(dropdown_options or [])
+            if not values:
+                raise ScrapeError(f"No options available to shard by {shard_by}")
+    elif shard_by == "last_name":
+        values = last_name_prefixes(base_params.get("last_name", ""), known_last_names)
+    else:
+        raise ScrapeError(
+            f"Unknown shard strategy '{shard_by}', expected one of {SHARD_STRATEGIES}"
+        )
+
+    return [
+        {
+            "name": f"{shard_by}={value}",
+            "params": dict(base_params, **{shard_by: value}),
+        }
+        for value in values
+    ]
+
+
+def merge_records(results):
+    seen = set()
+    merged = []
+    duplicates = 0
+    for records in results:
+        for record in records:
+            key = record_key(record)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            merged.append(record)
+    return merged, duplicates
+
+
+def run_shard(shard, open_pages, engine, on_page=None):
+    started = time.monotonic()
+    records = []
+    pages = 0
+    error = None
+    try:
+        with open_pages(shard["params"], engine) as result_pages:
+            for page in result_pages:
+                records.extend(page)
+                pages += 1
+                if on_page:
+                    on_page(page)
+    except Exception as e:
+        logger.error(f"Shard {shard['name']} failed: {e}")
+        error = str(e)
+    seconds = time.monotonic() - started
+    logger.info(
+        f"Shard {shard['name']} finished: {len(records)} records, "
+        f"{pages} pages in {seconds:.1f}s"
+    )
+    report = {
+        "name": shard["name"],
+        "records": len(records),
+        "pages": pages,
+        "seconds": round(seconds, 3),
+        "error": error,
+    }
+    return records, report
+
+
+def crawl(shards, open_pages, engine, workers=2, on_page=None):
+    started = time.monotonic()
+    with ThreadPoolExecutor(
+        max_workers=max(1, workers), thread_name_prefix="crawl"
+    ) as executor:
+        outcomes = list(executor.map(
+            lambda shard: run_shard(shard, open_pages, engine, on_page), shards
+        ))
+
+    data, duplicates = merge_records(records for records, _ in outcomes)
+    reports = [report for _, report in outcomes]
+    return {
+        "data": data,
+        "complete": all(report["error"] is None for report in reports),
+        "duplicates": duplicates,
+        "seconds": round(time.monotonic() - started, 3),
+        "shards": reports,
+    }
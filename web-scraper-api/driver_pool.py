@@ -0,0 +1,291 @@
+from collections import deque
+from contextlib import contextmanager
+from selenium import webdriver
+import logging
+import metrics
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+CHROME_PROFILES = ("lean", "full")
+CHROME_PROFILE = os.getenv("CHROME_PROFILE", "lean")
+RENDERER_PROCESS_LIMIT = int(os.getenv("CHROME_RENDERER_PROCESS_LIMIT", "2"))
+
+# Requests the register page makes that scraping never needs. Stylesheets are
+# kept: visibility checks on the form's buttons depend on them.
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.webp", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3", "*.ogg",
+]
+BLOCKED_DOMAINS = [
+    domain.strip()
+    for domain in os.getenv(
+        "CHROME_BLOCKED_DOMAINS",
+        "google-analytics.com,googletagmanager.com,doubleclick.net,facebook.net,"
+        "fonts.googleapis.com,fonts.gstatic.com,youtube.com,vimeo.com",
+    ).split(",")
+    if domain.strip()
+]
+
+
+def build_chrome_options(profile=CHROME_PROFILE):
+    if profile not in CHROME_PROFILES:
+        raise ValueError(
+            f"Unknown Chrome profile '{profile}', expected one of {CHROME_PROFILES}"
+        )
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--window-size=1280,800")
+    options.add_argument("--disable-software-rasterizer")
+    if profile == "lean":
+        # Don't wait for subresources; readiness checks wait for the grid itself.
+        options.page_load_strategy = "eager"
+        options.add_argument(f"--renderer-process-limit={RENDERER_PROCESS_LIMIT}")
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--mute-audio")
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.default_content_setting_values.notifications": 2,
+        })
+    return options
+
+
+def blocked_url_patterns():
+    return BLOCKED_URL_PATTERNS + [f"*{domain}*" for domain in BLOCKED_DOMAINS]
+
+
+def create_driver(profile=CHROME_PROFILE):
+    # No fixed --remote-debugging-port: chromedriver picks a free one per session,
+    # so several pooled browsers can run side by side.
+    driver = webdriver.Chrome(options=build_chrome_options(profile))
+    if profile == "lean":
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd(
+                "Network.setBlockedURLs", {"urls": blocked_url_patterns()}
+            )
+        except Exception as e:
+            logger.warning(f"Could not block subresources over CDP: {e}")
+    return driver
+
+
+class PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+
+class DriverPool:
+    def __init__(self, factory, start_url, size=2, max_uses=50, acquire_timeout=120):
+        self.factory = factory
+        self.start_url = start_url
+        self.size = size
+        self.max_uses = max_uses
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = deque()
+        self._total = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        self._stats = {
+            "acquired": 0,
+            "created": 0,
+            "recycled": 0,
+            "crashed": 0,
+            "discarded": 0,
+            "timeouts": 0,
+            "waits": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def warm(self):
+        # Pre-launch sessions up to the pool size so the first requests skip
+        # browser startup and the initial page load. This is best effort: if
+        # Chrome won't start, the process keeps serving and session() launches
+        # browsers on demand (the HTTP engine doesn't need one at all).
+        while True:
+            with self._cond:
+                if self._total >= self.size:
+                    return
+                self._total += 1
+            try:
+                pooled = self._launch()
+            except Exception as e:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                logger.warning(f"Could not pre-launch browser sessions: {e}")
+                return
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    @contextmanager
+    def session(self):
+        pooled = self._acquire()
+        try:
+            yield pooled.driver
+        except BaseException:
+            # Whatever went wrong, the browser state is unknown; don't hand it
+            # out again.
+            with self._cond:
+                self._stats["discarded"] += 1
+            self._discard(pooled)
+            raise
+        else:
+            self._release(pooled)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(
+                {
+                    "size": self.size,
+                    "total": self._total,
+                    "idle": len(self._idle),
+                    "in_use": self._in_use,
+                    "max_uses": self.max_uses,
+                }
+            )
+        waits = stats["acquired"]
+        stats["wait_seconds_avg"] = (
+            stats["wait_seconds_total"] / waits if waits else 0.0
+        )
+        return stats
+
+    def close(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+        for pooled in idle:
+            self._quit(pooled)
+
+    def _launch(self):
+        with metrics.driver_startup_seconds.time():
+            driver = self.factory()
+        try:
+            with metrics.navigation_seconds.time():
+                driver.get(self.start_url)
+        except Exception:
+            self._quit(PooledDriver(driver))
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        logger.info("Launched a new browser session for the pool.")
+        return PooledDriver(driver)
+
+    def _acquire(self):
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+        waited = False
+        while True:
+            with self._cond:
+                while not self._idle and self._total >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            "No browser session available after "
+                            f"{self.acquire_timeout}s"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                if self._idle:
+                    pooled = self._idle.popleft()
+                else:
+                    pooled = None
+                    self._total += 1
+
+            if pooled is None:
+                try:
+                    pooled = self._launch()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_alive(pooled):
+                logger.warning("Pooled browser session is dead, replacing it.")
+                with self._cond:
+                    self._stats["crashed"] += 1
+                self._retire(pooled)
+                continue
+
+            wait = time.monotonic() - started
+            with self._cond:
+                self._in_use += 1
+                self._stats["acquired"] += 1
+                if waited:
+                    self._stats["waits"] += 1
+                self._stats["wait_seconds_total"] += wait
+                self._stats["wait_seconds_max"] = max(
+                    self._stats["wait_seconds_max"], wait
+                )
+            pooled.uses += 1
+            return pooled
+
+    def _release(self, pooled):
+        with self._cond:
+            self._in_use -= 1
+        if pooled.uses >= self.max_uses:
+            logger.info(f"Recycling browser session after {pooled.uses} uses.")
+            with self._cond:
+                self._stats["recycled"] += 1
+            self._retire(pooled)
+            return
+        try:
+            # Reset form state: drop cookies (and with them the ASP.NET session)
+            # and reload a pristine search page for the next caller.
+            pooled.driver.delete_all_cookies()
+            with metrics.navigation_seconds.time():
+                pooled.driver.get(self.start_url)
+        except Exception as e:
+            logger.warning(f"Failed to reset browser session, discarding it: {e}")
+            with self._cond:
+                self._stats["crashed"] += 1
+            self._retire(pooled)
+            return
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def _discard(self, pooled):
+        with self._cond:
+            self._in_use -= 1
+        self._retire(pooled)
+
+    def _retire(self, pooled):
+        self._quit(pooled)
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def _is_alive(self, pooled):
+        try:
+            pooled.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(pooled):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error quitting browser session: {e}")
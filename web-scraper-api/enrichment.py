@@ -0,0 +1,217 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from http_engine import new_session, normalize_text
+import json
+import logging
+import re
+import requests
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DETAILS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detail_pages (
+    url TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fields TEXT NOT NULL
+);
+"""
+
+VOID_TAGS = {"br", "img", "input", "hr", "meta", "link", "col", "area", "base", "wbr"}
+
+
+def field_name(label):
+    return re.sub(r"[^a-z0-9]+", "_", label.lower()).strip("_")
+
+
+class DetailPageParser(HTMLParser):
+    # Profile pages list fields as label/value pairs in one of three shapes:
+    # Label/Value spans, two-cell table rows, or <dt>/<dd> lists.
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.fields = {}
+        self._stack = []
+        self._label = None
+        self._row = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            if tag == "br":
+                self._add_text("\n")
+            return
+        css = dict(attrs).get("class") or ""
+        kind = None
+        if tag == "dt" or (tag != "td" and "Label" in css.split()):
+            kind = "label"
+        elif tag == "dd" or "PanelFieldValue" in css.split():
+            kind = "value"
+        elif tag in ("th", "td") and self._row is not None:
+            kind = "cell"
+        elif tag == "tr":
+            self._row = []
+        self._stack.append((tag, {"kind": kind, "text": []} if kind else None))
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS:
+            return
+        while self._stack:
+            open_tag, frame = self._stack.pop()
+            if frame is not None:
+                self._emit(frame["kind"], normalize_text(frame["text"]))
+            if open_tag == "tr":
+                self._finish_row()
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        self._add_text(data)
+
+    def _add_text(self, text):
+        for _, frame in reversed(self._stack):
+            if frame is not None:
+                frame["text"].append(text)
+                return
+
+    def _emit(self, kind, text):
+        if kind == "label":
+            self._label = text.rstrip(":").strip()
+        elif kind == "value" and self._label:
+            self.fields[field_name(self._label)] = text
+            self._label = None
+        elif kind == "cell" and self._row is not None:
+            self._row.append(text)
+
+    def _finish_row(self):
+        row, self._row = self._row, None
+        if row and len(row) == 2 and row[0]:
+            self.fields[field_name(row[0].rstrip(":"))] = row[1]
+
+
+def parse_detail_page(html):
+    parser = DetailPageParser()
+    parser.feed(html)
+    parser.close()
+    return parser.fields
+
+
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class DetailCache:
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(DETAILS_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get(self, url):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT fetched_at, etag, last_modified, fields FROM detail_pages "
+                "WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        fetched_at, etag, last_modified, fields = row
+        return {"fetched_at": fetched_at, "etag": etag, "last_modified": last_modified,
+                "fields": json.loads(fields)}
+
+    def put(self, url, fields, etag=None, last_modified=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO detail_pages "
+                "(url, fetched_at, etag, last_modified, fields) VALUES (?, ?, ?, ?, ?)",
+                (url, time.time(), etag, last_modified, json.dumps(fields)),
+            )
+
+
+class DetailEnricher:
+    def __init__(self, cache, workers=4, rate=5.0, ttl=86400, timeout=30,
+                 session_factory=new_session):
+        self.cache = cache
+        self.workers = workers
+        self.rate_limiter = RateLimiter(rate)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.session_factory = session_factory
+        self._local = threading.local()
+
+    def enrich(self, records):
+        # Each distinct link is fetched once, however many rows point at it.
+        links = list(dict.fromkeys(
+            record["details_link"] for record in records if record["details_link"]
+        ))
+        started = time.monotonic()
+        with ThreadPoolExecutor(
+            max_workers=max(1, self.workers), thread_name_prefix="details"
+        ) as executor:
+            details = dict(zip(links, executor.map(self.fetch, links)))
+        seconds = time.monotonic() - started
+        logger.info(f"Enriched {len(links)} detail pages in {seconds:.1f}s.")
+        return [
+            dict(record, details=details.get(record["details_link"]))
+            for record in records
+        ]
+
+    def fetch(self, url):
+        cached = self.cache.get(url)
+        if cached is not None and time.time() - cached["fetched_at"] < self.ttl:
+            # Already fetched recently, e.g. by an earlier run that was interrupted.
+            return cached["fields"]
+
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        self.rate_limiter.wait()
+        try:
+            response = self._session().get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached is not None:
+                fields = cached["fields"]
+            else:
+                response.raise_for_status()
+                fields = parse_detail_page(response.text)
+        except requests.RequestException as e:
+            logger.warning(f"Error fetching detail page {url}: {e}")
+            return cached["fields"] if cached is not None else None
+
+        self.cache.put(
+            url, fields, response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+        return fields
+
+    def _session(self):
+        # requests.Session isn't thread-safe; give each worker thread its own.
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self.session_factory()
+        return session
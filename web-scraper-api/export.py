@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+import metrics
+import os
+import zlib
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Parquet and Arrow exports need pyarrow.
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:  # Without it, clients asking for zstd get gzip.
+    zstandard = None
+
+EXPORT_FIELDS = ["registrant", "status", "class", "location", "details_link"]
+# Rows per CSV chunk, Arrow record batch and Parquet row group.
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+EXPORT_ZSTD_LEVEL = int(os.getenv("EXPORT_ZSTD_LEVEL", "3"))
+# JSON responses smaller than this aren't worth compressing.
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+# Parquet and Arrow compress their own columns (zstd), so they're sent as-is.
+COLUMNAR_FORMATS = ("parquet", "arrow")
+FILE_EXTENSIONS = {
+    "ndjson": "ndjson", "csv": "csv", "parquet": "parquet", "arrow": "arrows",
+}
+
+
+class NotAcceptable(ValueError):
+    pass
+
+
+def available_formats():
+    return [
+        name for name in FORMATS
+        if pyarrow is not None or name not in COLUMNAR_FORMATS
+    ]
+
+
+def available_encodings():
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def negotiate_format(requested, accept):
+    # ?format= wins over the Accept header; no Accept header means NDJSON.
+    if requested:
+        if requested not in FORMATS:
+            raise ValueError(
+                f"Unknown format '{requested}', expected one of {tuple(FORMATS)}"
+            )
+        if requested not in available_formats():
+            raise NotAcceptable(
+                f"Format '{requested}' needs pyarrow, which is not installed"
+            )
+        return requested
+    if not accept:
+        return "ndjson"
+    by_mimetype = {FORMATS[name]: name for name in available_formats()}
+    best = accept.best_match(list(by_mimetype))
+    if best is None:
+        raise NotAcceptable(f"None of the export formats match Accept: {accept}")
+    return by_mimetype[best]
+
+
+def negotiate_encoding(fmt, accept_encodings):
+    if fmt in COLUMNAR_FORMATS:
+        return "identity"
+    return accept_encodings.best_match(available_encodings()) or "identity"
+
+
+def export_fields(enrich=False):
+    return EXPORT_FIELDS + ["details"] if enrich else list(EXPORT_FIELDS)
+
+
+def batches(records, size=EXPORT_BATCH_ROWS):
+    for start in range(0, len(records), size):
+        yield records[start:start + size]
+
+
+def cell(record, field):
+    value = record.get(field)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return "" if value is None else str(value)
+
+
+def ndjson_chunks(pages, fields):
+    for page in pages:
+        if page:
+            lines = (json.dumps(record, ensure_ascii=False) + "\n" for record in page)
+            yield "".join(lines).encode("utf-8")
+
+
+def csv_chunks(pages, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for page in pages:
+        for record in page:
+            writer.writerow([cell(record, field) for field in fields])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class ChunkSink(io.RawIOBase):
+    # A write-only file for pyarrow that hands back what was written so far.
+    # tell() keeps counting across drains: Parquet records absolute offsets.
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def arrow_schema(fields):
+    return pyarrow.schema([(field, pyarrow.string()) for field in fields])
+
+
+def record_batch(page, schema):
+    return pyarrow.record_batch(
+        [
+            pyarrow.array([cell(record, field) for record in page], pyarrow.string())
+            for field in schema.names
+        ],
+        schema=schema,
+    )
+
+
+def columnar_chunks(pages, fields, open_writer):
+    schema = arrow_schema(fields)
+    sink = ChunkSink()
+    writer = open_writer(pyarrow.PythonFile(sink, mode="w"), schema)
+    for page in pages:
+        if page:
+            writer.write_batch(record_batch(page, schema))
+        data = sink.drain()
+        if data:
+            yield data
+    # Only a finished file gets its footer; a failed export never looks complete.
+    writer.close()
+    yield sink.drain()
+
+
+def parquet_chunks(pages, fields):
+    return columnar_chunks(
+        pages, fields,
+        lambda sink, schema: pyarrow.parquet.ParquetWriter(
+            sink, schema, compression="zstd"
+        ),
+    )
+
+
+def arrow_chunks(pages, fields):
+    options = pyarrow.ipc.IpcWriteOptions(compression="zstd")
+    return columnar_chunks(
+        pages, fields,
+        lambda sink, schema: pyarrow.ipc.new_stream(sink, schema, options=options),
+    )
+
+
+WRITERS = {
+    "ndjson": ndjson_chunks,
+    "csv": csv_chunks,
+    "parquet": parquet_chunks,
+    "arrow": arrow_chunks,
+}
+
+
+def compressor(encoding):
+    if encoding == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=EXPORT_ZSTD_LEVEL).compressobj()
+    return None
+
+
+def compress(chunks, encoding):
+    compressobj = compressor(encoding)
+    if compressobj is None:
+        yield from chunks
+        return
+    for chunk in chunks:
+        data = compressobj.compress(chunk)
+        if data:
+            yield data
+    yield compressobj.flush()
+
+
+def export_stream(pages, fmt, encoding, fields):
+    for chunk in compress(WRITERS[fmt](pages, fields), encoding):
+        metrics.export_bytes_total.inc(len(chunk), format=fmt, encoding=encoding)
+        yield chunk
+
+
+def compress_body(data, encoding):
+    return b"".join(compress([data], encoding))
@@ -0,0 +1,31 @@
+# Production serving: gunicorn -c gunicorn.conf.py app:app
+#
+# One worker process with threads, because the browser pool, result cache and
+# admission controller live in process memory. Threads beyond the admission
+# limit only wait in its bounded queue or get an immediate 429/503.
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+# Full-register scrapes can legitimately run for many minutes; an hour, as
+# deploy.sh used to pass with --timeout.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "3600"))
+graceful_timeout = 60
+keepalive = 5
+accesslog = "-"
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    from app import start_services
+
+    start_services()
+
+
+def worker_exit(server, worker):
+    from app import driver_pool, job_queue
+
+    job_queue.stop()
+    driver_pool.close()
@@ -0,0 +1,339 @@
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from register import REGISTER_URL, TEXT_FIELDS, DROPDOWN_FIELDS, ScrapeError
+import logging
+import metrics
+import os
+import requests
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_ENGINE_TIMEOUT", "60"))
+HTTP_MAX_PAGES = int(os.getenv("HTTP_ENGINE_MAX_PAGES", "1000"))
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/115.0 Safari/537.36"
+)
+
+# One connection pool shared by every search; each search still gets its own
+# Session so ASP.NET session cookies never leak between concurrent queries.
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=int(os.getenv("HTTP_ENGINE_POOL_SIZE", "10")),
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=["GET"],
+    ),
+)
+
+
+def new_session():
+    session = requests.Session()
+    session.mount("https://", _adapter)
+    session.mount("http://", _adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def normalize_text(parts):
+    # Approximate WebElement.text: collapse whitespace within lines, drop blank lines.
+    lines = (" ".join(line.split()) for line in "".join(parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class RegisterPageParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.form_action = None
+        self.inputs = []
+        self.selects = []
+        self.rows = []
+
+        self._select = None
+        self._option = None
+        self._tbody_depth = 0
+        self._rows = []
+        self._cells = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form" and self.form_action is None:
+            self.form_action = attrs.get("action") or ""
+        elif tag == "input":
+            self.inputs.append(attrs)
+        elif tag == "select":
+            self._select = {
+                "name": attrs.get("name"), "id": attrs.get("id"), "options": [],
+            }
+            self.selects.append(self._select)
+        elif tag == "option" and self._select is not None:
+            self._option = {
+                "value": attrs.get("value"),
+                "selected": "selected" in attrs,
+                "text": [],
+            }
+            self._select["options"].append(self._option)
+        elif tag == "tbody":
+            self._tbody_depth += 1
+        elif tag == "tr" and self._tbody_depth:
+            self._rows.append([])
+        elif tag == "td":
+            cell = None
+            if attrs.get("role") == "gridcell" and self._rows:
+                cell = {"text": [], "href": None}
+                self._rows[-1].append(cell)
+            self._cells.append(cell)
+        elif tag == "a":
+            cell = self._current_cell()
+            if cell is not None and cell["href"] is None and attrs.get("href"):
+                cell["href"] = attrs["href"]
+        elif tag == "br":
+            self._add_text("\n")
+
+    def handle_endtag(self, tag):
+        if tag == "option":
+            self._option = None
+        elif tag == "select":
+            self._option = None
+            self._select = None
+        elif tag == "tbody" and self._tbody_depth:
+            self._tbody_depth -= 1
+        elif tag == "tr" and self._rows:
+            self.rows.append(self._rows.pop())
+        elif tag == "td" and self._cells:
+            self._cells.pop()
+
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option["text"].append(data)
+        self._add_text(data)
+
+    def _current_cell(self):
+        for cell in reversed(self._cells):
+            if cell is not None:
+                return cell
+        return None
+
+    def _add_text(self, text):
+        cell = self._current_cell()
+        if cell is not None:
+            cell["text"].append(text)
+
+
+class RegisterPage:
+    def __init__(self, html, url):
+        parser = RegisterPageParser()
+        parser.feed(html)
+        parser.close()
+        self.url = url
+        self.action = urljoin(url, parser.form_action or "")
+        self.inputs = parser.inputs
+        self.selects = parser.selects
+        self.rows = parser.rows
+
+    def records(self):
+        page_data = []
+        for columns in self.rows:
+            if not columns:
+                continue  # Skip rows without valid columns
+
+            # Same rule as the browser's EXTRACT_TABLE_SCRIPT: a short row
+            # yields empty strings for its missing cells.
+            def text(i):
+                if i >= len(columns):
+                    return ""
+                return normalize_text(columns[i]["text"]).strip()
+            href = columns[4]["href"] if len(columns) > 4 else None
+            page_data.append(
+                {
+                    "registrant": text(0),
+                    "status": text(1),
+                    "class": text(2),
+                    "location": text(3),
+                    "details_link": urljoin(self.url, href).strip() if href else "",
+                }
+            )
+        return page_data
+
+    def find_input(self, **criteria):
+        for field in self.inputs:
+            if all(field.get(key) == value for key, value in criteria.items()):
+                return field
+        return None
+
+    def dropdown_options(self, dropdown_id):
+        # Visible texts of the selectable options, leaving out the blank "(All)" entry.
+        for select in self.selects:
+            if select["id"] == dropdown_id:
+                return [
+                    normalize_text(option["text"])
+                    for option in select["options"]
+                    if option_value(option)
+                ]
+        return []
+
+    def next_page_button(self):
+        button = self.find_input(title="Next Page")
+        if button is None or not button.get("name"):
+            return None
+        # The pager renders a dead button on the last page instead of removing it.
+        if "disabled" in button or "return false" in (button.get("onclick") or ""):
+            return None
+        return button
+
+    def form_data(self, params=None, submit=None):
+        data = {}
+        for field in self.inputs:
+            name = field.get("name")
+            input_type = (field.get("type") or "text").lower()
+            if not name or "disabled" in field:
+                continue
+            if input_type in ("submit", "image", "button", "reset", "file"):
+                continue
+            if input_type in ("checkbox", "radio"):
+                if "checked" in field:
+                    data[name] = field.get("value") or "on"
+                continue
+            data[name] = field.get("value") or ""
+
+        for select in self.selects:
+            if not select["name"] or not select["options"]:
+                continue
+            selected = [o for o in select["options"] if o["selected"]]
+            selected = selected or select["options"][:1]
+            data[select["name"]] = option_value(selected[0])
+
+        if params:
+            self._apply_params(data, params)
+
+        if submit is not None:
+            data[submit["name"]] = submit.get("value") or ""
+        return data
+
+    def _apply_params(self, data, params):
+        names_by_id = {field.get("id"): field.get("name") for field in self.inputs}
+        for param, field_id in TEXT_FIELDS.items():
+            name = names_by_id.get(field_id)
+            if name is None:
+                raise ScrapeError(
+                    f"Error filling out form fields: no input with id {field_id}"
+                )
+            data[name] = params.get(param, "")
+
+        selects_by_id = {select["id"]: select for select in self.selects}
+        for param, dropdown_id in DROPDOWN_FIELDS.items():
+            select = selects_by_id.get(dropdown_id)
+            if select is None:
+                raise ScrapeError(
+                    f"Error filling out form fields: no dropdown with id {dropdown_id}"
+                )
+            value = params.get(param, "")
+            if not value:
+                # Leave the form's default "(All)" option selected.
+                continue
+            options = {normalize_text(o["text"]): o for o in select["options"]}
+            if value in options:
+                data[select["name"]] = option_value(options[value])
+            else:
+                logger.warning(
+                    f"Value '{value}' not found in options for {dropdown_id}"
+                )
+
+
+def option_value(option):
+    # An <option> without a value attribute submits its text.
+    if option["value"] is not None:
+        return option["value"]
+    return normalize_text(option["text"])
+
+
+class RegisterHttpClient:
+    def __init__(self, url=REGISTER_URL, session=None, timeout=HTTP_TIMEOUT,
+                 max_pages=HTTP_MAX_PAGES):
+        self.url = url
+        self.session = session or new_session()
+        self.timeout = timeout
+        self.max_pages = max_pages
+
+    def fetch_search_form(self):
+        try:
+            page = self._get(self.url)
+            logger.info("Fetched the public register search form.")
+        except requests.RequestException as e:
+            logger.error(f"Error loading the search form: {e}")
+            metrics.errors_total.inc(stage="search_form")
+            raise ScrapeError(f"Error loading the search form: {e}")
+        return page
+
+    def iter_result_pages(self, params, skip_pages=0):
+        # skip_pages pages are still requested (each postback needs the previous
+        # page's state) but not yielded, for resuming from a checkpoint.
+        page = self.fetch_search_form()
+
+        find_button = page.find_input(value="Find")
+        if find_button is None or not find_button.get("name"):
+            metrics.errors_total.inc(stage="find_click")
+            raise ScrapeError("Error clicking 'Find' button: button not found")
+        try:
+            page = self._post(page, page.form_data(params, submit=find_button))
+        except requests.RequestException as e:
+            logger.error(f"Error submitting the search form: {e}")
+            metrics.errors_total.inc(stage="find_click")
+            raise ScrapeError(f"Error clicking 'Find' button: {e}")
+
+        records = page.records()
+        if skip_pages < 1:
+            logger.info(f"Extracted {len(records)} records from the first page.")
+            yield records
+
+        pages = 1
+        seen = {page_signature(records)}
+        while pages < self.max_pages:
+            next_button = page.next_page_button()
+            if next_button is None:
+                logger.info("No more pages to navigate.")
+                return
+            try:
+                page = self._post(page, page.form_data(submit=next_button))
+            except requests.RequestException as e:
+                logger.error(f"Error during pagination: {e}")
+                metrics.errors_total.inc(stage="pagination")
+                raise ScrapeError(f"Error during pagination after page {pages}: {e}")
+            records = page.records()
+            signature = page_signature(records)
+            if signature in seen:
+                # The server handed back a page we already have; paging is stuck.
+                logger.warning("Pagination returned a repeated page, stopping.")
+                return
+            seen.add(signature)
+            pages += 1
+            if pages <= skip_pages:
+                continue
+            logger.info(f"Extracted {len(records)} records from page {pages}.")
+            yield records
+
+    def _get(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return RegisterPage(response.text, response.url or url)
+
+    def _post(self, page, data):
+        response = self.session.post(
+            page.action,
+            data=data,
+            headers={"Referer": page.url},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        # Parsing the HTML is this engine's equivalent of extracting the table.
+        with metrics.page_extract_seconds.time(engine="http"):
+            return RegisterPage(response.text, response.url or page.action)
+
+
+def page_signature(records):
+    return tuple(record["details_link"] or record["registrant"] for record in records)
@@ -1,10 +1,53 @@
 -- init_db.sql
+-- Bootstraps a fresh database with the schema cdk-infra/lambda/migrations.py
+-- builds. The Lambda still runs its migrations against it; every statement there
+-- is idempotent, so they only record themselves in schema_migrations.
 CREATE TABLE IF NOT EXISTS scraped_data (
-    id SERIAL PRIMARY KEY,
-    registrant VARCHAR(255),
-    status VARCHAR(255),
-    class VARCHAR(255),
-    location VARCHAR(255),
+    id BIGSERIAL PRIMARY KEY,
+    registrant TEXT,
+    status TEXT,
+    class TEXT,
+    location TEXT,
     details_link TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    record_key TEXT,
+    content_hash CHAR(64),
+    crawl_run_id TEXT,
+    first_seen_at TIMESTAMPTZ DEFAULT now(),
+    updated_at TIMESTAMPTZ DEFAULT now(),
+    removed_at TIMESTAMPTZ
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS scraped_data_record_key ON scraped_data (record_key);
+CREATE INDEX IF NOT EXISTS scraped_data_status_id ON scraped_data (status, id) WHERE removed_at IS NULL;
+CREATE INDEX IF NOT EXISTS scraped_data_class_id ON scraped_data (class, id) WHERE removed_at IS NULL;
+CREATE INDEX IF NOT EXISTS scraped_data_location_id ON scraped_data (location, id) WHERE removed_at IS NULL;
+CREATE INDEX IF NOT EXISTS scraped_data_registrant_prefix ON scraped_data (lower(registrant) text_pattern_ops);
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS scraped_data_registrant_trgm ON scraped_data USING gin (registrant gin_trgm_ops);
+
+CREATE TABLE IF NOT EXISTS scraped_data_changes (
+    id BIGSERIAL PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    detected_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    record_key TEXT NOT NULL,
+    change TEXT NOT NULL,
+    previous_status TEXT,
+    registrant TEXT,
+    status TEXT,
+    class TEXT,
+    location TEXT,
+    content_hash CHAR(64)
+);
+
+CREATE INDEX IF NOT EXISTS scraped_data_changes_detected_at ON scraped_data_changes (detected_at, id);
+CREATE INDEX IF NOT EXISTS scraped_data_changes_record_key ON scraped_data_changes (record_key, id);
+
+CREATE TABLE IF NOT EXISTS crawl_runs (
+    run_id TEXT PRIMARY KEY,
+    load_mode TEXT NOT NULL,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ,
+    full_crawl BOOLEAN,
+    counts JSONB
 );
@@ -0,0 +1,241 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    options TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    pages INTEGER NOT NULL DEFAULT 0,
+    records INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    owner TEXT,
+    lease_expires REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created_at ON jobs (status, created_at);
+"""
+
+
+def utcnow():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobStore:
+    # SQLite keeps queued jobs across restarts and lets every gunicorn worker
+    # process see the same queue.
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # Databases created before leases still have only owner_pid.
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_expires", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create(self, kind, options):
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, options, created_at) "
+                "VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(options), utcnow()),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id, with_result=False):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        result = job.pop("result")
+        if with_result:
+            job["result"] = json.loads(result) if result else None
+        for column in ("owner", "lease_expires", "owner_pid"):
+            job.pop(column, None)
+        return job
+
+    def claim_next(self, owner, lease):
+        with self._connect() as conn:
+            # BEGIN IMMEDIATE takes the write lock up front, so two workers can't
+            # both claim the same queued job.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' "
+                    "ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, "
+                        "owner = ?, lease_expires = ? WHERE id = ?",
+                        (utcnow(), owner, time.time() + lease, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return self.get(row["id"])
+
+    def update_progress(self, job_id, pages, records):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET pages = ?, records = ? WHERE id = ?",
+                (pages, records, job_id),
+            )
+
+    def finish(self, job_id, result=None, error=None):
+        status = "failed" if error else "succeeded"
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ?, result = ? "
+                "WHERE id = ?",
+                (status, utcnow(), error,
+                 json.dumps(result) if result is not None else None, job_id),
+            )
+
+    def renew(self, owner, lease):
+        # Extends the lease on every job this owner is still running.
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_expires = ? "
+                "WHERE owner = ? AND status = 'running'",
+                (time.time() + lease, owner),
+            )
+
+    def requeue_orphans(self):
+        # A running job whose lease ran out belongs to a process that stopped
+        # renewing it (crashed, killed or restarted); put it back in line.
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                orphans = [row["id"] for row in conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'running' "
+                    "AND (lease_expires IS NULL OR lease_expires < ?)",
+                    (time.time(),),
+                )]
+                for job_id in orphans:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', started_at = NULL, "
+                        "owner = NULL, lease_expires = NULL, pages = 0, records = 0 "
+                        "WHERE id = ?",
+                        (job_id,),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if orphans:
+            logger.info(f"Requeued {len(orphans)} interrupted jobs.")
+        return orphans
+
+
+class JobQueue:
+    def __init__(self, store, runner, workers=1, poll_interval=5.0, lease=60.0):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self.poll_interval = poll_interval
+        # Seconds a claim stays valid without a heartbeat; renewed every lease / 3.
+        self.lease = lease
+        # Per-process id stored with each claim. PIDs get reused across restarts
+        # (every container's worker can be PID 1), a fresh uuid never is.
+        self._owner = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Threads don't survive a fork, so a forked worker process starts its own.
+            self._pid = os.getpid()
+            self._owner = uuid.uuid4().hex
+            self.store.requeue_orphans()
+            self._threads = [
+                threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                for i in range(max(1, self.workers))
+            ]
+            self._threads.append(threading.Thread(
+                target=self._heartbeat, name="job-heartbeat", daemon=True
+            ))
+            for thread in self._threads:
+                thread.start()
+        logger.info(f"Started {len(self._threads)} job workers.")
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join()
+
+    def submit(self, kind, options):
+        job = self.store.create(kind, options)
+        self._wakeup.set()
+        logger.info(f"Queued {kind} job {job['id']}.")
+        return job
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self.store.claim_next(self._owner, self.lease)
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _heartbeat(self):
+        # Keeps this process's claims alive and picks up jobs whose owner died
+        # while the rest of the service kept running.
+        while not self._stop.wait(self.lease / 3):
+            try:
+                self.store.renew(self._owner, self.lease)
+                if self.store.requeue_orphans():
+                    self._wakeup.set()
+            except sqlite3.Error as e:
+                logger.warning(f"Job heartbeat failed: {e}")
+
+    def _run(self, job):
+        logger.info(f"Running {job['kind']} job {job['id']}.")
+
+        def progress(pages, records):
+            self.store.update_progress(job["id"], pages, records)
+
+        try:
+            result = self.runner(job["kind"], job["options"], progress)
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}")
+            self.store.finish(job["id"], error=str(e))
+            return
+        self.store.finish(job["id"], result=result)
+        logger.info(f"Job {job['id']} finished.")
@@ -0,0 +1,176 @@
+from contextlib import contextmanager
+import threading
+import time
+
+# Prometheus text exposition format, without pulling in prometheus_client:
+# gunicorn runs a single worker process, so plain in-memory instruments suffice.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    labels = (f'{name}="{escape_label(value)}"' for name, value in pairs)
+    return "{" + ",".join(labels) + "}"
+
+
+def format_value(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            labels = format_labels(self.labelnames, key)
+            yield f"{self.name}{labels} {format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(
+                key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def count(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return series["count"] if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = {
+                key: dict(s, buckets=list(s["buckets"]))
+                for key, s in self._series.items()
+            }
+        for key, s in sorted(series.items()):
+            for bound, count in zip(self.buckets, s["buckets"]):
+                le = format_labels(self.labelnames, key, [("le", format_value(bound))])
+                yield f"{self.name}_bucket{le} {count}"
+            le = format_labels(self.labelnames, key, [("le", "+Inf")])
+            yield f"{self.name}_bucket{le} {s['count']}"
+            labels = format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {format_value(s['sum'])}"
+            yield f"{self.name}_count{labels} {s['count']}"
+
+
+class Gauge:
+    # Read at scrape time from a callback, e.g. pool or admission stats.
+    kind = "gauge"
+
+    def __init__(self, name, documentation, read):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def samples(self):
+        yield f"{self.name} {format_value(self.read())}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+driver_startup_seconds = registry.register(Histogram(
+    "scraper_driver_startup_seconds", "Time to launch a Chrome session."))
+navigation_seconds = registry.register(Histogram(
+    "scraper_navigation_seconds",
+    "Time to load the register page in a browser session."))
+form_fill_seconds = registry.register(Histogram(
+    "scraper_form_fill_seconds", "Time to fill the search form."))
+find_click_seconds = registry.register(Histogram(
+    "scraper_find_click_seconds", "Time to locate and click the Find button."))
+page_wait_seconds = registry.register(Histogram(
+    "scraper_page_wait_seconds",
+    "Time spent waiting for the page to be ready, by step.", ["step"]))
+page_extract_seconds = registry.register(Histogram(
+    "scraper_page_extract_seconds",
+    "Time to extract the records of one result page.", ["engine"]))
+request_seconds = registry.register(Histogram(
+    "scraper_request_seconds",
+    "Time to produce an API response.", ["method", "endpoint", "status"]))
+
+pages_total = registry.register(Counter(
+    "scraper_pages_total", "Result pages scraped.", ["engine"]))
+records_total = registry.register(Counter(
+    "scraper_records_total", "Records scraped.", ["engine"]))
+retries_total = registry.register(Counter(
+    "scraper_retries_total", "Operations retried, by operation.", ["operation"]))
+stale_recoveries_total = registry.register(Counter(
+    "scraper_stale_recoveries_total", "Stale element references recovered from."))
+errors_total = registry.register(Counter(
+    "scraper_errors_total", "Scrape errors, by stage.", ["stage"]))
+export_bytes_total = registry.register(Counter(
+    "scraper_export_bytes_total",
+    "Bytes sent by /export, by format and content encoding.", ["format", "encoding"]))
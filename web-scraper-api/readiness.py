@@ -0,0 +1,165 @@
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+)
+from selenium.webdriver.common.by import By
+import logging
+import metrics
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds allowed for each kind of wait before the scrape gives up.
+STEP_TIMEOUTS = {
+    "find_button": float(os.getenv("WAIT_FIND_BUTTON_TIMEOUT", "60")),
+    "results": float(os.getenv("WAIT_RESULTS_TIMEOUT", "120")),
+    "next_page": float(os.getenv("WAIT_NEXT_PAGE_TIMEOUT", "60")),
+}
+INITIAL_POLL = 0.05
+MAX_POLL = 1.0
+
+# One round trip that tells whether a postback has settled: the document is
+# parsed, no ASP.NET AJAX request is in flight, and which grid page is showing.
+PAGE_STATE_SCRIPT = """
+const prm = (window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager)
+    ? Sys.WebForms.PageRequestManager.getInstance() : null;
+const current = document.querySelector(".rgCurrentPage");
+return {
+    loaded: document.readyState !== "loading",
+    inPostBack: prm ? prm.get_isInAsyncPostBack() : false,
+    pageIndex: current ? current.textContent.trim() : null,
+    hasTable: document.querySelector("table tbody") !== null,
+};
+"""
+
+
+class WaitStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._steps = {}
+
+    def record(self, step, seconds, timed_out=False):
+        with self._lock:
+            stats = self._steps.setdefault(step, {
+                "count": 0, "timeouts": 0, "seconds_total": 0.0, "seconds_max": 0.0,
+            })
+            stats["count"] += 1
+            stats["timeouts"] += int(timed_out)
+            stats["seconds_total"] += seconds
+            stats["seconds_max"] = max(stats["seconds_max"], seconds)
+
+    def stats(self):
+        with self._lock:
+            steps = {step: dict(stats) for step, stats in self._steps.items()}
+        for stats in steps.values():
+            stats["seconds_avg"] = stats["seconds_total"] / stats["count"]
+        return steps
+
+
+wait_stats = WaitStats()
+
+
+def wait_until(driver, condition, step, timeout=None, stats=wait_stats):
+    # Polls quickly at first, since most postbacks settle in well under a
+    # second, then backs off so slow pages don't hammer the driver.
+    timeout = STEP_TIMEOUTS[step] if timeout is None else timeout
+    started = time.monotonic()
+    delay = INITIAL_POLL
+    while True:
+        try:
+            result = condition(driver)
+        except NoSuchElementException:
+            result = None
+        except StaleElementReferenceException:
+            metrics.stale_recoveries_total.inc()
+            result = None
+        elapsed = time.monotonic() - started
+        if result:
+            stats.record(step, elapsed)
+            metrics.page_wait_seconds.observe(elapsed, step=step)
+            return result
+        if elapsed >= timeout:
+            stats.record(step, elapsed, timed_out=True)
+            metrics.page_wait_seconds.observe(elapsed, step=step)
+            raise TimeoutException(f"Timed out after {timeout:.0f}s waiting for {step}")
+        time.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * 2, MAX_POLL)
+
+
+def page_state(driver):
+    return driver.execute_script(PAGE_STATE_SCRIPT)
+
+
+def clickable(locator):
+    def condition(driver):
+        for element in driver.find_elements(*locator):
+            if element.is_displayed() and element.is_enabled():
+                return element
+        return None
+    return condition
+
+
+def is_stale(element):
+    try:
+        element.is_enabled()
+    except StaleElementReferenceException:
+        return True
+    return False
+
+
+class PostbackWatcher:
+    # Snapshot the grid before a click, then tell when the postback it starts
+    # has replaced that grid, so extraction never reads the previous page.
+    def __init__(self, driver):
+        tables = driver.find_elements(By.CSS_SELECTOR, "table tbody")
+        self.table = tables[0] if tables else None
+        self.page_index = page_state(driver)["pageIndex"]
+        self.saw_postback = False
+
+    def __call__(self, driver):
+        state = page_state(driver)
+        if state["inPostBack"]:
+            self.saw_postback = True
+            return None
+        if not state["loaded"] or not state["hasTable"]:
+            return None
+        replaced = (
+            self.table is None
+            or self.saw_postback
+            or state["pageIndex"] != self.page_index
+            or is_stale(self.table)
+        )
+        return state if replaced else None
+
+
+def next_page_button(driver):
+    # The pager renders Next as disabled (or a no-op) on the last page, and by
+    # now the page has settled, so there is nothing to wait for.
+    for button in driver.find_elements(By.CSS_SELECTOR, "input[title='Next Page']"):
+        onclick = (button.get_attribute("onclick") or "").replace(" ", "")
+        clickable = button.is_displayed() and button.is_enabled()
+        if clickable and "returnfalse" not in onclick:
+            return button
+    return None
+
+
+def click_fresh(driver, find, attempts=3):
+    # The pager is re-rendered by every postback; re-locate the button if the
+    # reference went stale between finding and clicking it.
+    delay = INITIAL_POLL
+    for _ in range(attempts):
+        button = find(driver)
+        if button is None:
+            return False
+        try:
+            button.click()
+            return True
+        except StaleElementReferenceException:
+            metrics.stale_recoveries_total.inc()
+            metrics.retries_total.inc(operation="next_page_click")
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_POLL)
+    return False
@@ -0,0 +1,153 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import logging
+import threading
+
+try:
+    import psycopg2.extras
+    import psycopg2.pool
+except ImportError:  # GET /records is offered only when psycopg2 is installed.
+    psycopg2 = None
+
+logger = logging.getLogger(__name__)
+
+# Columns returned per row; the keyset cursor is id.
+RECORD_COLUMNS = [
+    "id", "registrant", "status", "class", "location", "details_link",
+    "crawl_run_id", "first_seen_at", "updated_at", "removed_at",
+]
+# Exact-match filters, each backed by a partial (column, id) index.
+EXACT_FILTERS = ["status", "class", "location"]
+# Columns of scraped_data_changes, the history the Lambda's sync load writes.
+CHANGE_COLUMNS = [
+    "id", "run_id", "detected_at", "record_key", "change", "previous_status",
+    "registrant", "status", "class", "location", "content_hash",
+]
+CHANGE_TYPES = ("added", "changed", "removed")
+
+
+def like_escape(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def parse_since(value):
+    # ISO 8601 date or datetime (naive means UTC), or Unix seconds.
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(
+            f"since must be an ISO 8601 timestamp or Unix seconds, got '{value}'"
+        )
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def build_changes_query(since=0.0, after=0, limit=1000, change=None):
+    # Events in detection order, paged by id like scraped_data.
+    clauses = ["id > %s", "detected_at >= to_timestamp(%s)"]
+    args = [after, since]
+    if change:
+        clauses.append("change = %s")
+        args.append(change)
+    sql = (
+        f"SELECT {', '.join(CHANGE_COLUMNS)} FROM scraped_data_changes "
+        f"WHERE {' AND '.join(clauses)} ORDER BY id LIMIT %s"
+    )
+    args.append(limit)
+    return sql, args
+
+
+def build_query(filters, after=0, limit=100, include_removed=False,
+                columns=RECORD_COLUMNS, offset=0):
+    # Returns (sql, args). Every filter keeps the id ordering index-friendly, so
+    # each page is a range scan starting right after the previous page's last id.
+    clauses = ["id > %s"]
+    args = [after]
+    if not include_removed:
+        clauses.append("removed_at IS NULL")
+    for column in EXACT_FILTERS:
+        if filters.get(column):
+            clauses.append(f"{column} = %s")
+            args.append(filters[column])
+    if filters.get("name"):
+        # Prefix search on the lower(registrant) text_pattern_ops index.
+        clauses.append("lower(registrant) LIKE %s")
+        args.append(like_escape(filters["name"].lower()) + "%")
+    if filters.get("q"):
+        # Substring search on the pg_trgm index.
+        clauses.append("registrant ILIKE %s")
+        args.append("%" + like_escape(filters["q"]) + "%")
+    sql = (
+        f"SELECT {', '.join(columns)} FROM scraped_data WHERE {' AND '.join(clauses)} "
+        "ORDER BY id LIMIT %s"
+    )
+    args.append(limit)
+    if offset:
+        sql += " OFFSET %s"
+        args.append(offset)
+    return sql, args
+
+
+class RecordsReader:
+    # Reads scraped_data straight from Postgres (DATABASE_URL), over a small
+    # connection pool opened on first use.
+    def __init__(self, dsn, max_connections=4):
+        self.dsn = dsn
+        self.max_connections = max_connections
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        return bool(self.dsn) and psycopg2 is not None
+
+    @contextmanager
+    def _connect(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = psycopg2.pool.ThreadedConnectionPool(
+                    1, self.max_connections, self.dsn
+                )
+        conn = self._pool.getconn()
+        try:
+            conn.autocommit = True
+            yield conn
+        except psycopg2.Error:
+            # A broken connection shouldn't go back into the pool.
+            self._pool.putconn(conn, close=True)
+            raise
+        else:
+            self._pool.putconn(conn)
+
+    def query(self, filters, after=0, limit=100, include_removed=False):
+        rows = self._fetch(*build_query(filters, after, limit, include_removed))
+        return [self._record(row) for row in rows]
+
+    def changes(self, since=0.0, after=0, limit=1000, change=None):
+        rows = self._fetch(*build_changes_query(since, after, limit, change))
+        return [dict(row, detected_at=row["detected_at"].isoformat()) for row in rows]
+
+    def next_cursor(self, filters, after, limit, include_removed=False):
+        # The id a page of `limit` rows after `after` ends on, or None when no
+        # row follows that page. Reads ids only, off the same index.
+        rows = self._fetch(*build_query(
+            filters, after, 2, include_removed, columns=["id"], offset=limit - 1
+        ))
+        return rows[0]["id"] if len(rows) == 2 else None
+
+    def _fetch(self, sql, args):
+        with self._connect() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(sql, args)
+                return cursor.fetchall()
+
+    def _record(self, row):
+        record = dict(row)
+        for column in ("first_seen_at", "updated_at", "removed_at"):
+            if record[column] is not None:
+                record[column] = record[column].isoformat()
+        return record
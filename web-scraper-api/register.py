@@ -0,0 +1,67 @@
+# Page model of the College of Opticians Public Register search form, shared by
+# the browser and HTTP scraping engines.
+
+import hashlib
+import os
+
+# Overridable so benchmarks and tests can point both engines at a local stand-in.
+REGISTER_URL = os.getenv(
+    "REGISTER_URL", "https://members.collegeofopticians.ca/Public-Register"
+)
+
+SEARCH_PARAMS = [
+    'last_name',
+    'first_name_contains',
+    'informal_name_contains',
+    'registration_number',
+    'registration_class',
+    'registration_status',
+    'contact_lens_mentor',
+    'area_of_service',
+    'language_of_service',
+    'practice_name',
+    'city_or_town',
+    'postal_code',
+]
+
+FIELD_ID_PREFIX = (
+    'ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_'
+    'ciNewQueryMenuCommon_ResultsGrid_Sheet0_'
+)
+
+TEXT_FIELDS = {
+    'last_name': FIELD_ID_PREFIX + 'Input0_TextBox1',
+    'first_name_contains': FIELD_ID_PREFIX + 'Input1_TextBox1',
+    'informal_name_contains': FIELD_ID_PREFIX + 'Input2_TextBox1',
+    'registration_number': FIELD_ID_PREFIX + 'Input3_TextBox1',
+    'practice_name': FIELD_ID_PREFIX + 'Input9_TextBox1',
+    'city_or_town': FIELD_ID_PREFIX + 'Input10_TextBox1',
+    'postal_code': FIELD_ID_PREFIX + 'Input11_TextBox1',
+}
+
+DROPDOWN_FIELDS = {
+    'registration_class': FIELD_ID_PREFIX + 'Input4_DropDown1',
+    'registration_status': FIELD_ID_PREFIX + 'Input5_DropDown1',
+    'contact_lens_mentor': FIELD_ID_PREFIX + 'Input6_DropDown1',
+    'area_of_service': FIELD_ID_PREFIX + 'Input7_DropDown1',
+}
+
+RECORD_FIELDS = ["registrant", "status", "class", "location", "details_link"]
+
+
+def record_key(record):
+    # The one identity of a register row: its details link, or a hash of name
+    # and location when it has none. The Lambda stores scraped_data rows under
+    # the same key.
+    if record["details_link"]:
+        return record["details_link"]
+    identity = f"{record['registrant']}|{record['location']}"
+    return "nolink:" + hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+
+class ScrapeError(Exception):
+    pass
+
+
+def get_search_params(args):
+    return {name: args.get(name, '') for name in SEARCH_PARAMS}
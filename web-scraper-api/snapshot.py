@@ -0,0 +1,165 @@
+from bisect import bisect_left
+from collections import defaultdict
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Filters the snapshot can answer exactly; anything else goes to a live scrape.
+SNAPSHOT_FILTERS = (
+    'last_name',
+    'first_name_contains',
+    'registration_class',
+    'registration_status',
+    'city_or_town',
+)
+
+
+def split_registrant(registrant):
+    # The grid shows registrants as "Last, First".
+    last, _, first = registrant.partition(",")
+    return last.strip().lower(), first.strip().lower()
+
+
+def location_city(location):
+    return location.partition(",")[0].strip().lower()
+
+
+class RegisterSnapshot:
+    def __init__(self, records, loaded_at):
+        self.records = records
+        self.loaded_at = loaded_at
+
+        # Sorted (last name, row) pairs give prefix lookups by bisection.
+        self._last_names = sorted(
+            (split_registrant(record["registrant"])[0], i)
+            for i, record in enumerate(records)
+        )
+        self._by_field = {
+            'registration_class': defaultdict(set),
+            'registration_status': defaultdict(set),
+            'city_or_town': defaultdict(set),
+        }
+        for i, record in enumerate(records):
+            by_class = self._by_field['registration_class']
+            by_class[record["class"].strip().lower()].add(i)
+            by_status = self._by_field['registration_status']
+            by_status[record["status"].strip().lower()].add(i)
+            self._by_field['city_or_town'][location_city(record["location"])].add(i)
+
+    def age(self):
+        return time.time() - self.loaded_at
+
+    def last_names(self):
+        return [name for name, _ in self._last_names]
+
+    def query(self, params):
+        filters = {
+            name: value.strip().lower()
+            for name, value in params.items() if value and value.strip()
+        }
+        if not all(name in SNAPSHOT_FILTERS for name in filters):
+            return None
+
+        matches = None
+        if 'last_name' in filters:
+            matches = self._last_name_prefix(filters['last_name'])
+        for name, index in self._by_field.items():
+            if name in filters:
+                rows = index.get(filters[name], set())
+                matches = rows if matches is None else matches & rows
+        if matches is None:
+            matches = range(len(self.records))
+
+        rows = sorted(matches)
+        if 'first_name_contains' in filters:
+            needle = filters['first_name_contains']
+            rows = [
+                i for i in rows
+                if needle in split_registrant(self.records[i]["registrant"])[1]
+            ]
+        return [self.records[i] for i in rows]
+
+    def _last_name_prefix(self, prefix):
+        rows = set()
+        start = bisect_left(self._last_names, (prefix, -1))
+        for name, i in self._last_names[start:]:
+            if not name.startswith(prefix):
+                break
+            rows.add(i)
+        return rows
+
+
+class SnapshotStore:
+    def __init__(self, path=None, max_age=26 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self._snapshot = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def current(self):
+        with self._lock:
+            snapshot = self._snapshot
+        if self._reload_needed():
+            self._load()
+            with self._lock:
+                snapshot = self._snapshot
+        if snapshot is None or snapshot.age() > self.max_age:
+            return None
+        return snapshot
+
+    def replace(self, records):
+        snapshot = RegisterSnapshot(records, time.time())
+        with self._lock:
+            self._snapshot = snapshot
+        logger.info(f"Snapshot replaced with {len(records)} records.")
+        if self.path:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"loaded_at": snapshot.loaded_at, "data": records}, f)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.path.getmtime(self.path)
+        return snapshot
+
+    def status(self):
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is None:
+            return {"available": False, "max_age": self.max_age}
+        return {
+            "available": snapshot.age() <= self.max_age,
+            "records": len(snapshot.records),
+            "age": round(snapshot.age(), 1),
+            "max_age": self.max_age,
+        }
+
+    def _reload_needed(self):
+        # Another worker process may have written a newer snapshot file.
+        if not self.path or not os.path.exists(self.path):
+            return False
+        return os.path.getmtime(self.path) != self._mtime
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Error loading snapshot from {self.path}: {e}")
+            # Don't retry the same broken file on every request.
+            exists = os.path.exists(self.path)
+            self._mtime = os.path.getmtime(self.path) if exists else None
+            return
+        snapshot = RegisterSnapshot(payload["data"], payload["loaded_at"])
+        with self._lock:
+            self._snapshot = snapshot
+            self._mtime = mtime
+        logger.info(
+            f"Loaded snapshot of {len(snapshot.records)} records from {self.path}."
+        )
@@ -0,0 +1,92 @@
+import pytest
+import threading
+from admission import AdmissionController, Overloaded, default_capacity
+
+
+def plenty():
+    return {"MemTotal": 4096, "MemAvailable": 2048}
+
+
+def test_default_capacity_follows_memory(mocker):
+    mocker.patch("admission.os.cpu_count", return_value=2)
+
+    assert default_capacity(250, 300, {"MemTotal": 1024}) == 2
+    assert default_capacity(250, 300, {"MemTotal": 512}) == 1
+    assert default_capacity(250, 300, {"MemTotal": 16384}) == 4
+    assert default_capacity(250, 300, {}) == 4
+
+
+def test_full_queue_is_rejected_with_429():
+    admission = AdmissionController(max_concurrent=1, max_queue=0, meminfo=plenty)
+
+    with admission.slot():
+        with pytest.raises(Overloaded) as excinfo:
+            with admission.slot():
+                pass
+    assert excinfo.value.status == 429
+    assert excinfo.value.retry_after >= 1
+    assert admission.stats()["rejected_queue_full"] == 1
+
+
+def test_queued_request_times_out_with_503():
+    admission = AdmissionController(
+        max_concurrent=1, max_queue=1, queue_timeout=0.05, meminfo=plenty
+    )
+
+    with admission.slot():
+        with pytest.raises(Overloaded) as excinfo:
+            with admission.slot():
+                pass
+    assert excinfo.value.status == 503
+    assert admission.stats()["waiting"] == 0
+
+
+def test_queued_request_runs_when_a_slot_frees_up():
+    admission = AdmissionController(
+        max_concurrent=1, max_queue=1, queue_timeout=5, meminfo=plenty
+    )
+    release = threading.Event()
+
+    def hold():
+        with admission.slot():
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    while admission.stats()["running"] == 0:
+        pass
+    threading.Timer(0.05, release.set).start()
+    with admission.slot():
+        assert admission.stats()["running"] == 1
+    holder.join()
+    assert admission.stats()["admitted"] == 2
+
+
+def test_low_memory_is_rejected_but_jobs_still_wait():
+    admission = AdmissionController(
+        max_concurrent=2, meminfo=lambda: {"MemTotal": 1024, "MemAvailable": 50}
+    )
+
+    with pytest.raises(Overloaded) as excinfo:
+        with admission.slot():
+            pass
+    assert excinfo.value.status == 503
+    with admission.slot(timeout=None):
+        pass
+
+
+def test_weighted_slot_waits_for_enough_free_sessions():
+    admission = AdmissionController(
+        max_concurrent=3, max_queue=1, queue_timeout=0.05, meminfo=plenty
+    )
+
+    with admission.slot():
+        with pytest.raises(Overloaded):
+            with admission.slot(weight=3):
+                pass
+        with admission.slot(weight=2):
+            assert admission.stats()["running"] == 3
+    # More than the limit is capped, so it still gets in on an idle box.
+    with admission.slot(weight=10):
+        assert admission.stats()["running"] == 3
+    assert admission.stats()["running"] == 0
@@ -1,16 +1,37 @@
 import pytest
 from flask import Flask
+import gzip
 import json
-from app import app  # Import the Flask app from your app.py file
+import app as app_module
+import readiness
+from register import ScrapeError
+from app import app, scrape_cache  # Import the Flask app from your app.py file
+from admission import Overloaded
+from catalog import OptionCatalog
+from checkpoint import CheckpointStore
+from records import RecordsReader
+from snapshot import SnapshotStore
+
 
 @pytest.fixture
-def client():
+def client(monkeypatch, tmp_path):
+    scrape_cache.clear()
+    monkeypatch.setattr(app_module, 'snapshot_store', SnapshotStore())
+    checkpoint_store = CheckpointStore(str(tmp_path / "checkpoints.db"))
+    monkeypatch.setattr(app_module, 'checkpoint_store', checkpoint_store)
+    option_catalog = OptionCatalog(app_module.fetch_dropdown_options)
+    monkeypatch.setattr(app_module, 'option_catalog', option_catalog)
+    monkeypatch.setattr(app_module, 'records_reader', RecordsReader(""))
+    # Mocked drivers never finish a postback; don't sit out the real timeouts.
+    for step in readiness.STEP_TIMEOUTS:
+        monkeypatch.setitem(readiness.STEP_TIMEOUTS, step, 1)
     with app.test_client() as client:
         yield client
 
+
 def test_scrape(client, mocker):
     # Mock the selenium parts to avoid actual web scraping during tests
-    mock_driver = mocker.patch('app.webdriver.Chrome')
+    mock_driver = mocker.patch('driver_pool.webdriver.Chrome')
     mock_instance = mock_driver.return_value
 
     # Mock methods
@@ -23,7 +44,6 @@ def test_scrape(client, mocker):
     mock_find_element.click.return_value = None
     mock_instance.find_element.side_effect = lambda by, value: mock_find_element
 
-    mock_set_dropdown_value = mocker.patch('app.set_dropdown_value')
     mock_extract_table_data = mocker.patch('app.extract_table_data', return_value=[{
         "registrant": "John Doe",
         "status": "Active",
@@ -45,9 +65,10 @@ def test_scrape(client, mocker):
     # assert len(data["data"]) == 1
     # assert data["data"][0]["registrant"] == "John Doe"
 
+
 def test_scrape_error(client, mocker):
     # Mock the selenium parts to simulate an error
-    mock_driver = mocker.patch('app.webdriver.Chrome')
+    mock_driver = mocker.patch('driver_pool.webdriver.Chrome')
     mock_driver.side_effect = Exception("Driver error")
 
     # Send a GET request to the /scrape endpoint
@@ -61,3 +82,612 @@ def test_scrape_error(client, mocker):
     data = json.loads(response.data)
     assert "error" in data
     assert data["error"] == "Driver error"
+
+
+def test_scrape_http_engine(client, mocker):
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    mock_client.return_value.iter_result_pages.return_value = iter([
+        [{"registrant": "John Doe", "status": "Active", "class": "Class A",
+          "location": "City, State", "details_link": "http://example.com/details"}],
+        [{"registrant": "Jane Doe", "status": "Active", "class": "Class A",
+          "location": "City, State", "details_link": "http://example.com/details2"}],
+    ])
+
+    response = client.get(
+        '/scrape', query_string={'last_name': 'Doe', 'engine': 'http'}
+    )
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [record["registrant"] for record in data["data"]] == ["John Doe", "Jane Doe"]
+    params = mock_client.return_value.iter_result_pages.call_args.args[0]
+    assert params['last_name'] == 'Doe'
+    assert 'engine' not in params
+
+
+def test_scrape_unknown_engine(client):
+    response = client.get('/scrape', query_string={'engine': 'curl'})
+
+    assert response.status_code == 400
+
+
+def test_extract_table_data_single_round_trip(mocker):
+    from app import extract_table_data
+
+    driver = mocker.Mock()
+    driver.execute_script.return_value = [
+        [" John Doe ", "Active", "Class A", "City, State\n",
+         "http://example.com/details "],
+        ["Jane Doe", "Inactive", "Class B", "Town", ""],
+    ]
+
+    data = extract_table_data(driver)
+
+    driver.execute_script.assert_called_once()
+    driver.find_elements.assert_not_called()
+    assert data == [
+        {"registrant": "John Doe", "status": "Active", "class": "Class A",
+         "location": "City, State", "details_link": "http://example.com/details"},
+        {"registrant": "Jane Doe", "status": "Inactive", "class": "Class B",
+         "location": "Town", "details_link": ""},
+    ]
+
+
+def test_crawl_by_last_name(client, mocker):
+    mock_crawl = mocker.patch('app.crawl', return_value={
+        "data": [], "complete": True, "duplicates": 0, "seconds": 0.1, "shards": []})
+    app_module.snapshot_store.replace([
+        {"registrant": "Émond, Anna", "status": "Active", "class": "Optician",
+         "location": "Ottawa, ON", "details_link": ""},
+    ])
+
+    response = client.get(
+        '/crawl', query_string={'shard_by': 'last_name', 'workers': '4'}
+    )
+
+    assert response.status_code == 200
+    args = mock_crawl.call_args.args
+    # A-Z, 0-9 and the É seen in the snapshot.
+    assert [shard["params"]["last_name"] for shard in args[0]][-2:] == ["9", "É"]
+    assert args[3] == 4
+
+
+def test_scrape_stream_ndjson(client, mocker):
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    mock_client.return_value.iter_result_pages.return_value = iter([
+        [{"registrant": "John Doe", "status": "Active", "class": "Class A",
+          "location": "City, State", "details_link": "http://example.com/details"}],
+        [{"registrant": "Jane Doe", "status": "Active", "class": "Class A",
+          "location": "City, State", "details_link": "http://example.com/details2"}],
+    ])
+
+    response = client.get('/scrape', query_string={'engine': 'http'},
+                          headers={'Accept': 'application/x-ndjson'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [line["registrant"] for line in lines[:-1]] == ["John Doe", "Jane Doe"]
+    assert lines[-1]["summary"]["records"] == 2
+    assert lines[-1]["summary"]["pages"] == 2
+    assert lines[-1]["summary"]["error"] is None
+
+
+def test_scrape_stream_reports_error_in_summary(client, mocker):
+    def pages(params, skip_pages=0):
+        yield [
+            {"registrant": "John Doe", "status": "Active", "class": "Class A",
+             "location": "City, State", "details_link": "http://example.com/details"},
+        ]
+        raise Exception("Error during pagination")
+
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    mock_client.return_value.iter_result_pages.side_effect = pages
+
+    response = client.get('/scrape', query_string={'engine': 'http', 'stream': '1'})
+
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert len(lines) == 2
+    assert lines[-1]["summary"]["error"] == "Error during pagination"
+
+
+def test_scrape_stream_setup_error(client, mocker):
+    mock_driver = mocker.patch('driver_pool.webdriver.Chrome')
+    mock_driver.side_effect = Exception("Driver error")
+
+    response = client.get('/scrape', query_string={'stream': '1'})
+
+    assert response.status_code == 500
+    assert json.loads(response.data)["error"] == "Driver error"
+
+
+def test_scrape_serves_repeat_queries_from_cache(client, mocker):
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    search = mock_client.return_value.iter_result_pages
+    search.side_effect = lambda params, skip_pages=0: iter([
+        [{"registrant": "John Doe", "status": "Active", "class": "Class A",
+          "location": "City, State", "details_link": "http://example.com/details"}],
+    ])
+    toronto = {'city_or_town': 'Toronto', 'engine': 'http'}
+
+    first = client.get('/scrape', query_string=toronto)
+    second = client.get(
+        '/scrape', query_string={'city_or_town': ' Toronto ', 'engine': 'http'}
+    )
+
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert json.loads(second.data) == json.loads(first.data)
+    assert mock_client.return_value.iter_result_pages.call_count == 1
+    assert 'max-age=' in second.headers['Cache-Control']
+
+    not_modified = client.get('/scrape', query_string=toronto,
+                              headers={'If-None-Match': first.headers['ETag']})
+    assert not_modified.status_code == 304
+
+    bypass = client.get('/scrape', query_string=dict(toronto, cache='0'))
+    assert bypass.headers['X-Cache'] == 'BYPASS'
+    assert mock_client.return_value.iter_result_pages.call_count == 2
+    assert json.loads(client.get('/cache').data)['hits'] == 2
+
+
+def test_scrape_answers_from_snapshot(client, mocker):
+    app_module.snapshot_store.replace([
+        {"registrant": "Doe, John", "status": "Active", "class": "Optician",
+         "location": "Toronto, ON", "details_link": "http://example.com/1"},
+        {"registrant": "Roe, Ann", "status": "Active", "class": "Optician",
+         "location": "Ottawa, ON", "details_link": "http://example.com/2"},
+    ])
+    mock_client = mocker.patch('app.RegisterHttpClient')
+
+    response = client.get('/scrape', query_string={'last_name': 'do', 'engine': 'http'})
+
+    assert response.status_code == 200
+    assert response.headers['X-Source'] == 'snapshot'
+    assert [r["registrant"] for r in json.loads(response.data)["data"]] == ["Doe, John"]
+    mock_client.assert_not_called()
+
+
+def test_put_snapshot_replaces_it_with_a_merged_crawl(client, mocker, monkeypatch):
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    monkeypatch.setattr(app_module, 'SNAPSHOT_TOKEN', 'secret')
+    token = {'X-Snapshot-Token': 'secret'}
+    record = {"registrant": "Doe, John", "status": "Active", "class": "Optician",
+              "location": "Toronto, ON", "details_link": "http://example.com/1"}
+
+    assert client.put('/snapshot', json={"data": [record]}).status_code == 401
+    wrong = client.put('/snapshot', json={"data": [record]},
+                       headers={'X-Snapshot-Token': 'guess'})
+    assert wrong.status_code == 401
+    response = client.put('/snapshot', json={"data": [record]}, headers=token)
+
+    assert response.status_code == 200
+    assert json.loads(response.data)["records"] == 1
+    scraped = client.get('/scrape', query_string={'last_name': 'doe', 'engine': 'http'})
+    assert scraped.headers['X-Source'] == 'snapshot'
+    mock_client.return_value.iter_result_pages.assert_not_called()
+
+    assert client.put('/snapshot', json={"data": []}, headers=token).status_code == 400
+    no_link = dict(record)
+    del no_link["details_link"]
+    missing = client.put('/snapshot', json={"data": [record, no_link]}, headers=token)
+    assert missing.status_code == 400
+    error = json.loads(missing.data)["error"]
+    assert error == "Record 1 needs registrant, status, class, location, details_link"
+    assert json.loads(client.get('/snapshot').data)["records"] == 1
+
+
+def test_put_snapshot_is_closed_without_a_token(client):
+    record = {"registrant": "Doe, John", "status": "Active", "class": "Optician",
+              "location": "Toronto, ON", "details_link": "http://example.com/1"}
+
+    response = client.put('/snapshot', json={"data": [record]},
+                          headers={'X-Snapshot-Token': ''})
+
+    assert response.status_code == 403
+    assert app_module.snapshot_store.current() is None
+
+
+def test_scrape_falls_back_to_live_for_unsupported_filters(client, mocker):
+    app_module.snapshot_store.replace([
+        {"registrant": "Doe, John", "status": "Active", "class": "Optician",
+         "location": "Toronto, ON", "details_link": "http://example.com/1"},
+    ])
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    mock_client.return_value.iter_result_pages.return_value = iter([[]])
+
+    response = client.get(
+        '/scrape', query_string={'postal_code': 'M5V', 'engine': 'http'}
+    )
+
+    assert response.status_code == 200
+    assert 'X-Source' not in response.headers
+    mock_client.return_value.iter_result_pages.assert_called_once()
+    forced = client.get(
+        '/scrape', query_string={'postal_code': 'M5V', 'source': 'snapshot'}
+    )
+    assert forced.status_code == 409
+
+
+def test_scrape_enrich_adds_details(client, mocker):
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    mock_client.return_value.iter_result_pages.return_value = iter([
+        [{"registrant": "Doe, John", "status": "Active", "class": "Optician",
+          "location": "Toronto, ON", "details_link": "http://example.com/details"}],
+    ])
+    mock_enrich = mocker.patch.object(
+        app_module.detail_enricher, 'enrich',
+        side_effect=lambda records: [dict(r, details={"a": "b"}) for r in records],
+    )
+
+    response = client.get(
+        '/scrape', query_string={'last_name': 'Doe', 'engine': 'http', 'enrich': '1'}
+    )
+
+    assert response.status_code == 200
+    assert json.loads(response.data)["data"][0]["details"] == {"a": "b"}
+    mock_enrich.assert_called_once()
+
+
+def test_scrape_resumes_from_checkpoint(client, mocker):
+    first_page = [{"registrant": "Doe, John", "status": "Active", "class": "Optician",
+                   "location": "Toronto, ON", "details_link": "http://example.com/1"}]
+    second_page = [{"registrant": "Roe, Ann", "status": "Active", "class": "Optician",
+                    "location": "Ottawa, ON", "details_link": "http://example.com/2"}]
+
+    def failing_pages(params, skip_pages=0):
+        yield first_page
+        raise ScrapeError("Error during pagination after page 1: timeout")
+
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    mock_client.return_value.iter_result_pages.side_effect = failing_pages
+    search = {'last_name': 'Doe', 'engine': 'http'}
+    failed = client.get('/scrape', query_string=dict(search, resume='1'))
+    assert failed.status_code == 500
+    run_id = failed.headers["X-Run-Id"]
+
+    checkpoints = json.loads(client.get('/checkpoints').data)["checkpoints"]
+    progress = [(c["pages"], c["records"], c["run_id"]) for c in checkpoints]
+    assert progress == [(1, 1, run_id)]
+
+    # The row from page 1 shifted onto page 2 while we were away.
+    mock_client.return_value.iter_result_pages.side_effect = (
+        lambda params, skip_pages=0: iter([first_page + second_page])
+    )
+    resumed = client.get('/scrape', query_string=dict(search, resume=run_id))
+
+    assert resumed.status_code == 200
+    links = [r["details_link"] for r in json.loads(resumed.data)["data"]]
+    assert links == ["http://example.com/1", "http://example.com/2"]
+    assert mock_client.return_value.iter_result_pages.call_args.args[1] == 1
+    assert json.loads(client.get('/checkpoints').data)["checkpoints"] == []
+
+
+def test_plain_scrape_is_not_checkpointed(client, mocker):
+    def failing_pages(params, skip_pages=0):
+        yield [{"registrant": "Doe, John", "status": "Active", "class": "Optician",
+                "location": "Toronto, ON", "details_link": "http://example.com/1"}]
+        raise ScrapeError("Error during pagination after page 1: timeout")
+
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    mock_client.return_value.iter_result_pages.side_effect = failing_pages
+    failed = client.get('/scrape', query_string={'last_name': 'Doe', 'engine': 'http'})
+
+    assert failed.status_code == 500
+    assert "X-Run-Id" not in failed.headers
+    assert json.loads(client.get('/checkpoints').data)["checkpoints"] == []
+
+
+def test_scrape_returns_retry_after_when_saturated(client, mocker):
+    mocker.patch.object(
+        app_module.admission, '_acquire',
+        side_effect=Overloaded("Too many scrapes queued", 429, 12),
+    )
+
+    response = client.get(
+        '/scrape', query_string={'last_name': 'Doe', 'source': 'live'}
+    )
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '12'
+
+
+def test_metrics_endpoint_reports_scrape_timings(client, mocker):
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    search = mock_client.return_value.iter_result_pages
+    search.side_effect = lambda params, skip_pages=0: iter([
+        [{"registrant": "Doe, John", "status": "Active", "class": "Optician",
+          "location": "Toronto, ON", "details_link": "http://example.com/1"}],
+    ])
+    pages_before = app_module.metrics.pages_total.value(engine="http")
+
+    client.get(
+        '/scrape', query_string={'last_name': 'Doe', 'engine': 'http', 'source': 'live'}
+    )
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    assert app_module.metrics.pages_total.value(engine="http") == pages_before + 1
+    text = response.data.decode()
+    assert (
+        'scraper_request_seconds_count{method="GET",endpoint="/scrape",status="200"}'
+    ) in text
+    assert '# TYPE scraper_pool_idle_sessions gauge' in text
+
+
+def test_export_pages_stored_records_by_id(client, mocker):
+    rows = [
+        {"id": i, "registrant": f"Doe {i}", "status": "Active", "class": "Optician",
+         "location": "Toronto, ON", "details_link": f"http://example.com/{i}"}
+        for i in (3, 5, 8)
+    ]
+    assert client.get('/export', query_string={'limit': '1'}).status_code == 503
+
+    reader = RecordsReader("postgresql://localhost/scraperdb")
+    mocker.patch.object(app_module, 'records_reader', reader)
+    mocker.patch.object(reader, 'available', return_value=True)
+    query = mocker.patch.object(
+        reader, 'query',
+        side_effect=lambda filters, after, limit: [
+            row for row in rows if row["id"] > after][:limit],
+    )
+    mocker.patch.object(reader, 'next_cursor', return_value=5)
+    mocker.patch.object(app_module, 'EXPORT_BATCH_ROWS', 1)
+    mock_client = mocker.patch('app.RegisterHttpClient')
+
+    first = client.get('/export',
+                       query_string={'limit': '2', 'registration_status': 'Active'},
+                       headers={'Accept-Encoding': 'gzip'})
+
+    assert first.status_code == 200
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.headers['X-Source'] == 'stored'
+    assert first.headers['X-Next-Cursor'] == '5'
+    lines = gzip.decompress(first.data).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [3, 5]
+    # One EXPORT_BATCH_ROWS query per page, each after the last id seen.
+    assert [call.args[1:] for call in query.call_args_list] == [(0, 1), (3, 1)]
+    assert query.call_args.args[0] == {"status": "Active"}
+
+    second = client.get('/export', query_string={'source': 'stored', 'after': '5'},
+                        headers={'Accept': 'text/csv'})
+    assert second.mimetype == 'text/csv'
+    assert 'X-Next-Cursor' not in second.headers
+    assert second.data.decode().splitlines()[1:] == [
+        'Doe 8,Active,Optician,"Toronto, ON",http://example.com/8',
+    ]
+    mock_client.return_value.iter_result_pages.assert_not_called()
+
+    unfiltered = {'source': 'stored', 'city_or_town': 'Toronto'}
+    assert client.get('/export', query_string=unfiltered).status_code == 400
+    query.side_effect = RuntimeError("connection refused")
+    assert client.get('/export', query_string={'source': 'stored'}).status_code == 502
+
+
+def test_export_streams_a_live_scrape(client, mocker):
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    search = mock_client.return_value.iter_result_pages
+    search.side_effect = lambda params, skip_pages=0: iter([
+        [{"registrant": "John Doe", "status": "Active", "class": "Class A",
+          "location": "City, State", "details_link": "http://example.com/details"}],
+        [{"registrant": "Jane Doe", "status": "Active", "class": "Class A",
+          "location": "City, State", "details_link": "http://example.com/details2"}],
+    ])
+
+    response = client.get('/export', query_string={'engine': 'http', 'format': 'csv'})
+
+    assert response.status_code == 200
+    assert response.headers['X-Source'] == 'live'
+    disposition = response.headers['Content-Disposition']
+    assert disposition == 'attachment; filename="register.csv"'
+    lines = response.data.decode().splitlines()
+    assert lines[0] == "registrant,status,class,location,details_link"
+    assert len(lines) == 3
+
+    live_page = client.get('/export', query_string={'source': 'live', 'limit': '5'})
+    assert live_page.status_code == 400
+    assert client.get('/export', query_string={'source': 'snapshot'}).status_code == 409
+    json_export = client.get('/export', headers={'Accept': 'application/json'})
+    assert json_export.status_code == 406
+
+
+def test_json_responses_are_gzipped_on_request(client, mocker):
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    search = mock_client.return_value.iter_result_pages
+    search.side_effect = lambda params, skip_pages=0: iter([
+        [{"registrant": f"Doe, John {i}", "status": "Active", "class": "Class A",
+          "location": "City, State", "details_link": f"http://example.com/{i}"}
+         for i in range(50)],
+    ])
+    toronto = {'city_or_town': 'Toronto', 'engine': 'http'}
+
+    plain = client.get('/scrape', query_string=toronto)
+    compressed = client.get('/scrape', query_string=toronto,
+                            headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert len(compressed.data) < len(plain.data) / 5
+    assert json.loads(gzip.decompress(compressed.data)) == json.loads(plain.data)
+    assert compressed.headers['ETag'].startswith('W/')
+    not_modified = client.get('/scrape', query_string=toronto, headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag'],
+    })
+    assert not_modified.status_code == 304
+
+
+def test_changes_are_read_from_scraped_data_changes(client, mocker):
+    assert client.get('/changes').status_code == 503
+
+    reader = RecordsReader("postgresql://localhost/scraperdb")
+    mocker.patch.object(app_module, 'records_reader', reader)
+    mocker.patch.object(reader, 'available', return_value=True)
+    changes = mocker.patch.object(reader, 'changes', return_value=[
+        {"id": 4, "run_id": "run-1", "change": "changed",
+         "previous_status": "Active", "status": "Suspended"},
+    ])
+
+    first = json.loads(client.get(
+        '/changes', query_string={'since': '2024-01-01', 'limit': '1'}
+    ).data)
+    assert first["changes"][0]["previous_status"] == "Active"
+    assert first["next_after"] == 4
+    assert changes.call_args.args == (1704067200.0, 0, 1, None)
+
+    client.get('/changes', query_string={'after': '4', 'change': 'removed'})
+    assert changes.call_args.args == (0.0, 4, 1000, "removed")
+    yesterday = client.get('/changes', query_string={'since': 'yesterday'})
+    assert yesterday.status_code == 400
+    assert client.get('/changes', query_string={'change': 'moved'}).status_code == 400
+    assert client.get('/changes', query_string={'limit': '0'}).status_code == 400
+    changes.side_effect = RuntimeError("connection refused")
+    assert client.get('/changes').status_code == 502
+
+
+def test_records_pages_by_id(client, mocker):
+    assert client.get('/records').status_code == 503
+
+    reader = RecordsReader("postgresql://localhost/scraperdb")
+    mocker.patch.object(app_module, 'records_reader', reader)
+    mocker.patch.object(reader, 'available', return_value=True)
+    query = mocker.patch.object(reader, 'query', return_value=[
+        {"id": 7, "registrant": "Doe, John"},
+        {"id": 9, "registrant": "Doe, Jane"},
+    ])
+
+    response = client.get('/records', query_string={
+        'name': 'doe', 'status': 'Active', 'limit': '2', 'after': '5',
+    })
+    assert response.status_code == 200
+    body = json.loads(response.data)
+    assert body["next_after"] == 9
+    filters, after, limit, include_removed = query.call_args.args
+    assert filters["name"] == "doe" and filters["status"] == "Active"
+    assert filters["class"] == ""
+    assert (after, limit, include_removed) == (5, 2, False)
+
+    assert client.get('/records', query_string={'after': 'x'}).status_code == 400
+    for limit in ('0', '-5'):
+        rejected = client.get('/records', query_string={'limit': limit})
+        assert rejected.status_code == 400
+        assert json.loads(rejected.data)["error"] == "limit must be at least 1"
+    query.side_effect = RuntimeError("connection refused")
+    assert client.get('/records').status_code == 502
+
+
+def test_invalid_dropdown_values_are_rejected_before_scraping(client, mocker):
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    form = mock_client.return_value.fetch_search_form.return_value
+    form.dropdown_options.side_effect = lambda dropdown_id: {
+        app_module.DROPDOWN_FIELDS['registration_status']: ["Active", "Suspended"],
+    }.get(dropdown_id, ["Optician"])
+    mock_session = mocker.patch.object(app_module.driver_pool, 'session')
+
+    response = client.get('/scrape', query_string={'registration_status': 'Retired'})
+
+    assert response.status_code == 400
+    assert "Active" in json.loads(response.data)["error"]
+    mock_session.assert_not_called()
+    mock_client.return_value.iter_result_pages.assert_not_called()
+
+    options = json.loads(client.get('/options').data)
+    assert options["options"]["registration_status"] == ["Active", "Suspended"]
+    assert mock_client.return_value.fetch_search_form.call_count == 1
+
+    mock_client.return_value.iter_result_pages.return_value = iter([[]])
+    response = client.get(
+        '/scrape', query_string={'registration_status': 'active', 'engine': 'http'}
+    )
+    assert response.status_code == 200
+    params = mock_client.return_value.iter_result_pages.call_args.args[0]
+    assert params['registration_status'] == 'Active'
+
+
+def test_fill_search_form_is_one_script_call(mocker):
+    driver = mocker.Mock()
+    driver.execute_script.return_value = {"missing": [], "unmatched": []}
+    params = app_module.get_search_params(
+        {"last_name": "Doe", "registration_status": "Active"}
+    )
+
+    app_module.fill_search_form(driver, params)
+
+    driver.execute_script.assert_called_once()
+    texts, dropdowns = driver.execute_script.call_args.args[1:]
+    assert texts[app_module.TEXT_FIELDS['last_name']] == "Doe"
+    assert dropdowns == {app_module.DROPDOWN_FIELDS['registration_status']: "Active"}
+    driver.find_element.assert_not_called()
+
+    driver.execute_script.return_value = {
+        "missing": [app_module.TEXT_FIELDS['last_name']], "unmatched": [],
+    }
+    with pytest.raises(ScrapeError):
+        app_module.fill_search_form(driver, params)
+
+
+def test_scrape_batch_dedupes_and_reports_each_query(client, mocker):
+    def pages(params, skip_pages=0):
+        if params["postal_code"] == "K1A":
+            raise ScrapeError("Error during pagination after page 1")
+        code = params["postal_code"]
+        return iter([[
+            {"registrant": f"Doe, {code}", "status": "Active", "class": "Optician",
+             "location": "Toronto, ON", "details_link": f"http://example.com/{code}"},
+        ]])
+
+    mock_client = mocker.patch('app.RegisterHttpClient')
+    mock_client.return_value.iter_result_pages.side_effect = pages
+    client.get('/scrape', query_string={'postal_code': 'L4C', 'engine': 'http'})
+
+    response = client.post('/scrape/batch', json={
+        "engine": "http",
+        "queries": [
+            {"postal_code": "M5V"}, {"postal_code": "K1A"},
+            {"postal_code": " M5V ", "last_name": None}, {"postal_code": "L4C"},
+        ],
+    })
+
+    assert response.status_code == 200
+    body = json.loads(response.data)
+    codes = [q["params"]["postal_code"] for q in body["queries"]]
+    assert codes == ["M5V", "K1A", "L4C"]
+    m5v, k1a, l4c = body["queries"]
+    assert (m5v["status"], m5v["source"], m5v["records"]) == ("ok", "live", 1)
+    assert k1a["status"] == "error" and "pagination" in k1a["error"]
+    assert l4c["source"] == "cache"
+    assert body["summary"] == dict(
+        body["summary"], queries=3, failed=1, records=2, complete=False
+    )
+    assert m5v["indexes"] == [0, 2]
+    assert mock_client.return_value.iter_result_pages.call_count == 3
+
+    streamed = client.post(
+        '/scrape/batch?stream=1', json=[{"postal_code": "M5V"}, {"postal_code": "L4C"}]
+    )
+    lines = [json.loads(line) for line in streamed.data.decode().splitlines()]
+    assert {line["source"] for line in lines[:-1]} == {"cache"}
+    assert lines[-1]["summary"]["queries"] == 2
+
+    assert client.post('/scrape/batch', json={"queries": []}).status_code == 400
+    lynx = client.post('/scrape/batch', json={"queries": [{}], "engine": "lynx"})
+    assert lynx.status_code == 400
+    # A number or object where a search param belongs is a client error, not a 500.
+    numeric = client.post(
+        '/scrape/batch', json=[{"postal_code": "M5V"}, {"postal_code": 123}]
+    )
+    assert numeric.status_code == 400
+    assert json.loads(numeric.data)["error"] == (
+        "Query 1: postal_code must be a string or null"
+    )
+    nested = client.post('/jobs', json={
+        "kind": "batch", "queries": [{"last_name": {"$ne": ""}}],
+    })
+    assert nested.status_code == 400
+    # engine and enrich apply to the whole batch; a query can't override them.
+    misplaced = client.post('/scrape/batch', json={
+        "queries": [{"postal_code": "M5V"}, {"engine": "browser"}],
+    })
+    assert misplaced.status_code == 400
+    error = json.loads(misplaced.data)["error"]
+    assert error == "Query 1: engine can only be set for the whole batch"
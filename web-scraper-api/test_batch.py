@@ -0,0 +1,53 @@
+import threading
+import time
+
+from batch import batch_summary, plan_batch, run_batch
+from register import get_search_params
+
+
+def test_plan_batch_runs_identical_searches_once():
+    queries = plan_batch([
+        get_search_params({"postal_code": "M5V"}),
+        get_search_params({"postal_code": "K1A"}),
+        get_search_params({"postal_code": " M5V "}),
+    ])
+
+    assert [query["indexes"] for query in queries] == [[0, 2], [1]]
+    assert queries[0]["params"]["postal_code"] == "M5V"
+
+
+def test_run_batch_reports_each_query_and_bounds_parallelism():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def search(params):
+        with lock:
+            running.append(params)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(params)
+        if params["postal_code"] == "BAD":
+            raise Exception("Error waiting for table")
+        data = [{"registrant": params["postal_code"]}]
+        return {"data": data, "source": "live", "pages": 1}
+
+    queries = plan_batch([
+        get_search_params({"postal_code": code}) for code in ["A", "B", "BAD", "C"]
+    ])
+    results = list(run_batch(queries, search, workers=2))
+
+    assert max(peak) == 2
+    by_code = {result["params"]["postal_code"]: result for result in results}
+    assert by_code["A"]["status"] == "ok"
+    assert by_code["A"]["data"] == [{"registrant": "A"}]
+    assert by_code["BAD"]["status"] == "error"
+    assert by_code["BAD"]["error"] == "Error waiting for table"
+    assert all(result["seconds"] > 0 for result in results)
+
+    summary = batch_summary(results, 1.0)
+    assert summary["queries"] == 4
+    assert summary["failed"] == 1
+    assert summary["records"] == 3
+    assert summary["complete"] is False
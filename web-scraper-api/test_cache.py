@@ -0,0 +1,41 @@
+from cache import ResultCache, cache_key
+
+
+def test_cache_key_normalizes_whitespace_and_order():
+    assert cache_key({"last_name": " Doe", "city_or_town": ""}) == \
+        cache_key({"city_or_town": "", "last_name": "Doe "})
+    assert cache_key({"last_name": "Doe"}) != cache_key({"last_name": "Roe"})
+
+
+def test_entries_expire_after_ttl(mocker):
+    clock = mocker.patch("cache.time.time", return_value=1000.0)
+    cache = ResultCache(ttl=60)
+    cache.put("k", [1])
+
+    clock.return_value = 1059.0
+    assert cache.get("k").value == [1]
+    clock.return_value = 1061.0
+    assert cache.get("k") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    cache.get("a")
+    cache.put("c", [3])
+
+    assert cache.get("b") is None
+    assert cache.get("a").value == [1]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_persistence_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "cache.db")
+    stored = ResultCache(path=path).put("k", [{"registrant": "Doe, John"}])
+
+    entry = ResultCache(path=path).get("k")
+
+    assert entry.value == [{"registrant": "Doe, John"}]
+    assert entry.etag == stored.etag
@@ -0,0 +1,79 @@
+import pytest
+
+from catalog import OptionCatalog
+from register import get_search_params
+
+OPTIONS = {
+    "registration_class": ["Optician", "Intern"],
+    "registration_status": ["Active", "Suspended"],
+    "contact_lens_mentor": [],
+    "area_of_service": ["Toronto"],
+}
+
+
+def test_options_are_cached_until_the_ttl_runs_out(mocker):
+    fetch = mocker.Mock(return_value=OPTIONS)
+    catalog = OptionCatalog(fetch, ttl=60)
+    clock = mocker.patch("catalog.time.time", return_value=1000.0)
+
+    assert catalog.get() == OPTIONS
+    catalog.get()
+    assert fetch.call_count == 1
+
+    clock.return_value = 1061.0
+    fetch.side_effect = Exception("register down")
+    assert catalog.get() == OPTIONS
+    assert fetch.call_count == 2
+
+
+def test_failed_fetch_is_not_retried_until_retry_after(mocker):
+    fetch = mocker.Mock(side_effect=Exception("register down"))
+    catalog = OptionCatalog(fetch, ttl=60, retry_after=30)
+    clock = mocker.patch("catalog.time.time", return_value=1000.0)
+
+    for _ in range(3):
+        with pytest.raises(Exception, match="register down"):
+            catalog.get()
+    assert fetch.call_count == 1
+
+    clock.return_value = 1031.0
+    fetch.side_effect = None
+    fetch.return_value = OPTIONS
+    assert catalog.get() == OPTIONS
+    assert fetch.call_count == 2
+
+    # Stale options are served through the backoff, too.
+    clock.return_value = 1092.0
+    fetch.side_effect = Exception("register down")
+    assert catalog.get() == OPTIONS
+    assert catalog.get() == OPTIONS
+    assert fetch.call_count == 3
+    # An explicit refresh still goes to the register.
+    catalog.get(refresh=True)
+    assert fetch.call_count == 4
+
+
+def test_validate_spells_values_as_the_form_does():
+    catalog = OptionCatalog(lambda: OPTIONS)
+
+    params = catalog.validate(get_search_params(
+        {"registration_status": " active ", "contact_lens_mentor": "Y"}
+    ))
+
+    assert params["registration_status"] == "Active"
+    # No options known for the mentor dropdown, so its value is left alone.
+    assert params["contact_lens_mentor"] == "Y"
+    with pytest.raises(ValueError, match="Invalid registration_class 'Doctor'"):
+        catalog.validate(get_search_params({"registration_class": "Doctor"}))
+
+
+def test_validate_without_dropdown_values_never_fetches(mocker):
+    fetch = mocker.Mock(side_effect=Exception("register down"))
+    catalog = OptionCatalog(fetch)
+
+    params = catalog.validate(get_search_params({"last_name": "Doe"}))
+    assert params["last_name"] == "Doe"
+    fetch.assert_not_called()
+    # And a failed fetch lets the search through rather than rejecting it.
+    params = catalog.validate(get_search_params({"registration_status": "Active"}))
+    assert params["registration_status"] == "Active"
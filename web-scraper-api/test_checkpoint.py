@@ -0,0 +1,72 @@
+import pytest
+from checkpoint import CheckpointStore, checkpoint_key, checkpointed
+
+
+def record(link):
+    return {
+        "registrant": link, "status": "Active", "class": "Optician",
+        "location": "", "details_link": link,
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CheckpointStore(str(tmp_path / "checkpoints.db"))
+
+
+def test_pages_are_saved_until_the_search_finishes(store):
+    key = checkpoint_key({"last_name": "Doe"}, "http", "run-1")
+    store.start(key, {"last_name": "Doe"}, "http", "run-1")
+    pages = checkpointed(store, key, [], iter([[record("a")], [record("b")]]))
+
+    next(pages)
+    assert store.get(key)["pages"] == 1
+    assert store.load_pages(key) == [[record("a")]]
+
+    assert list(pages) == [[record("b")]]
+    assert store.get(key) is None
+
+
+def test_resume_replays_saved_pages_and_drops_repeats(store):
+    key = checkpoint_key({}, "browser", "run-1")
+    store.start(key, {}, "browser", "run-1")
+    store.save_page(key, 1, [record("a")])
+
+    fresh = iter([[record("a"), record("b")]])
+    pages = list(checkpointed(store, key, store.load_pages(key), fresh))
+
+    assert pages == [[record("a")], [record("b")]]
+
+
+def test_old_checkpoints_are_ignored(store, mocker):
+    key = checkpoint_key({}, "http", "run-1")
+    store.start(key, {}, "http", "run-1")
+    mocker.patch("checkpoint.time.time", return_value=10 ** 10)
+
+    assert store.get(key) is None
+    assert store.list() == []
+
+
+def test_starting_a_run_prunes_expired_checkpoints(store, mocker):
+    abandoned = checkpoint_key({}, "http", "run-1")
+    store.start(abandoned, {}, "http", "run-1")
+    store.save_page(abandoned, 1, [record("a")])
+    mocker.patch("checkpoint.time.time", return_value=10 ** 10)
+
+    fresh = checkpoint_key({}, "http", "run-2")
+    store.start(fresh, {}, "http", "run-2")
+
+    assert store.load_pages(abandoned) == []
+    assert [checkpoint["key"] for checkpoint in store.list()] == [fresh]
+
+
+def test_identical_searches_in_different_runs_keep_separate_checkpoints(store):
+    first = checkpoint_key({}, "http", "run-1")
+    second = checkpoint_key({}, "http", "run-2")
+    store.start(first, {}, "http", "run-1")
+    store.start(second, {}, "http", "run-2")
+    store.save_page(first, 1, [record("a")])
+
+    assert first != second
+    assert store.load_pages(second) == []
+    assert store.get(first)["run_id"] == "run-1"
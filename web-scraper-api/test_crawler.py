@@ -0,0 +1,97 @@
+import hashlib
+import pytest
+from contextlib import contextmanager
+from crawler import build_shards, crawl, merge_records
+from register import ScrapeError, get_search_params, record_key
+
+
+def record(name, link):
+    return {"registrant": name, "status": "Active", "class": "Optician",
+            "location": "Toronto, ON", "details_link": link}
+
+
+def fake_open_pages(pages_by_status):
+    @contextmanager
+    def open_pages(params, engine):
+        pages = pages_by_status[params["registration_status"]]
+        if isinstance(pages, Exception):
+            raise pages
+        yield iter(pages)
+    return open_pages
+
+
+def test_build_shards_by_dropdown_uses_discovered_options():
+    params = get_search_params({"city_or_town": "Toronto"})
+    shards = build_shards("registration_status", params, ["Active", "Suspended"])
+
+    assert [shard["name"] for shard in shards] == ["registration_status=Active",
+                                                   "registration_status=Suspended"]
+    assert all(shard["params"]["city_or_town"] == "Toronto" for shard in shards)
+
+
+def test_build_shards_keeps_an_explicit_filter():
+    params = get_search_params({"registration_status": "Active"})
+    shards = build_shards("registration_status", params, ["Active", "Suspended"])
+
+    assert len(shards) == 1
+
+
+def test_build_shards_by_last_name_prefix():
+    shards = build_shards("last_name", get_search_params({"last_name": "Mc"}))
+
+    assert len(shards) == 36
+    assert shards[0]["params"]["last_name"] == "McA"
+    assert shards[-1]["params"]["last_name"] == "Mc9"
+
+
+def test_build_shards_by_last_name_adds_initials_seen_before():
+    shards = build_shards("last_name", get_search_params({}),
+                          known_last_names=["émond", "'t hooft", "anderson", "o'brien"])
+
+    assert [shard["params"]["last_name"] for shard in shards[36:]] == ["'", "É"]
+
+
+def test_build_shards_rejects_unknown_strategy():
+    with pytest.raises(ScrapeError):
+        build_shards("postal_code", get_search_params({}))
+
+
+def test_merge_records_dedupes_by_details_link():
+    merged, duplicates = merge_records([
+        [record("Doe, John", "http://x/1"), record("Doe, Jane", "http://x/2")],
+        [record("Doe, John", "http://x/1"), record("Roe, Ann", "")],
+    ])
+
+    assert [r["registrant"] for r in merged] == ["Doe, John", "Doe, Jane", "Roe, Ann"]
+    assert duplicates == 1
+
+
+def test_rows_without_a_link_share_the_lambda_key():
+    # Status or class changing doesn't make a link-less row a new registrant.
+    suspended = dict(record("Roe, Ann", ""), status="Suspended")
+    assert record_key(suspended) == record_key(record("Roe, Ann", "")) == (
+        "nolink:" + hashlib.sha1("Roe, Ann|Toronto, ON".encode("utf-8")).hexdigest()
+    )
+
+
+def test_crawl_merges_shards_and_reports_failures():
+    open_pages = fake_open_pages({
+        "Active": [
+            [record("Doe, John", "http://x/1")], [record("Doe, Jane", "http://x/2")],
+        ],
+        "Suspended": [
+            [record("Doe, John", "http://x/1"), record("Roe, Ann", "http://x/3")],
+        ],
+        "Resigned": ScrapeError("Error waiting for table"),
+    })
+    shards = build_shards("registration_status", get_search_params({}),
+                          ["Active", "Suspended", "Resigned"])
+
+    result = crawl(shards, open_pages, "http", workers=3)
+
+    assert len(result["data"]) == 3
+    assert result["duplicates"] == 1
+    assert result["complete"] is False
+    reports = {report["name"]: report for report in result["shards"]}
+    assert reports["registration_status=Active"]["pages"] == 2
+    assert reports["registration_status=Resigned"]["error"] == "Error waiting for table"
@@ -0,0 +1,151 @@
+import pytest
+import threading
+from driver_pool import DriverPool, PoolTimeout, build_chrome_options, create_driver
+
+REGISTER_URL = "https://example.com/Public-Register"
+
+
+@pytest.fixture
+def factory(mocker):
+    return mocker.Mock(side_effect=lambda: mocker.Mock())
+
+
+def test_warm_prelaunches_and_navigates(factory):
+    pool = DriverPool(factory, REGISTER_URL, size=3)
+    pool.warm()
+
+    assert factory.call_count == 3
+    stats = pool.stats()
+    assert stats["idle"] == 3
+    assert stats["total"] == 3
+    for pooled in pool._idle:
+        pooled.driver.get.assert_called_once_with(REGISTER_URL)
+
+
+def test_warm_failure_leaves_sessions_to_launch_on_demand(mocker):
+    driver, later = mocker.Mock(), mocker.Mock()
+    factory = mocker.Mock(
+        side_effect=[driver, Exception("chrome not reachable"), later]
+    )
+    pool = DriverPool(factory, REGISTER_URL, size=3)
+
+    pool.warm()
+
+    assert pool.stats()["total"] == 1
+    with pool.session() as first:
+        assert first is driver
+        with pool.session() as second:
+            assert second is later
+    assert factory.call_count == 3
+
+
+def test_session_reuses_driver_and_resets_form(factory):
+    pool = DriverPool(factory, REGISTER_URL, size=1)
+
+    with pool.session() as first:
+        pass
+    with pool.session() as second:
+        pass
+
+    assert first is second
+    assert factory.call_count == 1
+    first.delete_all_cookies.assert_called()
+    first.get.assert_called_with(REGISTER_URL)
+    assert pool.stats()["acquired"] == 2
+
+
+def test_session_discards_driver_on_error(factory):
+    pool = DriverPool(factory, REGISTER_URL, size=1)
+
+    with pytest.raises(RuntimeError):
+        with pool.session() as driver:
+            raise RuntimeError("boom")
+
+    driver.quit.assert_called_once()
+    with pool.session() as replacement:
+        assert replacement is not driver
+    assert pool.stats()["discarded"] == 1
+
+
+def test_session_recycles_after_max_uses(factory):
+    pool = DriverPool(factory, REGISTER_URL, size=1, max_uses=2)
+
+    for _ in range(2):
+        with pool.session() as driver:
+            pass
+
+    driver.quit.assert_called_once()
+    assert pool.stats()["recycled"] == 1
+    assert pool.stats()["total"] == 0
+
+
+def test_dead_idle_driver_is_replaced(factory, mocker):
+    pool = DriverPool(factory, REGISTER_URL, size=1)
+    pool.warm()
+    dead = pool._idle[0].driver
+    type(dead).current_url = mocker.PropertyMock(side_effect=Exception("gone"))
+
+    with pool.session() as driver:
+        assert driver is not dead
+    assert pool.stats()["crashed"] == 1
+
+
+def test_acquire_times_out_when_pool_is_busy(factory):
+    pool = DriverPool(factory, REGISTER_URL, size=1, acquire_timeout=0.05)
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with pool.session():
+            held.set()
+            release.wait()
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    held.wait()
+    try:
+        with pytest.raises(PoolTimeout):
+            with pool.session():
+                pass
+    finally:
+        release.set()
+        worker.join()
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_factory_failure_frees_the_slot(factory):
+    pool = DriverPool(factory, REGISTER_URL, size=1)
+    factory.side_effect = [Exception("Driver error"), factory.return_value]
+
+    with pytest.raises(Exception, match="Driver error"):
+        with pool.session():
+            pass
+    assert pool.stats()["total"] == 0
+
+
+def test_lean_profile_skips_subresources():
+    lean = build_chrome_options("lean")
+    full = build_chrome_options("full")
+
+    assert lean.page_load_strategy == "eager"
+    prefs = lean.experimental_options["prefs"]
+    assert prefs["profile.managed_default_content_settings.images"] == 2
+    assert any(arg.startswith("--renderer-process-limit=") for arg in lean.arguments)
+    assert full.page_load_strategy == "normal"
+    assert "prefs" not in full.experimental_options
+
+
+def test_lean_driver_blocks_urls_over_cdp(mocker):
+    chrome = mocker.patch("driver_pool.webdriver.Chrome")
+
+    create_driver("lean")
+
+    commands = [c.args[0] for c in chrome.return_value.execute_cdp_cmd.call_args_list]
+    assert commands == ["Network.enable", "Network.setBlockedURLs"]
+    urls = chrome.return_value.execute_cdp_cmd.call_args.args[1]["urls"]
+    assert "*.woff2" in urls and "*googletagmanager.com*" in urls
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        build_chrome_options("tiny")
@@ -0,0 +1,91 @@
+import os
+import pytest
+import requests
+from enrichment import DetailCache, DetailEnricher, parse_detail_page
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def fake_response(mocker, status_code=200, text="", headers=None):
+    response = mocker.Mock()
+    response.status_code = status_code
+    response.text = text
+    response.headers = headers or {}
+    response.raise_for_status.return_value = None
+    return response
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DetailCache(str(tmp_path / "details.db"))
+
+
+def test_parse_detail_page_reads_every_label_layout():
+    fields = parse_detail_page(load_fixture("registrant_details.html"))
+
+    assert fields == {
+        "registration_number": "R12345",
+        "registration_class": "Optician",
+        "initial_registration_date": "2011-06-01",
+        "practice_name": "Doe & Sons Optical",
+        "practice_address": "123 King St W\nToronto, ON M5V 1J2",
+        "language_of_service": "English, French",
+        "terms_conditions_and_limitations": "None",
+    }
+
+
+def test_enrich_fetches_each_link_once(mocker, cache):
+    session = mocker.Mock()
+    details = load_fixture("registrant_details.html")
+    session.get.return_value = fake_response(mocker, text=details)
+    enricher = DetailEnricher(cache, workers=2, rate=0, session_factory=lambda: session)
+    records = [
+        {"registrant": "Doe, John", "details_link": "http://example.com/d1"},
+        {"registrant": "Doe, John", "details_link": "http://example.com/d1"},
+        {"registrant": "Roe, Jane", "details_link": ""},
+    ]
+
+    enriched = enricher.enrich(records)
+
+    assert session.get.call_count == 1
+    assert enriched[0]["details"]["registration_number"] == "R12345"
+    assert enriched[1]["details"] == enriched[0]["details"]
+    assert enriched[2]["details"] is None
+    assert "details" not in records[0]
+
+
+def test_fresh_cache_entries_are_not_refetched(mocker, cache):
+    cache.put("http://example.com/d1", {"practice_name": "Cached"})
+    session = mocker.Mock()
+    enricher = DetailEnricher(cache, rate=0, session_factory=lambda: session)
+
+    assert enricher.fetch("http://example.com/d1") == {"practice_name": "Cached"}
+    session.get.assert_not_called()
+
+
+def test_stale_entries_are_revalidated(mocker, cache):
+    cache.put("http://example.com/d1", {"practice_name": "Cached"}, etag='"v1"',
+              last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    session = mocker.Mock()
+    session.get.return_value = fake_response(mocker, status_code=304)
+    enricher = DetailEnricher(cache, rate=0, ttl=0, session_factory=lambda: session)
+
+    assert enricher.fetch("http://example.com/d1") == {"practice_name": "Cached"}
+    headers = session.get.call_args.kwargs["headers"]
+    assert headers == {
+        "If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+
+
+def test_failed_fetch_leaves_details_empty(mocker, cache):
+    session = mocker.Mock()
+    session.get.side_effect = requests.ConnectionError("down")
+    enricher = DetailEnricher(cache, rate=0, session_factory=lambda: session)
+
+    assert enricher.fetch("http://example.com/d1") is None
+    assert cache.get("http://example.com/d1") is None
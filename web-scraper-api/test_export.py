@@ -0,0 +1,98 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+from werkzeug.datastructures import Accept, MIMEAccept
+
+import export
+from export import (
+    NotAcceptable, export_fields, export_stream, negotiate_encoding, negotiate_format,
+)
+
+RECORDS = [
+    {"registrant": "Doe, John", "status": "Active", "class": "Optician",
+     "location": "Toronto, ON", "details_link": "http://example.com/2"},
+    {"registrant": "Roe, Ann", "status": "Active", "class": "Intern",
+     "location": "Ottawa, ON", "details_link": "http://example.com/1"},
+    {"registrant": "Poe, Sam", "status": "Resigned", "class": "Optician",
+     "location": "London, ON", "details_link": ""},
+]
+
+
+def collect(pages, fmt, encoding, enrich=False):
+    return b"".join(export_stream(iter(pages), fmt, encoding, export_fields(enrich)))
+
+
+def test_negotiate_format():
+    assert negotiate_format(None, MIMEAccept()) == "ndjson"
+    accept = MIMEAccept([("text/csv", 1), ("application/x-ndjson", 0.5)])
+    assert negotiate_format(None, accept) == "csv"
+    assert negotiate_format("csv", MIMEAccept([("application/json", 1)])) == "csv"
+    with pytest.raises(NotAcceptable):
+        negotiate_format(None, MIMEAccept([("application/json", 1)]))
+    with pytest.raises(ValueError):
+        negotiate_format("xlsx", MIMEAccept())
+
+
+def test_columnar_formats_need_pyarrow(monkeypatch):
+    monkeypatch.setattr(export, "pyarrow", None)
+    with pytest.raises(NotAcceptable):
+        negotiate_format("parquet", MIMEAccept())
+    accept = MIMEAccept([("application/vnd.apache.parquet", 1), ("text/csv", 0.1)])
+    assert negotiate_format(None, accept) == "csv"
+
+
+def test_negotiate_encoding(monkeypatch):
+    assert negotiate_encoding("csv", Accept()) == "identity"
+    assert negotiate_encoding("csv", Accept([("gzip", 1), ("deflate", 1)])) == "gzip"
+    assert negotiate_encoding("parquet", Accept([("gzip", 1)])) == "identity"
+    monkeypatch.setattr(export, "zstandard", None)
+    assert negotiate_encoding("ndjson", Accept([("zstd", 1), ("gzip", 0.5)])) == "gzip"
+
+
+def test_gzip_ndjson_round_trip():
+    body = collect([RECORDS[:2], RECORDS[2:]], "ndjson", "gzip")
+    lines = gzip.decompress(body).decode().splitlines()
+    assert [json.loads(line) for line in lines] == RECORDS
+
+
+def test_csv_serializes_details_as_json():
+    enriched = [dict(RECORDS[0], details={"Registration Number": "R1"})]
+    body = collect([enriched, []], "csv", "identity", enrich=True)
+    rows = list(csv.reader(io.StringIO(body.decode())))
+    assert rows[0] == export.EXPORT_FIELDS + ["details"]
+    assert rows[1][0] == "Doe, John"
+    assert json.loads(rows[1][5]) == {"Registration Number": "R1"}
+    assert len(rows) == 2
+
+
+def test_csv_of_no_records_is_just_the_header():
+    lines = collect([], "csv", "identity").decode().splitlines()
+    assert lines == [",".join(export.EXPORT_FIELDS)]
+
+
+def test_zstd_round_trip():
+    zstandard = pytest.importorskip("zstandard")
+    body = collect([RECORDS], "csv", "zstd")
+    text = zstandard.ZstdDecompressor().decompressobj().decompress(body).decode()
+    assert text.splitlines()[1].startswith('"Doe, John"')
+
+
+def test_parquet_and_arrow_round_trip():
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    body = collect([RECORDS[:1], RECORDS[1:]], "parquet", "identity")
+    table = pyarrow.parquet.read_table(io.BytesIO(body))
+    assert table.column_names == export.EXPORT_FIELDS
+    registrants = table.column("registrant").to_pylist()
+    assert registrants == ["Doe, John", "Roe, Ann", "Poe, Sam"]
+
+    reader = pyarrow.ipc.open_stream(collect([RECORDS], "arrow", "identity"))
+    classes = reader.read_all().column("class").to_pylist()
+    assert classes == ["Optician", "Intern", "Optician"]
+
+    empty = pyarrow.parquet.read_table(io.BytesIO(collect([], "parquet", "identity")))
+    assert empty.num_rows == 0
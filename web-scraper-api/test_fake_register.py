@@ -0,0 +1,38 @@
+import pytest
+from benchmarks.fake_register import create_app, serve
+from http_engine import RegisterHttpClient
+from register import DROPDOWN_FIELDS, get_search_params
+
+
+@pytest.fixture
+def register_url():
+    server, base_url = serve(create_app(rows=60, page_size=25))
+    yield f"{base_url}/Public-Register"
+    server.shutdown()
+
+
+def test_http_engine_pages_through_the_stand_in(register_url):
+    client = RegisterHttpClient(url=register_url)
+
+    pages = list(client.iter_result_pages(get_search_params({})))
+
+    assert [len(page) for page in pages] == [25, 25, 10]
+    records = [record for page in pages for record in page]
+    assert len({record["details_link"] for record in records}) == 60
+    details_url = register_url + "/Registrant-Details?ID="
+    assert records[0]["details_link"].startswith(details_url)
+
+
+def test_stand_in_applies_search_filters(register_url):
+    client = RegisterHttpClient(url=register_url)
+    params = get_search_params({"last_name": "Ch", "registration_status": "Active"})
+
+    records = [record for page in client.iter_result_pages(params) for record in page]
+
+    assert records
+    assert all(r["registrant"].startswith("Chen") for r in records)
+    assert all(r["status"] == "Active" for r in records)
+    options = client.fetch_search_form().dropdown_options(
+        DROPDOWN_FIELDS["registration_status"]
+    )
+    assert options == ["Active", "Suspended", "Resigned"]
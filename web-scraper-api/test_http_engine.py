@@ -0,0 +1,137 @@
+import os
+import pytest
+from http_engine import RegisterHttpClient, RegisterPage
+from register import REGISTER_URL, TEXT_FIELDS, DROPDOWN_FIELDS, get_search_params
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+DETAILS_URL = (
+    "https://members.collegeofopticians.ca/Public-Register/Registrant-Details?ID="
+)
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def fake_response(mocker, fixture, url=REGISTER_URL):
+    response = mocker.Mock()
+    response.text = load_fixture(fixture)
+    response.url = url
+    response.raise_for_status.return_value = None
+    return response
+
+
+@pytest.fixture
+def session(mocker):
+    session = mocker.Mock()
+    session.get.return_value = fake_response(mocker, "search_form.html")
+    session.post.side_effect = [
+        fake_response(mocker, "results_page1.html"),
+        fake_response(mocker, "results_page2.html"),
+    ]
+    return session
+
+
+def test_records_match_extract_table_data_schema():
+    page = RegisterPage(load_fixture("results_page1.html"), REGISTER_URL)
+
+    assert page.records() == [
+        {
+            "registrant": "Doe, John",
+            "status": "Active",
+            "class": "Optician",
+            "location": "Toronto, ON",
+            "details_link": DETAILS_URL + "1001",
+        },
+        {
+            "registrant": "Doe & Sons, Jane",
+            "status": "Active",
+            "class": "Optician",
+            "location": "Ottawa, ON",
+            "details_link": DETAILS_URL + "1002",
+        },
+        {
+            "registrant": "Smith, Anna\n(Annie)",
+            "status": "Suspended",
+            "class": "Intern",
+            "location": "London, ON",
+            "details_link": DETAILS_URL + "1003",
+        },
+    ]
+
+
+def test_missing_details_link_is_empty_string():
+    page = RegisterPage(load_fixture("results_page2.html"), REGISTER_URL)
+
+    assert page.records()[-1]["details_link"] == ""
+    assert page.next_page_button() is None
+
+
+def test_form_data_carries_viewstate_and_search_values():
+    page = RegisterPage(load_fixture("search_form.html"), REGISTER_URL)
+    params = get_search_params({"last_name": "Doe", "registration_status": "Active"})
+
+    data = page.form_data(params, submit=page.find_input(value="Find"))
+
+    assert data["__VIEWSTATE"] == "VS0"
+    assert data["__EVENTVALIDATION"] == "EV-VS0"
+    assert data[TEXT_FIELDS["last_name"].replace("_", "$")] == "Doe"
+    assert data[DROPDOWN_FIELDS["registration_status"].replace("_", "$")] == "ACTIVE"
+    assert data[DROPDOWN_FIELDS["registration_class"].replace("_", "$")] == ""
+    assert any(name.endswith("SubmitButton") for name in data)
+
+
+def test_client_replays_postbacks_across_pages(session):
+    client = RegisterHttpClient(session=session)
+
+    pages = list(client.iter_result_pages(get_search_params({"last_name": "Doe"})))
+
+    assert [len(page) for page in pages] == [3, 2]
+    assert session.get.call_count == 1
+    assert session.post.call_count == 2
+    next_page_data = session.post.call_args_list[1].kwargs["data"]
+    assert next_page_data["__VIEWSTATE"] == "VS1"
+    assert any(name.endswith("ctl10") for name in next_page_data)
+    assert not any(name.endswith("SubmitButton") for name in next_page_data)
+
+
+def test_client_skips_checkpointed_pages(session):
+    client = RegisterHttpClient(session=session)
+
+    pages = list(client.iter_result_pages(get_search_params({}), skip_pages=1))
+
+    assert [len(page) for page in pages] == [2]
+    assert session.post.call_count == 2
+
+
+def test_dropdown_options_skip_the_all_entry():
+    page = RegisterPage(load_fixture("search_form.html"), REGISTER_URL)
+
+    options = page.dropdown_options(DROPDOWN_FIELDS["registration_status"])
+
+    assert options == ["Active", "Suspended", "Resigned"]
+
+
+def test_short_rows_are_kept_like_the_browser_extraction():
+    html = (
+        "<table><tbody>"
+        "<tr><td role='gridcell'>Roe, Ann</td><td role='gridcell'>Active</td></tr>"
+        "<tr><td>pager</td></tr>"
+        "</tbody></table>"
+    )
+
+    assert RegisterPage(html, REGISTER_URL).records() == [
+        {
+            "registrant": "Roe, Ann", "status": "Active", "class": "",
+            "location": "", "details_link": "",
+        },
+    ]
+
+
+def test_empty_dropdowns_keep_the_default_quietly(caplog):
+    page = RegisterPage(load_fixture("search_form.html"), REGISTER_URL)
+
+    page.form_data(get_search_params({"last_name": "Doe"}))
+
+    assert "not found in options" not in caplog.text
@@ -0,0 +1,138 @@
+import json
+import pytest
+import threading
+import time
+import app as app_module
+from jobs import JobQueue, JobStore
+
+
+def wait_for(store, job_id, status, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        job = store.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}: {store.get(job_id)}")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def test_queue_runs_job_and_records_progress(store):
+    def runner(kind, options, progress):
+        progress(1, 2)
+        progress(2, 3)
+        return {"data": [options["params"]]}
+
+    queue = JobQueue(store, runner, workers=2, poll_interval=0.05)
+    queue.start()
+    try:
+        job = queue.submit("scrape", {"params": {"last_name": "Doe"}, "engine": "http"})
+        finished = wait_for(store, job["id"], "succeeded")
+    finally:
+        queue.stop()
+
+    assert finished["pages"] == 2
+    assert finished["records"] == 3
+    result = store.get(job["id"], with_result=True)["result"]
+    assert result == {"data": [{"last_name": "Doe"}]}
+
+
+def test_failed_job_keeps_error(store):
+    def runner(kind, options, progress):
+        raise RuntimeError("Error waiting for table")
+
+    queue = JobQueue(store, runner, poll_interval=0.05)
+    queue.start()
+    try:
+        job = queue.submit("scrape", {"params": {}, "engine": "browser"})
+        failed = wait_for(store, job["id"], "failed")
+    finally:
+        queue.stop()
+
+    assert failed["error"] == "Error waiting for table"
+
+
+def test_interrupted_jobs_are_requeued_after_restart(store):
+    job = store.create("scrape", {"params": {}, "engine": "http"})
+    assert store.claim_next("old-process", lease=0.05)["id"] == job["id"]
+
+    assert store.requeue_orphans() == []
+    time.sleep(0.1)
+    assert store.requeue_orphans() == [job["id"]]
+    assert store.get(job["id"])["status"] == "queued"
+
+
+def test_heartbeat_keeps_long_jobs_claimed(store):
+    release = threading.Event()
+
+    def runner(kind, options, progress):
+        release.wait(5)
+        return {"data": []}
+
+    queue = JobQueue(store, runner, poll_interval=0.05, lease=0.15)
+    queue.start()
+    try:
+        job = queue.submit("scrape", {"params": {}, "engine": "http"})
+        wait_for(store, job["id"], "running")
+        time.sleep(0.5)
+        # Another process sweeping for orphans leaves a renewed claim alone.
+        assert store.requeue_orphans() == []
+        assert store.get(job["id"])["status"] == "running"
+        release.set()
+        wait_for(store, job["id"], "succeeded")
+    finally:
+        release.set()
+        queue.stop()
+
+
+@pytest.fixture
+def client(store, mocker):
+    queue = JobQueue(
+        store, lambda kind, options, progress: {"data": []}, poll_interval=0.05
+    )
+    mocker.patch.object(app_module, "job_queue", queue)
+    with app_module.app.test_client() as client:
+        yield client
+    queue.stop()
+
+
+def test_job_endpoints(client, store):
+    response = client.post(
+        '/jobs', json={'kind': 'crawl', 'shard_by': 'last_name', 'engine': 'http'}
+    )
+    assert response.status_code == 202
+    job = json.loads(response.data)
+    assert job["options"]["shard_by"] == "last_name"
+    assert response.headers["Location"] == f"/jobs/{job['id']}"
+
+    wait_for(store, job["id"], "succeeded")
+    assert json.loads(client.get(f"/jobs/{job['id']}").data)["status"] == "succeeded"
+    assert json.loads(client.get(f"/jobs/{job['id']}/result").data) == {"data": []}
+
+
+def test_identical_jobs_get_their_own_run(client):
+    first, second = (
+        json.loads(client.post('/jobs', json={'kind': 'scrape', 'engine': 'http'}).data)
+        for _ in range(2)
+    )
+
+    assert first["options"]["run_id"]
+    assert first["options"]["run_id"] != second["options"]["run_id"]
+
+
+def test_job_result_not_ready(client, store):
+    job = store.create("scrape", {"params": {}, "engine": "http"})
+
+    response = client.get(f"/jobs/{job['id']}/result")
+
+    assert response.status_code == 409
+    assert client.get('/jobs/missing').status_code == 404
+
+
+def test_job_rejects_bad_options(client):
+    response = client.post('/jobs', json={'kind': 'scrape', 'engine': 'curl'})
+
+    assert response.status_code == 400
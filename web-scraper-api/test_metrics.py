@@ -0,0 +1,35 @@
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(
+        Histogram("wait_seconds", "Waits.", ["step"], buckets=(0.1, 1))
+    )
+    histogram.observe(0.05, step="results")
+    histogram.observe(0.5, step="results")
+    histogram.observe(5, step="results")
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ["# HELP wait_seconds Waits.", "# TYPE wait_seconds histogram"]
+    assert 'wait_seconds_bucket{step="results",le="0.1"} 1' in lines
+    assert 'wait_seconds_bucket{step="results",le="1.0"} 2' in lines
+    assert 'wait_seconds_bucket{step="results",le="+Inf"} 3' in lines
+    assert 'wait_seconds_sum{step="results"} 5.55' in lines
+    assert 'wait_seconds_count{step="results"} 3' in lines
+
+
+def test_counter_and_gauge_samples():
+    registry = Registry()
+    errors = registry.register(Counter("errors_total", "Errors.", ["stage"]))
+    registry.register(Gauge("idle", "Idle sessions.", lambda: 2))
+    errors.inc(stage="find_click")
+    errors.inc(stage="find_click")
+    errors.inc(stage='say "hi"')
+
+    text = registry.render()
+
+    assert 'errors_total{stage="find_click"} 2.0' in text
+    assert 'errors_total{stage="say \\"hi\\""} 1.0' in text
+    assert "idle 2.0" in text
@@ -0,0 +1,92 @@
+import pytest
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+from readiness import (
+    PostbackWatcher, WaitStats, click_fresh, next_page_button, wait_until,
+)
+
+
+def state(page_index="1", in_post_back=False, loaded=True, has_table=True):
+    return {
+        "loaded": loaded, "inPostBack": in_post_back,
+        "pageIndex": page_index, "hasTable": has_table,
+    }
+
+
+@pytest.fixture
+def no_sleep(mocker):
+    return mocker.patch("readiness.time.sleep")
+
+
+@pytest.fixture
+def driver(mocker):
+    driver = mocker.Mock()
+    driver.find_elements.return_value = [mocker.Mock()]
+    return driver
+
+
+def test_wait_until_backs_off_and_records_timing(mocker, no_sleep):
+    stats = WaitStats()
+    condition = mocker.Mock(
+        side_effect=[None, StaleElementReferenceException(), None, "ready"]
+    )
+
+    result = wait_until(mocker.Mock(), condition, "results", timeout=60, stats=stats)
+    assert result == "ready"
+    assert [c.args[0] for c in no_sleep.call_args_list] == [0.05, 0.1, 0.2]
+    assert stats.stats()["results"]["count"] == 1
+    assert stats.stats()["results"]["timeouts"] == 0
+
+
+def test_wait_until_times_out(mocker, no_sleep):
+    stats = WaitStats()
+    mocker.patch("readiness.time.monotonic", side_effect=[0.0, 1.0, 6.0])
+
+    with pytest.raises(TimeoutException):
+        wait_until(
+            mocker.Mock(), lambda driver: None, "next_page", timeout=5, stats=stats
+        )
+    assert stats.stats()["next_page"]["timeouts"] == 1
+
+
+def test_watcher_ignores_the_previous_page(driver):
+    driver.execute_script.return_value = state("1")
+    watcher = PostbackWatcher(driver)
+
+    assert watcher(driver) is None
+    driver.execute_script.return_value = state("2")
+    assert watcher(driver)["pageIndex"] == "2"
+
+
+def test_watcher_detects_replaced_table(driver):
+    table = driver.find_elements.return_value[0]
+    driver.execute_script.return_value = state(None)
+    watcher = PostbackWatcher(driver)
+
+    table.is_enabled.side_effect = StaleElementReferenceException()
+    assert watcher(driver) is not None
+
+
+def test_watcher_waits_for_async_postback_to_finish(driver):
+    driver.execute_script.return_value = state(None)
+    watcher = PostbackWatcher(driver)
+
+    driver.execute_script.return_value = state(None, in_post_back=True)
+    assert watcher(driver) is None
+    driver.execute_script.return_value = state(None)
+    assert watcher(driver) is not None
+
+
+def test_next_page_button_is_none_on_last_page(mocker, driver):
+    button = driver.find_elements.return_value[0]
+    button.get_attribute.return_value = "return false;"
+
+    assert next_page_button(driver) is None
+
+
+def test_click_fresh_relocates_stale_button(mocker, no_sleep):
+    stale, fresh = mocker.Mock(), mocker.Mock()
+    stale.click.side_effect = StaleElementReferenceException()
+    find = mocker.Mock(side_effect=[stale, fresh])
+
+    assert click_fresh(mocker.Mock(), find) is True
+    fresh.click.assert_called_once()
@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+import pytest
+
+import records
+from records import (
+    RecordsReader, build_changes_query, build_query, like_escape, parse_since,
+)
+
+
+def test_build_query_defaults_to_current_rows_after_the_cursor():
+    sql, args = build_query({}, after=40, limit=10)
+    assert "WHERE id > %s AND removed_at IS NULL ORDER BY id LIMIT %s" in sql
+    assert args == [40, 10]
+
+    sql, _ = build_query({}, include_removed=True)
+    assert "removed_at IS NULL" not in sql
+
+
+def test_build_query_filters():
+    sql, args = build_query({
+        "status": "Active", "class": "", "location": "Toronto, ON",
+        "name": "O'Do", "q": "an",
+    })
+    assert "status = %s" in sql and "location = %s" in sql and "class = %s" not in sql
+    assert "lower(registrant) LIKE %s" in sql and "registrant ILIKE %s" in sql
+    assert args == [0, "Active", "Toronto, ON", "o'do%", "%an%", 100]
+
+
+def test_build_query_can_read_ids_past_an_offset():
+    sql, args = build_query({}, after=40, limit=2, columns=["id"], offset=99)
+    assert sql.startswith("SELECT id FROM scraped_data")
+    assert sql.endswith("ORDER BY id LIMIT %s OFFSET %s")
+    assert args == [40, 2, 99]
+
+
+def test_build_changes_query_pages_by_id_since_a_moment():
+    sql, args = build_changes_query(
+        since=1700000000.0, after=12, limit=50, change="removed"
+    )
+    assert (
+        "FROM scraped_data_changes WHERE id > %s"
+        " AND detected_at >= to_timestamp(%s) AND change = %s"
+    ) in sql
+    assert sql.endswith("ORDER BY id LIMIT %s")
+    assert args == [12, 1700000000.0, "removed", 50]
+
+
+def test_parse_since():
+    assert parse_since("1700000000") == 1700000000.0
+    assert parse_since("2024-01-01") == parse_since("2024-01-01T00:00:00+00:00")
+    with pytest.raises(ValueError):
+        parse_since("yesterday")
+
+
+def test_like_escape_keeps_wildcards_literal():
+    assert like_escape("50%_off\\") == "50\\%\\_off\\\\"
+
+
+def test_query_reads_through_the_pool(mocker):
+    pytest.importorskip("psycopg2")
+    pool = mocker.patch.object(records.psycopg2.pool, "ThreadedConnectionPool")
+    conn = pool.return_value.getconn.return_value
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [{
+        "id": 3, "registrant": "Doe, John", "status": "Active", "class": "Optician",
+        "location": "Toronto, ON", "details_link": "http://example.com/1",
+        "crawl_run_id": "run-1",
+        "first_seen_at": datetime(2026, 1, 2, tzinfo=timezone.utc),
+        "updated_at": None, "removed_at": None,
+    }]
+
+    reader = RecordsReader("postgresql://localhost/scraperdb")
+    assert reader.available()
+    rows = reader.query({"status": "Active"}, after=2, limit=5)
+    reader.query({})
+
+    assert rows[0]["first_seen_at"] == "2026-01-02T00:00:00+00:00"
+    assert cursor.execute.call_args_list[0].args[1] == [2, "Active", 5]
+    pool.assert_called_once_with(1, 4, "postgresql://localhost/scraperdb")
+    assert pool.return_value.putconn.call_count == 2
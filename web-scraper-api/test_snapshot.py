@@ -0,0 +1,48 @@
+from snapshot import RegisterSnapshot, SnapshotStore
+
+RECORDS = [
+    {"registrant": "Doe, John", "status": "Active", "class": "Optician",
+     "location": "Toronto, ON", "details_link": "http://example.com/1"},
+    {"registrant": "Doherty, Anne", "status": "Suspended", "class": "Optician",
+     "location": "Ottawa, ON", "details_link": "http://example.com/2"},
+    {"registrant": "Smith, Johnny", "status": "Active", "class": "Intern",
+     "location": "Toronto, ON", "details_link": "http://example.com/3"},
+]
+
+
+def query(**params):
+    return [r["registrant"] for r in RegisterSnapshot(RECORDS, 0).query(params)]
+
+
+def test_last_name_prefix_is_case_insensitive():
+    assert query(last_name="DO") == ["Doe, John", "Doherty, Anne"]
+    assert query(last_name="Doe") == ["Doe, John"]
+    assert query(last_name="Z") == []
+
+
+def test_filters_intersect_and_keep_crawl_order():
+    assert query(registration_status="Active", city_or_town="toronto") == [
+        "Doe, John", "Smith, Johnny",
+    ]
+    assert query(registration_class="Intern", first_name_contains="ohn") == [
+        "Smith, Johnny",
+    ]
+    assert query(last_name="", registration_status="") == [
+        "Doe, John", "Doherty, Anne", "Smith, Johnny",
+    ]
+
+
+def test_unsupported_filter_returns_none():
+    assert RegisterSnapshot(RECORDS, 0).query({"practice_name": "Eye Care"}) is None
+
+
+def test_store_persists_and_expires(tmp_path, mocker):
+    path = str(tmp_path / "snapshot.json")
+    SnapshotStore(path).replace(RECORDS)
+
+    store = SnapshotStore(path, max_age=60)
+    assert len(store.current().records) == 3
+
+    mocker.patch("snapshot.time.time", return_value=store.current().loaded_at + 61)
+    assert store.current() is None
+    assert store.status()["available"] is False